@@ -5,7 +5,14 @@ AI-aware Curriculum Vitae Generator
 __version__ = "1.0.0"
 
 # Make functions accessible through the package
-from aicv.core.processor import generate
+from aicv.core.processor import generate, generate_iter, load_document
+
+def __getattr__(name):
+    # The asyncio API is loaded on first use, so that importing aicv does not import asyncio
+    if name in ('agenerate', 'agenerate_pdf'):
+        from aicv.core import aio
+        return getattr(aio, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ai_aware_cv/core/__init__.py
 """
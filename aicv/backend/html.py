@@ -56,18 +56,28 @@ class PersonalInfoFormatterHtml(PersonalInfoFormatter):
         address = self.personal_info.get('address', '')
         return address or ""
 
-def embed_photo(photo_path):
-    """Generates the HTML for the photo section"""
+def embed_photo(photo_path, source=None):
+    """Generates the HTML for the photo section
+
+    Args:
+        photo_path (str): Path to the photo
+        source (DataSource, optional): Data source to read the photo from, e.g. a .cvpack bundle.
+            Without one, or if the source has no such file, the photo is read from the filesystem.
+    """
     photo_html = '<div class="photo-placeholder">120 × 150</div>'
 
     try:
-        if os.path.exists(photo_path) and os.path.isfile(photo_path):
+        photo_bytes = None
+        if photo_path and source is not None and source.exists(photo_path):
+            photo_bytes = source.read_bytes(photo_path)
+        elif os.path.exists(photo_path) and os.path.isfile(photo_path):
             with open(photo_path, "rb") as img_file:
                 photo_bytes = img_file.read()
-                photo_base64 = base64.b64encode(photo_bytes).decode('utf-8')
-                photo_data = f"data:image/jpeg;base64,{photo_base64}"
-                photo_html = f'<img src="{photo_data}" alt="photo" style="width: 100%; height: 100%; object-fit: cover;">'
-                print(f"Photo found and embedded: {photo_path}")
+        if photo_bytes is not None:
+            photo_base64 = base64.b64encode(photo_bytes).decode('utf-8')
+            photo_data = f"data:image/jpeg;base64,{photo_base64}"
+            photo_html = f'<img src="{photo_data}" alt="photo" style="width: 100%; height: 100%; object-fit: cover;">'
+            print(f"Photo found and embedded: {photo_path}")
     except Exception as e:
         print(f"Error processing photo: {e}")
 
@@ -86,17 +96,40 @@ def create_html_file(html_content, output_path, silent=False):
     if not silent:
         print(f"CV saved to {output_path}")
 
-def create_html(content, personal_info, strict_page_breaks=False, emojis=True):
+def create_html(content, personal_info, strict_page_breaks=False, emojis=True, source=None):
     """Creates a full HTML document with styling and structure
     Args:
         content (str): Main HTML content
         personal_info (dict): Personal info dict
         strict_page_breaks (bool): If True, enforce old page break rules. Default is False (new behavior).
         emojis (bool): Whether to enable emojis in the CV text (except personal info)
+        source (DataSource, optional): Data source to read the photo from
+    """
+    return ''.join(iter_html([content], personal_info, strict_page_breaks=strict_page_breaks, emojis=emojis, source=source))
+
+def _strip_emojis(content):
+    import re
+    # Remove emoji spans from section headers and content, but not from personal info
+    # Remove <span class="mono-emoji">...</span> in main content (not in contact-info)
+    content = re.sub(r'<span class="mono-emoji">[^<]*</span> ?', '', content)
+    # Remove leading unicode emoji in h2/h3/ul/li, etc.
+    return re.sub(r'(<h[12][^>]*>|<li[^>]*>|^)[\U0001F300-\U0001FAFF\U00002700-\U000027BF\U00002600-\U000026FF\U0001F000-\U0001FFFF] ?','\\1', content)
+
+def iter_html(chunks, personal_info, strict_page_breaks=False, emojis=True, source=None):
+    """Yields the HTML document of create_html() in pieces: the head and the header, then each chunk of
+    the main content as it arrives, then the closing tags.
+
+    Args:
+        chunks (Iterable[str]): Main HTML content. Every chunk but the first starts with a newline,
+            as the chunks of aicv.core.processor.generate_iter() do.
+        personal_info (dict): Personal info dict
+        strict_page_breaks (bool): If True, enforce old page break rules
+        emojis (bool): Whether to enable emojis in the CV text (except personal info)
+        source (DataSource, optional): Data source to read the photo from
     """
 
     # Embed the photo directly into HTML
-    photo_html = embed_photo(personal_info.get('photo', ''))
+    photo_html = embed_photo(personal_info.get('photo_path') or personal_info.get('photo', ''), source=source)
 
     f = PersonalInfoFormatterHtml(personal_info)
 
@@ -106,15 +139,6 @@ def create_html(content, personal_info, strict_page_breaks=False, emojis=True):
     if f.has_phd():
         name = f"{name}, PhD"
 
-    # If emojis are disabled, strip all non-personal-info emojis from content
-    if not emojis:
-        import re
-        # Remove emoji spans from section headers and content, but not from personal info
-        # Remove <span class="mono-emoji">...</span> in main content (not in contact-info)
-        content = re.sub(r'<span class="mono-emoji">[^<]*</span> ?', '', content)
-        # Remove leading unicode emoji in h2/h3/ul/li, etc.
-        content = re.sub(r'(<h[12][^>]*>|<li[^>]*>|^)[\U0001F300-\U0001FAFF\U00002700-\U000027BF\U00002600-\U000026FF\U0001F000-\U0001FFFF] ?','\\1', content)
-
     # Build the document with styling
     html = f'''<!DOCTYPE html>
 <html lang="en">
@@ -626,15 +650,15 @@ def create_html(content, personal_info, strict_page_breaks=False, emojis=True):
 
         <div id="main-content">
 '''
+    yield html
 
-    # Add the main content
-    html += content
+    # Add the main content; a chunk never splits a tag, so emojis are stripped chunk by chunk
+    for content in chunks:
+        yield content if emojis else _strip_emojis(content)
 
-    html += '''
+    yield '''
         </div>
     </div>
 </body>
 </html>
 '''
-
-    return html
@@ -22,19 +22,19 @@ class EmojisFormatterMarkdown(EmojisFormatter):
 class PersonalInfoFormatterMarkdown(PersonalInfoFormatter):
     def format_website(self) -> str:
         website = self.personal_info.get('website', '')
-        website_text, _ = parse_website_info(website)
+        website_text, website_url = PersonalInfoFormatter.parse_website_info(website)
         if not website_text:
             return ""
         return f"[{website_text}]({website_url})"
 
     def format_linkedin(self) -> str:
         linkedin = self.personal_info.get('linkedin', '')
-        linkedin_text, linkedin_url = parse_social_info(linkedin, "https://www.linkedin.com/in/", "@", "linkedin.com/in/")
+        linkedin_text, linkedin_url = PersonalInfoFormatter.parse_social_info(linkedin, "https://www.linkedin.com/in/", "@", "linkedin.com/in/")
         return f"[{linkedin_text}]({linkedin_url})"
 
     def format_github(self) -> str:
         github = self.personal_info.get('github', '')
-        github_text, github_url = parse_social_info(github, "https://github.com/", "@", "github.com/")
+        github_text, github_url = PersonalInfoFormatter.parse_social_info(github, "https://github.com/", "@", "github.com/")
         return f"[{github_text}]({github_url})"
 
     def format_email(self) -> str:
@@ -47,11 +47,15 @@ class PersonalInfoFormatterMarkdown(PersonalInfoFormatter):
         phone = self.personal_info.get('phone', '')
         return phone or ""
 
-    def format_address(self, address) -> str:
+    def format_address(self) -> str:
         address = self.personal_info.get('address', '')
         return address or ""
 
 def create_markdown(content, personal_info, emojis=True):
+    return ''.join(iter_markdown([content], personal_info, emojis=emojis))
+
+def iter_markdown(chunks, personal_info, emojis=True):
+    """Yields the Markdown document of create_markdown(): the personal info, then each chunk of the content."""
     f = PersonalInfoFormatterMarkdown(personal_info)
 
     # Format personal info fields with proper formatting
@@ -65,5 +69,6 @@ def create_markdown(content, personal_info, emojis=True):
         f"- **GitHub**: {f.format_field('github')}",
         f"- **Date of Birth**: {f.format_field('date_of_birth')}"
     ]
-    return '\n'.join(info_lines) + '\n\n' + content
+    yield '\n'.join(info_lines) + '\n\n'
+    yield from chunks
 
@@ -61,6 +61,19 @@ def create_moderncv(processed_content, personal_info, bib_content=""):
     Returns:
         str: A string representing the complete .tex file.
     """
+    return ''.join(iter_moderncv([processed_content], personal_info, bib_content))
+
+def iter_moderncv(chunks, personal_info, bib_content=""):
+    """Yields the LaTeX document of create_moderncv(): the preamble, each chunk of the content, then the end.
+
+    The preamble inlines the bibliography, so bib_content must be complete before the first chunk is
+    taken, i.e. the chunks are already rendered.
+
+    Args:
+        chunks (Iterable[str]): The main content of the CV, already formatted as LaTeX sections.
+        personal_info (dict): Dictionary containing personal information.
+        bib_content (str): BibTeX bibliography content to inline in the document.
+    """
     f = PersonalInfoFormatterModernCV(personal_info)
 
     firstname = escape_latex(f.format_first_name())
@@ -75,7 +88,7 @@ def create_moderncv(processed_content, personal_info, bib_content=""):
     github = f.format_github()
     linkedin = f.format_linkedin()
 
-    photo_path = personal_info.get('photo', '')
+    photo_path = personal_info.get('photo_path') or personal_info.get('photo', '')
     # Ensure photo path is relative to the tex file or absolute. LaTeX needs forward slashes.
     if photo_path:
         photo_path = photo_path.replace('\\', '/')
@@ -136,7 +149,7 @@ def create_moderncv(processed_content, personal_info, bib_content=""):
     print_bibliography = "\\printbibliography[heading=none]" if bib_content else ""
 
     # Construct the LaTeX document
-    latex_string = f"""
+    yield f"""
 \\documentclass[a4paper]{{moderncv}}
 \\moderncvtheme[blue]{{classic}} % or classic, casual, oldstyle
 \\usepackage[T2A,T1]{{fontenc}} % T2A for Cyrillic, T1 for Western European
@@ -164,11 +177,12 @@ def create_moderncv(processed_content, personal_info, bib_content=""):
 \\begin{{document}}
 \\maketitle
 
-{processed_content} % This will contain \section{{...}} \cventry{{...}} etc.
+"""
+    yield from chunks
+    yield f""" % This will contain \section{{...}} \cventry{{...}} etc.
 
 % Print bibliography if there are publications
 {print_bibliography}
 
 \\end{{document}}
 """
-    return latex_string
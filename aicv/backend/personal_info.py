@@ -50,27 +50,25 @@ class PersonalInfoFormatter(ABC):
         if not value:
             return ""
         if field == 'name':
-            return self.format_name(value)
+            return self.format_name()
         if field == 'first_name':
-            return self.format_first_name(value)
+            return self.format_first_name()
         if field == 'family_name':
-            return self.format_family_name(value)
-        if field == 'name':
-            return self.format_name(value)
+            return self.format_family_name()
         if field == 'date_of_birth':
-            return self.format_date_of_birth(value)
+            return self.format_date_of_birth()
         elif field == 'website':
-            return self.format_website(value)
+            return self.format_website()
         elif field == 'github':
-            return self.format_github(value)
+            return self.format_github()
         elif field == 'linkedin':
-            return self.format_linkedin(value)
+            return self.format_linkedin()
         elif field == 'email':
-            return self.format_email(value)
+            return self.format_email()
         elif field == 'phone':
-            return self.format_phone(value)
+            return self.format_phone()
         elif field == 'address':
-            return self.format_address(value)
+            return self.format_address()
         else:
             return value
 
@@ -0,0 +1,153 @@
+"""
+asyncio API of the AI-aware CV generator
+
+generate() reads files, executes the pymd blocks and may run WeasyPrint or pdflatex, all of which
+would stall an event loop. agenerate() and agenerate_pdf() read the inputs in one batch on an
+executor, run the CPU-bound stages there too, and drive pdflatex with asyncio subprocesses, so that
+a cancelled request kills its LaTeX run. A semaphore per event loop bounds how many documents are
+generated at once.
+"""
+import asyncio
+import os
+import weakref
+from functools import partial
+from typing import Any, Dict, Optional
+from aicv.core.sources import DataSource, DirectorySource, MemorySource
+
+# Documents generated at once per event loop, unless the caller passes its own semaphore
+DEFAULT_CONCURRENCY = os.cpu_count() or 4
+
+_semaphores = weakref.WeakKeyDictionary()
+
+def _default_semaphore() -> asyncio.Semaphore:
+    # An asyncio.Semaphore belongs to one event loop
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(DEFAULT_CONCURRENCY)
+    return semaphore
+
+def _preload(file_path: str) -> MemorySource:
+    """Reads the template, personal.json, the data files its pymd blocks declare and the photo of a
+    CV folder in one go. Any other file a block reads comes from the folder when it runs."""
+    from aicv.core.extensions import declared_inputs
+
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fallback = DirectorySource(directory, os.curdir)
+    with open(file_path, 'rb') as f:
+        template = f.read()
+    files = {os.path.basename(file_path): template}
+    for name in ['personal.json'] + declared_inputs(template.decode('utf-8').splitlines()):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                files[os.path.normpath(name).replace(os.sep, '/')] = f.read()
+    source = MemorySource(files, fallback=fallback)
+    try:
+        photo = source.load_json('personal.json').get('photo')
+    except (FileNotFoundError, ValueError):
+        photo = None
+    photo_path = fallback.locate(photo) if photo else None
+    if photo_path:
+        # The html backend embeds the photo by the path that load_personal_info() resolves
+        with open(photo_path, 'rb') as f:
+            files[os.path.normpath(photo_path).replace(os.sep, '/')] = f.read()
+    return source
+
+async def _load(file_path, personal_info, source, executor):
+    """Reads the inputs of a CV folder unless a source is given, and the personal information unless it is given.
+
+    Returns:
+        Tuple[str, Dict[str, Any], DataSource]: The name of the template in the source, the personal
+            information and the source
+    """
+    from aicv.core.processor import load_personal_info
+
+    loop = asyncio.get_running_loop()
+    if source is None:
+        source = await loop.run_in_executor(executor, _preload, file_path)
+        file_path = os.path.basename(file_path)
+    if personal_info is None:
+        personal_info = await loop.run_in_executor(executor, partial(load_personal_info, source=source))
+    return file_path, personal_info, source
+
+async def _agenerate(file_path, personal_info, backend, emojis, source, executor) -> str:
+    from aicv.core.processor import generate
+
+    return await asyncio.get_running_loop().run_in_executor(
+        executor, partial(generate, file_path, personal_info, backend=backend, emojis=emojis, source=source))
+
+async def agenerate(file_path: str, personal_info: Optional[Dict[str, Any]] = None, backend: str = 'markdown',
+                    emojis: bool = True, source: Optional[DataSource] = None, executor=None,
+                    semaphore: Optional[asyncio.Semaphore] = None) -> str:
+    """Generates the markdown, html or latex content of a CV without blocking the event loop.
+
+    Without a source, the template, the JSON files and the photo next to file_path are read on the
+    executor before anything is generated. Cancelling the call abandons the result, but the executor
+    thread finishes the document it is working on.
+
+    Args:
+        file_path (str): Path to the Markdown file (or its name in the data source)
+        personal_info (Dict[str, Any], optional): Personal information; loaded from personal.json if not given
+        backend (str): 'markdown', 'html' or 'moderncv'
+        emojis (bool): Whether to enable emojis in the CV text (except personal info)
+        source (DataSource, optional): Data source to read the Markdown file and the JSON files from
+        executor (concurrent.futures.Executor, optional): Thread pool for the blocking stages.
+            Defaults to the event loop's default executor.
+        semaphore (asyncio.Semaphore, optional): Bounds the documents generated at once. Defaults to
+            one shared by the calls on the event loop, of DEFAULT_CONCURRENCY.
+    Returns:
+        str: The processed content with all pymd blocks executed
+    """
+    async with semaphore or _default_semaphore():
+        file_path, personal_info, source = await _load(file_path, personal_info, source, executor)
+        return await _agenerate(file_path, personal_info, backend, emojis, source, executor)
+
+async def agenerate_pdf(file_path: str, personal_info: Optional[Dict[str, Any]] = None, backend: str = 'html',
+                        emojis: Optional[bool] = None, source: Optional[DataSource] = None, paper_size: str = 'A4',
+                        add_page_numbers: bool = True, timeout: Optional[float] = None, executor=None,
+                        semaphore: Optional[asyncio.Semaphore] = None) -> bytes:
+    """Generates the PDF of a CV without blocking the event loop.
+
+    The html backend renders the PDF with WeasyPrint on the executor; moderncv runs pdflatex (and
+    bibtex) as asyncio subprocesses, which are killed if the call is cancelled or times out.
+
+    Args:
+        file_path (str): Path to the Markdown file (or its name in the data source)
+        personal_info (Dict[str, Any], optional): Personal information; loaded from personal.json if not given
+        backend (str): 'html' (WeasyPrint) or 'moderncv' (pdflatex)
+        emojis (bool, optional): Whether to enable emojis. Defaults to True for html only.
+        source (DataSource, optional): Data source to read the Markdown file and the JSON files from
+        paper_size (str): Paper size for WeasyPrint
+        add_page_numbers (bool): Whether WeasyPrint adds page numbers
+        timeout (float, optional): Seconds after which a stuck pdflatex or bibtex pass is killed
+        executor (concurrent.futures.Executor, optional): Thread pool for the blocking stages
+        semaphore (asyncio.Semaphore, optional): Bounds the documents generated at once
+    Returns:
+        bytes: The PDF document
+    Raises:
+        ValueError: For the markdown backend, which has no PDF
+        RuntimeError: If LaTeX compilation fails
+        asyncio.TimeoutError: If a LaTeX pass takes longer than timeout
+    """
+    if backend not in ('html', 'moderncv'):
+        raise ValueError(f"No PDF can be made with the {backend} backend")
+    if emojis is None or backend == 'moderncv':
+        emojis = backend == 'html'
+
+    # Relative URLs in the HTML are resolved in the CV folder, unless the inputs come from the caller's source
+    base_url = None if source is not None else os.path.dirname(os.path.abspath(file_path))
+    async with semaphore or _default_semaphore():
+        file_path, personal_info, source = await _load(file_path, personal_info, source, executor)
+        content = await _agenerate(file_path, personal_info, backend, emojis, source, executor)
+        if backend == 'moderncv':
+            from aicv.core.processor import latex_files
+            from aicv.utils.latex_compiler import acompile_latex_to_pdf_bytes
+            use_bibtex = '\\addbibresource' in content and '\\begin{filecontents}' in content
+            # pdflatex runs in a temporary directory, where it needs the photo of a bundle or storage source
+            files = await asyncio.get_running_loop().run_in_executor(executor, latex_files, personal_info, source)
+            return await acompile_latex_to_pdf_bytes(content, use_bibtex=use_bibtex, timeout=timeout, files=files)
+
+        from aicv.utils.pdf_converter import html_to_pdf_bytes
+        return await asyncio.get_running_loop().run_in_executor(
+            executor, partial(html_to_pdf_bytes, content, paper_size=paper_size, add_page_numbers=add_page_numbers, base_url=base_url))
@@ -0,0 +1,750 @@
+"""
+Batch rendering of many CVs for the AI-aware CV generator
+"""
+import argparse
+import math
+import os
+import sys
+import time
+import traceback
+from datetime import datetime
+import itertools
+import posixpath
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+from aicv.core.bundle import BUNDLE_SUFFIX
+from aicv.core.metrics import DOCUMENTS, IN_FLIGHT, QUEUE_DEPTH, TextfileWriter, record_stage, start_http_server
+from aicv.core.manifest import MANIFEST_NAME, Manifest, default_manifest_path, fingerprint, job_inputs
+from aicv.core.scheduling import load_timings, order_jobs, save_timings, timing_key
+from aicv.utils.archive import ArchiveWriter
+from aicv.utils.storage import is_url, open_storage
+
+SECTION_FILES = ('employment.json', 'education.json', 'publications.json')
+# Suffix of the document written for each backend. The Markdown output must not replace cv.md itself.
+OUTPUT_SUFFIXES = {'html': '.html', 'markdown': '.processed.md', 'moderncv': '.tex'}
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """Returns the CPU limit imposed by the cgroup (v2 or v1), or None if unlimited."""
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open('/sys/fs/cgroup/cpu.max', 'r') as f:
+            quota, period = f.read().split()[:2]
+        if quota != 'max':
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+
+    try:
+        # cgroup v1: quota of -1 means unlimited
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us', 'r') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us', 'r') as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+
+    return None
+
+def default_jobs() -> int:
+    """Number of worker processes to use by default: the usable CPUs, capped by the cgroup CPU limit."""
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+
+    limit = cgroup_cpu_limit()
+    if limit:
+        count = min(count, math.ceil(limit))
+    return max(1, count)
+
+def discover_jobs(root: str, cv_name: str = 'cv.md', output_dir: Optional[str] = None,
+                  include_packed: bool = False) -> List[Dict[str, Any]]:
+    """Finds every CV folder and .cvpack bundle under root.
+
+    A CV folder contains the Markdown file, personal.json and at least one of the section JSON files.
+    A bundle (see aicv.core.bundle) is a job of its own, with the bundle as 'cv_path'. A folder that
+    was packed into a <folder>.cvpack bundle next to it is the same CV, and is left to the bundle.
+
+    Args:
+        root (str): Directory tree to search
+        cv_name (str): Name of the Markdown file in each CV folder
+        output_dir (str, optional): If given, outputs are written to a mirror of the tree under this directory
+            instead of next to each Markdown file
+        include_packed (bool): Whether to also return the folders that have a bundle next to them
+    Returns:
+        List[Dict[str, Any]]: Jobs, sorted by input directory. Each job's 'name' is its output base
+            relative to the tree, used for archive members.
+    """
+    root = os.path.abspath(root)
+    if os.path.isfile(root) and root.endswith(BUNDLE_SUFFIX):
+        return [_bundle_job(os.path.dirname(root), os.path.dirname(root), os.path.basename(root), output_dir)]
+    jobs = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith(BUNDLE_SUFFIX):
+                jobs.append(_bundle_job(root, dirpath, filename, output_dir))
+        if cv_name not in filenames or 'personal.json' not in filenames:
+            continue
+        if not any(name in filenames for name in SECTION_FILES):
+            continue
+        if not include_packed and dirpath != root and os.path.isfile(dirpath + BUNDLE_SUFFIX):
+            continue
+
+        cv_path = os.path.join(dirpath, cv_name)
+        if output_dir:
+            output_base = os.path.join(os.path.abspath(output_dir), os.path.relpath(dirpath, root), os.path.splitext(cv_name)[0])
+        else:
+            output_base = os.path.splitext(cv_path)[0]
+        name = os.path.normpath(os.path.join(os.path.relpath(dirpath, root), os.path.splitext(cv_name)[0]))
+        jobs.append({'input_dir': dirpath, 'cv_path': cv_path, 'output_base': os.path.normpath(output_base), 'name': name})
+    return jobs
+
+def _bundle_job(root: str, dirpath: str, filename: str, output_dir: Optional[str]) -> Dict[str, Any]:
+    cv_path = os.path.join(dirpath, filename)
+    name = os.path.normpath(os.path.join(os.path.relpath(dirpath, root), os.path.splitext(filename)[0]))
+    output_base = os.path.join(os.path.abspath(output_dir), name) if output_dir else os.path.splitext(cv_path)[0]
+    # The JSON data is not visible without opening the bundle; its size is a cheap stand-in for the cost estimate
+    return {'input_dir': dirpath, 'cv_path': cv_path, 'output_base': os.path.normpath(output_base), 'name': name,
+            'record_size': os.path.getsize(cv_path)}
+
+def storage_jobs(storage, cv_name: str = 'cv.md') -> List[Dict[str, Any]]:
+    """Finds every CV folder in a storage (see aicv.utils.storage), like discover_jobs() does on disk.
+
+    Args:
+        storage (Storage): Storage to search
+        cv_name (str): Name of the Markdown file in each CV folder
+    Returns:
+        List[Dict[str, Any]]: Jobs, sorted by folder. 'inputs' lists the keys of the folder's
+            template and JSON files, which prefetch_inputs() reads before the job is rendered.
+    """
+    folders = {}
+    for key, size in storage.list().items():
+        directory, filename = posixpath.split(key)
+        folders.setdefault(directory, {})[filename] = size
+
+    jobs = []
+    stem = os.path.splitext(cv_name)[0]
+    for directory in sorted(folders):
+        files = folders[directory]
+        if cv_name not in files or 'personal.json' not in files:
+            continue
+        if not any(filename in files for filename in SECTION_FILES):
+            continue
+        inputs = [cv_name] + sorted(filename for filename in files if filename.endswith('.json'))
+        name = posixpath.join(directory, stem) if directory else stem
+        jobs.append({'input_dir': storage.url(directory), 'cv_path': storage.url(posixpath.join(directory, cv_name)),
+                     'template': cv_name, 'prefix': directory, 'inputs': inputs, 'output_base': storage.url(name), 'name': name,
+                     'record_size': sum(files[filename] for filename in inputs[1:])})
+    return jobs
+
+def _fetch_inputs(storage, job: Dict[str, Any]) -> Dict[str, bytes]:
+    from aicv.core.sources import MemorySource
+
+    keys = {filename: posixpath.join(job['prefix'], filename) for filename in job['inputs']}
+    futures = {filename: storage.read_async(key) for filename, key in keys.items()}
+    files = {filename: future.result() for filename, future in futures.items()}
+    # The photo is only known once personal.json is read
+    photo = MemorySource(files).load_json('personal.json').get('photo')
+    if photo and '://' not in photo and not os.path.isabs(photo):
+        photo = posixpath.normpath(photo)
+        try:
+            files[photo] = storage.read(posixpath.join(job['prefix'], photo))
+        except FileNotFoundError:
+            pass
+    return files
+
+def prefetch_inputs(jobs: Iterable[Dict[str, Any]], storage, lookahead: int = 4) -> Iterator[Dict[str, Any]]:
+    """Yields the jobs with their input files read into 'files', reading the inputs of the next
+    `lookahead` jobs in the background while the current ones are rendered.
+
+    A job whose inputs cannot be read gets a 'fetch_error' instead, and fails in parse_stage().
+    """
+    with ThreadPoolExecutor(max_workers=lookahead, thread_name_prefix='aicv-prefetch') as executor:
+        pending = deque()
+        for job in jobs:
+            pending.append((job, executor.submit(_fetch_inputs, storage, job)))
+            if len(pending) < lookahead:
+                continue
+            yield _fetched(*pending.popleft())
+        while pending:
+            yield _fetched(*pending.popleft())
+
+def _fetched(job: Dict[str, Any], future) -> Dict[str, Any]:
+    job = dict(job)
+    try:
+        job['files'] = future.result()
+    except Exception as e:
+        job['fetch_error'] = f"Reading inputs failed: {type(e).__name__}: {e}"
+    return job
+
+def jsonl_jobs(jsonl_path: str, template: str, output_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Creates one job per record of a JSONL file, all rendered with the same Markdown template.
+
+    Args:
+        jsonl_path (str): JSONL file with one CV per line (see aicv.core.jsonl)
+        template (str): Markdown file with the pymd blocks, shared by all records
+        output_dir (str, optional): Directory for the outputs (default: a directory named after the
+            JSONL file, next to it). Record N is written to <output_dir>/N/<template stem>.*
+    Returns:
+        List[Dict[str, Any]]: Jobs in record order
+    """
+    from aicv.core.jsonl import JsonlFile
+
+    jsonl_path = os.path.abspath(jsonl_path)
+    cv_path = os.path.abspath(template)
+    stem = os.path.splitext(os.path.basename(cv_path))[0]
+    output_dir = os.path.abspath(output_dir or os.path.splitext(jsonl_path)[0])
+    jobs = []
+    with JsonlFile(jsonl_path) as records:
+        for number in range(len(records)):
+            name = os.path.join(str(number), stem)
+            jobs.append({'input_dir': os.path.dirname(cv_path), 'cv_path': cv_path, 'jsonl': jsonl_path, 'record': number,
+                         'record_size': records.record_size(number), 'output_base': os.path.join(output_dir, name), 'name': name})
+    return jobs
+
+def database_jobs(db_path: str, template: str, output_dir: Optional[str] = None, people: Optional[List[str]] = None,
+                  since: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Creates one job per person of a CV database, all rendered with the same Markdown template.
+
+    Args:
+        db_path (str): SQLite database created by `aicv db import` (see aicv.core.database)
+        template (str): Markdown file with the pymd blocks, shared by all people
+        output_dir (str, optional): Directory for the outputs (default: a directory named after the
+            database, next to it). Person KEY is written to <output_dir>/KEY/<template stem>.*
+        people (List[str], optional): Keys of the people to render (default: everyone)
+        since (float, optional): Only render the people imported or updated since this time
+    Returns:
+        List[Dict[str, Any]]: Jobs in key order
+    """
+    from aicv.core.database import CVDatabase
+
+    db_path = os.path.abspath(db_path)
+    cv_path = os.path.abspath(template)
+    stem = os.path.splitext(os.path.basename(cv_path))[0]
+    output_dir = os.path.abspath(output_dir or os.path.splitext(db_path)[0])
+    with CVDatabase(db_path) as database:
+        selected = database.people(since=since)
+    if people:
+        wanted = set(people)
+        selected = [person for person in selected if person['key'] in wanted]
+
+    jobs = []
+    for person in selected:
+        name = os.path.normpath(os.path.join(person['key'], stem))
+        jobs.append({'input_dir': os.path.dirname(cv_path), 'cv_path': cv_path, 'database': db_path, 'person': person['key'],
+                     'person_id': person['id'], 'record_size': person['size'], 'output_base': os.path.join(output_dir, name), 'name': name})
+    return jobs
+
+def job_label(job: Dict[str, Any]) -> str:
+    """Human-readable name of a job in status messages."""
+    if 'record' in job:
+        return f"{job['jsonl']}#{job['record']}"
+    if 'person' in job:
+        return f"{job['database']}#{job['person']}"
+    if job['cv_path'].endswith(BUNDLE_SUFFIX):
+        return job['cv_path']
+    return job['input_dir']
+
+# JSONL files opened by this worker process, kept open for the records of the following jobs
+_jsonl_files = {}
+# The bundle of the job this worker process is running, kept open between its stages
+_open_bundle = None
+
+def _jsonl_record(path: str, number: int) -> Dict[str, Any]:
+    from aicv.core.jsonl import JsonlFile
+
+    records = _jsonl_files.get(path)
+    if records is None:
+        records = _jsonl_files[path] = JsonlFile(path)
+    return records[number]
+
+def _bundle(path: str):
+    global _open_bundle
+    from aicv.core.bundle import BundleSource
+
+    if _open_bundle is None or _open_bundle.path != path:
+        if _open_bundle is not None:
+            _open_bundle.close()
+        _open_bundle = BundleSource(path)
+    return _open_bundle
+
+def job_source(item: Dict[str, Any]):
+    """Returns the data source of a job, or None for a CV folder (see aicv.core.sources)."""
+    from aicv.core.sources import DirectorySource, RecordSource
+
+    if 'record' in item:
+        # The record is read straight from the JSONL file; the template and the photo come from its directory
+        return RecordSource(_jsonl_record(item['jsonl'], item['record']), fallback=DirectorySource(item['input_dir']))
+    if 'person' in item:
+        # Every job of this worker queries the database through the same connection
+        from aicv.core.database import SQLiteSource, connect
+        return SQLiteSource(connect(item['database']), item['person_id'], fallback=DirectorySource(item['input_dir']))
+    if 'files' in item:
+        from aicv.core.sources import MemorySource
+        return MemorySource(item['files'])
+    if item['cv_path'].endswith(BUNDLE_SUFFIX):
+        return _bundle(item['cv_path'])
+    return None
+
+def _init_worker(options: Dict[str, Any], stages: Tuple[str, ...] = ('parse', 'render', 'pdf')):
+    """Warms up a worker process once, so that every job it runs afterwards skips the heavy imports."""
+    if options.get('quiet'):
+        sys.stdout = open(os.devnull, 'w')
+
+    import aicv.core.processor  # noqa: F401
+    if 'pdf' in stages and options.get('pdf') and options.get('backend') == 'html':
+        try:
+            import aicv.utils.pdf_converter  # noqa: F401
+        except Exception:
+            # Reported per job when the PDF step runs
+            pass
+
+def _emojis_enabled(options: Dict[str, Any]) -> bool:
+    backend = options.get('backend', 'html')
+    emojis = options.get('emojis')
+    if emojis is None or backend == 'moderncv':
+        emojis = backend == 'html'
+    return emojis
+
+def parse_stage(item: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+    """Stage 1: loads personal.json and executes the pymd blocks of cv.md."""
+    from aicv.core.processor import load_personal_info, preprocess
+
+    if item.get('fetch_error'):
+        raise OSError(item['fetch_error'])
+    source = job_source(item)
+    cv_path = item.get('template', item['cv_path'])
+    item['personal_info'] = load_personal_info(item['input_dir'], source=source)
+    item['dependencies'] = []
+    if cv_path.endswith(BUNDLE_SUFFIX):
+        item['dependencies'].append(cv_path)
+        cv_path = source.template
+    item['processed'], item['bib_content'] = preprocess(cv_path, item['personal_info'],
+                                                        backend=options.get('backend', 'html'), emojis=_emojis_enabled(options),
+                                                        dependencies=item['dependencies'], source=source)
+    return item
+
+def _emit(item: Dict[str, Any], options: Dict[str, Any], suffix: str, data):
+    """Stores a generated document: in the item's 'documents' when the main process writes the
+    outputs (into an archive or a storage), otherwise as a file."""
+    if options.get('collect'):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        item.setdefault('documents', {})[item['name'] + suffix] = data
+        return
+
+    output_path = item['output_base'] + suffix
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    if isinstance(data, str):
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+    else:
+        with open(output_path, 'wb') as f:
+            f.write(data)
+    item['outputs'].append(output_path)
+
+def render_stage(item: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+    """Stage 2: builds the complete document and writes it next to the output base (or into the archive)."""
+    from aicv.core.processor import assemble
+
+    backend = options.get('backend', 'html')
+    content = assemble(item.pop('processed'), item['personal_info'], backend=backend,
+                       emojis=_emojis_enabled(options), bib_content=item.pop('bib_content'), source=job_source(item))
+
+    suffix = OUTPUT_SUFFIXES.get(backend, '.html')
+    _emit(item, options, suffix, content)
+    if options.get('pdf') and backend != 'markdown':
+        item['content'] = content
+
+    if options.get('fingerprint'):
+        # Hashed here, in the worker, so that the main process only has to append to the manifest
+        item['inputs'] = fingerprint(job_inputs(item, options))
+    return item
+
+def pdf_stage(item: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+    """Stage 3: produces the PDF from the document built by render_stage()."""
+    from aicv.core.processor import latex_files
+
+    backend = options.get('backend', 'html')
+    if not options.get('pdf') or backend == 'markdown':
+        return item
+
+    content = item.pop('content')
+    use_bibtex = '\\addbibresource' in content and '\\begin{filecontents}' in content
+    files = latex_files(item['personal_info'], job_source(item)) if backend == 'moderncv' else {}
+    if backend == 'moderncv' and (options.get('collect') or files):
+        # A photo that is not a local file (in a bundle or a storage) goes into the temporary directory of pdflatex
+        from aicv.utils.latex_compiler import compile_latex_to_pdf_bytes
+        pdf = compile_latex_to_pdf_bytes(content, use_bibtex=use_bibtex, base_name=os.path.basename(item['name']), files=files)
+        if pdf is None:
+            raise RuntimeError(f"LaTeX compilation of {item['name']}.tex failed")
+        _emit(item, options, '.pdf', pdf)
+    elif backend == 'moderncv':
+        # pdflatex compiles the .tex file written by render_stage()
+        from aicv.utils.latex_compiler import compile_latex_to_pdf
+        tex_path, pdf_path = item['outputs'][0], item['output_base'] + '.pdf'
+        if not compile_latex_to_pdf(tex_path, pdf_path, use_bibtex=use_bibtex, working_directory=os.path.dirname(tex_path)):
+            raise RuntimeError(f"LaTeX compilation of {tex_path} failed")
+        item['outputs'].append(pdf_path)
+    else:
+        from aicv.utils.pdf_converter import html_to_pdf_bytes
+        pdf = html_to_pdf_bytes(content, paper_size=options.get('paper', 'A4'), add_page_numbers=options.get('page_numbers', True),
+                                base_url=None if 'files' in item else item['input_dir'])
+        _emit(item, options, '.pdf', pdf)
+    return item
+
+STAGES = (('parse', parse_stage), ('render', render_stage), ('pdf', pdf_stage))
+
+def stage_names(options: Dict[str, Any]) -> List[str]:
+    """Names of the stages needed for the options: the PDF stage only runs if there is a PDF to make."""
+    names = [name for name, _ in STAGES]
+    if not options.get('pdf') or options.get('backend') == 'markdown':
+        names.remove('pdf')
+    return names
+
+def _new_item(job: Dict[str, Any]) -> Dict[str, Any]:
+    return dict(job, ok=False, outputs=[], error=None, elapsed=0.0, stage_times={}, failed_stage=None)
+
+def _finish_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Drops intermediate data so that only the result fields remain."""
+    item['ok'] = item['error'] is None
+    for key in ('personal_info', 'processed', 'bib_content', 'content', 'dependencies', 'files'):
+        item.pop(key, None)
+    return item
+
+def run_stage(name: str, item: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs one stage on an item, recording its duration and any error instead of raising."""
+    fn = dict(STAGES)[name]
+    start = time.perf_counter()
+    try:
+        item = fn(item, options)
+    except Exception as e:
+        item['error'] = f"{type(e).__name__}: {e}"
+        item['failed_stage'] = name
+        if options.get('traceback'):
+            item['error'] += '\n' + traceback.format_exc()
+    elapsed = time.perf_counter() - start
+    item['stage_times'][name] = elapsed
+    item['elapsed'] += elapsed
+    return item
+
+def render_job(job: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+    """Renders a single CV folder by running all stages in a row. Never raises.
+
+    Args:
+        job (Dict[str, Any]): Job as returned by discover_jobs()
+        options (Dict[str, Any]): Batch options: backend, pdf, emojis, paper, page_numbers
+    Returns:
+        Dict[str, Any]: Result with 'ok', 'outputs', 'error' and 'elapsed' fields, and the seconds
+            spent in each stage in 'stage_times'
+    """
+    item = _new_item(job)
+    for name in stage_names(options):
+        item = run_stage(name, item, options)
+        if item['error']:
+            break
+    return _finish_item(item)
+
+def record_metrics(result: Dict[str, Any], backend: str):
+    """Records the stage timings and the outcome of a result that came back from a worker process."""
+    for stage, seconds in result.get('stage_times', {}).items():
+        record_stage(stage, backend, seconds, failed=stage == result.get('failed_stage'))
+    DOCUMENTS.inc(backend=backend, status='ok' if result['ok'] else 'failed')
+
+def run_batch(jobs: List[Dict[str, Any]], options: Dict[str, Any], max_workers: Optional[int] = None, report=None) -> List[Dict[str, Any]]:
+    """Renders the jobs on a pool of long-lived worker processes.
+
+    Args:
+        jobs (Iterable[Dict[str, Any]]): Jobs as returned by discover_jobs()
+        options (Dict[str, Any]): Batch options passed to render_job()
+        max_workers (int, optional): Number of worker processes. Defaults to default_jobs()
+        report (callable, optional): Called with each result as soon as it is available
+    Returns:
+        List[Dict[str, Any]]: Results in completion order
+    """
+    max_workers = max_workers or default_jobs()
+    results = []
+    jobs = iter(jobs)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(options,)) as executor:
+        # Jobs are submitted as workers free up, keeping a few queued, so that a lazy source of jobs
+        # (such as prefetch_inputs()) is only read ahead as far as needed
+        pending = {executor.submit(render_job, job, options) for job in itertools.islice(jobs, 2 * max_workers)}
+        IN_FLIGHT.set_function(lambda: len(pending), stage='batch')
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results.append(result)
+                if report:
+                    report(result)
+                for job in itertools.islice(jobs, 1):
+                    pending.add(executor.submit(render_job, job, options))
+    IN_FLIGHT.clear_function(stage='batch')
+    return results
+
+def _skip_failed(name: str, item: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+    # Items that failed in an earlier stage are passed through untouched
+    if item['error']:
+        return item
+    return run_stage(name, item, options)
+
+def run_staged_batch(jobs: List[Dict[str, Any]], options: Dict[str, Any], workers: Dict[str, int], queue_size: int = 8, report=None) -> List[Dict[str, Any]]:
+    """Renders the jobs on a pipeline with a separate process pool per stage.
+
+    Parsing, document assembly and PDF generation run on their own pools, connected by bounded
+    queues, so that e.g. a handful of parse workers can keep many PDF workers busy while memory
+    stays flat when the PDF stage is the bottleneck.
+
+    Args:
+        jobs (List[Dict[str, Any]]): Jobs as returned by discover_jobs()
+        options (Dict[str, Any]): Batch options passed to the stages
+        workers (Dict[str, int]): Number of worker processes for the 'parse', 'render' and 'pdf' stages
+        queue_size (int): Capacity of each queue between stages
+        report (callable, optional): Called with each result as soon as it is available
+    Returns:
+        List[Dict[str, Any]]: Results in completion order
+    """
+    from aicv.core.pipeline import Stage, run_pipeline
+
+    names = stage_names(options)
+    stages = [Stage(name, partial(_skip_failed, name, options=options), workers=workers.get(name, 1),
+                    initializer=_init_worker, initargs=(options, (name,)))
+              for name in names]
+
+    results = []
+    inboxes = {}
+    items = run_pipeline((_new_item(job) for job in jobs), stages, queue_size=queue_size, inboxes=inboxes)
+    # The pipeline's queues are created when the generator starts
+    for item in items:
+        if not results:
+            for name, inbox in inboxes.items():
+                QUEUE_DEPTH.set_function(inbox.qsize, stage=name)
+        result = _finish_item(item)
+        results.append(result)
+        if report:
+            report(result)
+    for name in inboxes:
+        QUEUE_DEPTH.clear_function(stage=name)
+    return results
+
+def add_render_arguments(parser: argparse.ArgumentParser):
+    """Adds the options selecting what to render for each CV folder."""
+    parser.add_argument('--cv-name', type=str, default='cv.md', help='Name of the Markdown file in each CV folder (default: cv.md)')
+    parser.add_argument('--output-dir', type=str, help='Write outputs to a mirror of the input tree under this directory (default: next to each cv.md)')
+    parser.add_argument('--markdown', action='store_true', help='Generate Markdown output')
+    parser.add_argument('--moderncv', action='store_true', help='Generate LaTeX output using moderncv style')
+    parser.add_argument('--pdf', '-p', action='store_true', help='Also generate PDF output (WeasyPrint for HTML, pdflatex for moderncv)')
+    parser.add_argument('--paper', type=str, default='A4', help='PDF paper size (default: A4, for WeasyPrint PDF)')
+    parser.add_argument('--no-page-numbers', action='store_true', help='Disable page numbers in PDF output (for WeasyPrint PDF)')
+    parser.add_argument('--emojis', dest='emojis', action='store_true', help='Enable emojis in CV text')
+    parser.add_argument('--no-emojis', dest='emojis', action='store_false', help='Disable emojis in CV text')
+    parser.set_defaults(emojis=None)
+
+def render_options(args: argparse.Namespace) -> Dict[str, Any]:
+    """Builds the options dict passed to the stages from arguments added by add_render_arguments()."""
+    if args.markdown:
+        backend = 'markdown'
+    elif args.moderncv:
+        backend = 'moderncv'
+    else:
+        backend = 'html'
+
+    return {
+        'backend': backend,
+        'pdf': args.pdf,
+        'emojis': args.emojis,
+        'paper': args.paper,
+        'page_numbers': not args.no_page_numbers,
+        'quiet': getattr(args, 'quiet', False),
+        'traceback': getattr(args, 'traceback', False),
+    }
+
+def main(argv=None):
+    """Entry point for `aicv batch`"""
+    parser = argparse.ArgumentParser(prog='aicv batch', description='Render every CV folder under a directory tree.')
+    parser.add_argument('root', type=str, help='Directory tree or storage URL (s3://bucket/prefix) containing CV folders (cv.md + personal.json + section JSON files) or .cvpack bundles, '
+                                               'a JSONL file with one CV per line or a CV database')
+    parser.add_argument('--template', type=str, help='Markdown template used to render every record of a JSONL file or person of a database')
+    parser.add_argument('--person', action='append', help='Only render this person of a database (can be repeated)')
+    parser.add_argument('--since', type=str, help='Only render the people of a database imported or updated since this ISO date/time')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='Number of worker processes (default: usable CPUs, respecting cgroup limits)')
+    parser.add_argument('--parse-jobs', type=int, default=None, help='Run a staged pipeline with this many processes loading JSON and executing pymd blocks')
+    parser.add_argument('--render-jobs', type=int, default=None, help='Run a staged pipeline with this many processes building HTML/Markdown/LaTeX documents')
+    parser.add_argument('--pdf-jobs', type=int, default=None, help='Run a staged pipeline with this many processes producing PDFs')
+    parser.add_argument('--queue-size', type=int, default=8, help='Capacity of the queues between pipeline stages (default: 8)')
+    parser.add_argument('--schedule', choices=['lpt', 'fifo'], default='lpt', help='Dispatch order: longest estimated job first (default) or directory order')
+    parser.add_argument('--timings', type=str, help='JSON file with per-CV timings; refines the LPT estimates and is updated after the run')
+    add_render_arguments(parser)
+    parser.add_argument('--archive', type=str, help='Write all outputs into a single archive (.zip, .tar, .tar.gz, .tar.xz, .tar.bz2 or .tar.zst) instead of separate files')
+    parser.add_argument('--manifest', type=str, help=f'Build manifest used to skip unchanged CVs (default: {MANIFEST_NAME} in the output directory or root)')
+    parser.add_argument('--no-manifest', action='store_true', help='Neither read nor write the build manifest')
+    parser.add_argument('--force', '-f', action='store_true', help='Render every CV, even if it is up to date according to the manifest')
+    parser.add_argument('--s3-endpoint', type=str, help='S3 API endpoint for s3:// URLs, e.g. http://localhost:9000 for MinIO (default: AWS_ENDPOINT_URL)')
+    parser.add_argument('--prefetch', type=int, default=4, help='Number of CVs whose inputs are read ahead from remote storage (default: 4)')
+    parser.add_argument('--metrics-file', type=str, help='Write Prometheus metrics to this file during the run, e.g. for the node_exporter textfile collector')
+    parser.add_argument('--metrics-interval', type=float, default=10.0, help='Seconds between updates of the metrics file (default: 10)')
+    parser.add_argument('--metrics-port', type=int, help='Serve Prometheus metrics at http://127.0.0.1:PORT/metrics during the run')
+    parser.add_argument('--quiet', '-q', action='store_true', help='Suppress status messages from the workers')
+    parser.add_argument('--traceback', action='store_true', help='Include tracebacks in failure reports')
+    args = parser.parse_args(argv)
+
+    options = render_options(args)
+    if args.archive:
+        # The archive is written from scratch, so there are no previous outputs to keep
+        args.no_manifest = True
+        options['collect'] = True
+
+    input_storage = output_storage = None
+    if is_url(args.root) or (args.output_dir and is_url(args.output_dir)):
+        # Documents are sent back to this process, which writes them to the storage in the background
+        options['collect'] = True
+        args.no_manifest = True
+        try:
+            if is_url(args.root):
+                input_storage = open_storage(args.root, endpoint_url=args.s3_endpoint)
+            output_storage = open_storage(args.output_dir or args.root, endpoint_url=args.s3_endpoint)
+        except ImportError as e:
+            print(f"Error: {e}")
+            return 1
+
+    if input_storage is not None:
+        options['fingerprint'] = False
+        jobs = storage_jobs(input_storage, cv_name=args.cv_name)
+        if not jobs:
+            print(f"No CV folders found under {args.root}")
+            return 1
+    elif os.path.isfile(args.root) and not args.root.endswith(BUNDLE_SUFFIX):
+        from aicv.core.database import is_database
+        if not args.template:
+            parser.error('--template is required when rendering a JSONL file or a database')
+        # The records are not separate files, so there is nothing for the manifest to fingerprint
+        args.no_manifest = True
+        options['fingerprint'] = False
+        if is_database(args.root):
+            since = datetime.fromisoformat(args.since).timestamp() if args.since else None
+            jobs = database_jobs(args.root, args.template, output_dir=args.output_dir, people=args.person, since=since)
+        else:
+            jobs = jsonl_jobs(args.root, args.template, output_dir=args.output_dir)
+        if not jobs:
+            print(f"No records found in {args.root}")
+            return 1
+    else:
+        options['fingerprint'] = not args.no_manifest
+        jobs = discover_jobs(args.root, cv_name=args.cv_name, output_dir=args.output_dir)
+        if not jobs:
+            print(f"No CV folders found under {args.root}")
+            return 1
+
+    manifest = None
+    if not args.no_manifest:
+        manifest = Manifest(args.manifest or default_manifest_path(args.root, args.output_dir))
+        if not args.force:
+            total = len(jobs)
+            jobs = [job for job in jobs if not manifest.is_up_to_date(job, options)]
+            if len(jobs) < total:
+                print(f"Skipping {total - len(jobs)} up-to-date CVs")
+        if not jobs:
+            manifest.close()
+            print("Nothing to do")
+            return 0
+
+    timings = load_timings(args.timings) if args.timings else {}
+    if args.schedule == 'lpt':
+        jobs = order_jobs(jobs, options, timings)
+
+    archive = None
+    if args.archive:
+        try:
+            archive = ArchiveWriter(args.archive)
+        except (ImportError, ValueError) as e:
+            print(f"Error: {e}")
+            return 1
+
+    staged = any(n is not None for n in (args.parse_jobs, args.render_jobs, args.pdf_jobs))
+    max_workers = args.jobs or default_jobs()
+    if staged:
+        workers = {
+            'parse': args.parse_jobs or 1,
+            'render': args.render_jobs or 1,
+            'pdf': args.pdf_jobs or max_workers,
+        }
+        print(f"Rendering {len(jobs)} CVs with {workers['parse']} parse, {workers['render']} render and {workers['pdf']} PDF processes...")
+    else:
+        print(f"Rendering {len(jobs)} CVs with {max_workers} worker processes...")
+
+    writes = []
+    remaining = [len(jobs)]
+    QUEUE_DEPTH.set_function(lambda: remaining[0], stage='batch')
+    metrics_writer = TextfileWriter(args.metrics_file, args.metrics_interval) if args.metrics_file else None
+    metrics_server = None
+    if args.metrics_port is not None:
+        metrics_server = start_http_server(args.metrics_port)
+        print(f"Serving metrics at http://127.0.0.1:{metrics_server.server_port}/metrics")
+
+    def report(result):
+        remaining[0] -= 1
+        record_metrics(result, options['backend'])
+        documents = result.pop('documents', {})
+        if archive is not None and result['ok']:
+            for name, data in documents.items():
+                archive.add(name, data)
+                result['outputs'].append(f"{args.archive}:{name}")
+        elif output_storage is not None and result['ok']:
+            for name, data in documents.items():
+                writes.append((result, output_storage.write_async(name, data)))
+                result['outputs'].append(output_storage.url(name))
+        if manifest is not None and result['ok']:
+            manifest.record(result, options, result.pop('inputs', {}), result['outputs'])
+        if result['ok']:
+            print(f"OK   {job_label(result)} ({result['elapsed']:.2f}s)")
+        else:
+            print(f"FAIL {job_label(result)}: {result['error']}")
+        sys.stdout.flush()
+
+    if input_storage is not None:
+        jobs = prefetch_inputs(jobs, input_storage, lookahead=max(1, args.prefetch))
+
+    start = time.perf_counter()
+    try:
+        if staged:
+            results = run_staged_batch(jobs, options, workers, queue_size=args.queue_size, report=report)
+        else:
+            results = run_batch(jobs, options, max_workers=max_workers, report=report)
+    finally:
+        if manifest is not None:
+            manifest.close()
+        if archive is not None:
+            archive.close()
+        for result, write in writes:
+            try:
+                write.result()
+            except Exception as e:
+                result['ok'] = False
+                print(f"FAIL {job_label(result)}: writing outputs failed: {type(e).__name__}: {e}")
+        if output_storage is not None:
+            output_storage.close()
+        if input_storage is not None and input_storage is not output_storage:
+            input_storage.close()
+        if metrics_writer is not None:
+            metrics_writer.stop()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+    elapsed = time.perf_counter() - start
+
+    if args.timings:
+        for result in results:
+            if result['ok']:
+                timings[timing_key(result, options)] = round(result['elapsed'], 4)
+        save_timings(args.timings, timings)
+
+    failed = sum(1 for result in results if not result['ok'])
+    print(f"Done: {len(results) - failed} succeeded, {failed} failed in {elapsed:.2f}s")
+    return 1 if failed else 0
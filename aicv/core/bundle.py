@@ -0,0 +1,152 @@
+"""
+Single-file CV bundles (.cvpack) for the AI-aware CV generator
+
+A bundle is an uncompressed zip archive holding everything needed to render one CV: the
+Markdown template, personal.json, the section JSON files and the photo. Its first member,
+manifest.json, names the template and lists the members. As the members are stored, not
+compressed, each of them is read with a seek and a read through the single open file handle,
+without unpacking anything.
+"""
+import argparse
+import json
+import os
+import re
+import zipfile
+from typing import Dict, Any, BinaryIO, List, Optional, Union
+from aicv.core.sources import DataSource
+
+BUNDLE_SUFFIX = '.cvpack'
+# Every zip archive, and so every bundle, starts with a local file header
+BUNDLE_MAGIC = b'PK\x03\x04'
+MANIFEST_NAME = 'manifest.json'
+FORMAT_VERSION = 1
+
+# JSON file names quoted in a template, such as render('employment.json')
+_JSON_NAME = re.compile(r'''['"]([^'"\n]+\.json)['"]''')
+
+def create_bundle(input_dir: str, output_path: str, cv_name: str = 'cv.md') -> List[str]:
+    """Packs a CV folder into a bundle.
+
+    The template, personal.json, the section JSON files, any other JSON file of the folder that the
+    template names (pymd blocks may read them) and the photo named in personal.json are included.
+    Other files of the folder, such as build manifests, are left out.
+
+    Args:
+        input_dir (str): CV folder
+        output_path (str): Path of the bundle to create
+        cv_name (str): Name of the Markdown file in the folder
+    Returns:
+        List[str]: Names of the members, manifest excluded
+    Raises:
+        ValueError: If the template names a file called manifest.json, which is reserved for the bundle manifest
+    """
+    from aicv.core.batch import SECTION_FILES
+
+    with open(os.path.join(input_dir, 'personal.json'), 'r', encoding='utf-8') as f:
+        personal = json.load(f)
+    with open(os.path.join(input_dir, cv_name), 'r', encoding='utf-8') as f:
+        declared = set(_JSON_NAME.findall(f.read()))
+    if MANIFEST_NAME in declared:
+        raise ValueError(f"{os.path.join(input_dir, cv_name)} reads {MANIFEST_NAME}, which is reserved for the bundle manifest")
+
+    members = [cv_name, 'personal.json']
+    for name in sorted(declared.union(SECTION_FILES)):
+        name = os.path.normpath(name).replace(os.sep, '/')
+        if name in members or os.path.isabs(name) or name.startswith('../'):
+            continue
+        if os.path.isfile(os.path.join(input_dir, name)):
+            members.append(name)
+    photo = personal.get('photo')
+    if photo and not os.path.isabs(photo) and os.path.isfile(os.path.join(input_dir, photo)):
+        members.append(os.path.normpath(photo).replace(os.sep, '/'))
+
+    manifest = {'format': 'cvpack', 'version': FORMAT_VERSION, 'template': cv_name, 'members': members}
+    tmp_path = output_path + '.tmp'
+    with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_STORED) as bundle:
+        bundle.writestr(MANIFEST_NAME, json.dumps(manifest, indent=2))
+        for name in members:
+            bundle.write(os.path.join(input_dir, name), name)
+    os.replace(tmp_path, output_path)
+    return members
+
+class BundleSource(DataSource):
+    """The files of a .cvpack bundle, read through one open file handle.
+
+    Args:
+        path (str or BinaryIO): Path to the bundle, or a seekable binary file holding it, e.g. an
+            io.BytesIO of a bundle read from stdin
+    """
+    def __init__(self, path: Union[str, BinaryIO]):
+        self._zip = zipfile.ZipFile(path, 'r')
+        # Error messages name the bundle by its path
+        self.path = path if isinstance(path, str) else getattr(path, 'name', '<bundle>')
+        try:
+            self.manifest = json.loads(self._zip.read(MANIFEST_NAME))
+        except KeyError:
+            self._zip.close()
+            raise ValueError(f"{path} is not a CV bundle: {MANIFEST_NAME} is missing")
+        if self.manifest.get('version', 0) > FORMAT_VERSION:
+            self._zip.close()
+            raise ValueError(f"{path} was created by a newer version of aicv")
+
+    @property
+    def template(self) -> str:
+        """Name of the Markdown template in the bundle."""
+        return self.manifest.get('template', 'cv.md')
+
+    def _member(self, name: str) -> str:
+        return os.path.normpath(name).replace(os.sep, '/')
+
+    def read_bytes(self, name: str) -> bytes:
+        try:
+            return self._zip.read(self._member(name))
+        except KeyError:
+            raise FileNotFoundError(f"{name} (in {self.path})")
+
+    def exists(self, name: str) -> bool:
+        try:
+            self._zip.getinfo(self._member(name))
+            return True
+        except KeyError:
+            return False
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+def pack_main(argv=None):
+    """Entry point for `aicv pack`"""
+    from aicv.core.batch import discover_jobs
+
+    parser = argparse.ArgumentParser(prog='aicv pack', description='Pack CV folders into single-file .cvpack bundles.')
+    parser.add_argument('root', type=str, help='CV folder, or directory tree containing CV folders')
+    parser.add_argument('--cv-name', type=str, default='cv.md', help='Name of the Markdown file in each CV folder (default: cv.md)')
+    parser.add_argument('--output-dir', type=str, help='Write the bundles to a mirror of the input tree under this directory (default: next to each folder)')
+    args = parser.parse_args(argv)
+
+    # Folders that were packed before are packed again
+    jobs = [job for job in discover_jobs(args.root, cv_name=args.cv_name, output_dir=args.output_dir, include_packed=True)
+            if not job['cv_path'].endswith(BUNDLE_SUFFIX)]
+    if not jobs:
+        print(f"No CV folders found under {args.root}")
+        return 1
+    failed = 0
+    for job in jobs:
+        # A folder is packed into <folder>.cvpack, next to it or in the mirror tree
+        output_path = os.path.dirname(job['output_base']) + BUNDLE_SUFFIX
+        if os.path.dirname(output_path):
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        try:
+            create_bundle(job['input_dir'], output_path, cv_name=args.cv_name)
+        except ValueError as e:
+            print(f"Error: {e}")
+            failed += 1
+            continue
+        print(f"Bundle saved to {output_path}")
+    return 1 if failed else 0
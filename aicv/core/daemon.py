@@ -0,0 +1,396 @@
+"""
+Resident server for the AI-aware CV generator
+
+Every `aicv` invocation imports Python-Markdown and, for PDFs, WeasyPrint, whose font
+configuration is rebuilt from scratch each time. `aicv daemon start` pays for this once: the
+server imports everything, renders a tiny PDF to load the fonts, then forks a few workers that
+share the warm memory copy-on-write. The workers accept connections on a Unix socket; each
+request is a command line, run with the caller's working directory and environment.
+
+The `aicv` command forwards to the server when its socket exists and falls back to running in
+process otherwise, so nothing changes for the caller apart from the speed.
+"""
+import json
+import os
+import socket
+import stat
+import struct
+import sys
+from typing import Any, Dict, List, Optional
+
+# Disables forwarding to the server when set to a non-empty value; the server sets it for itself
+NO_DAEMON_ENV = 'AICV_NO_DAEMON'
+SOCKET_ENV = 'AICV_SOCKET'
+
+# A worker is replaced after this many requests, so that leaks of user pymd code cannot accumulate
+DEFAULT_MAX_REQUESTS = 1000
+
+# Environment variables a request takes from the caller: those aicv, boto3, WeasyPrint and the TeX tools
+# read. Everything else comes from the server's own environment.
+FORWARDED_ENV = ('PATH', 'HOME', 'LANG', 'LANGUAGE', 'TMPDIR', 'TZ', SOCKET_ENV)
+FORWARDED_ENV_PREFIXES = ('AWS_', 'LC_', 'TEX', 'BIB', 'FONTCONFIG_')
+
+def socket_path() -> str:
+    """Path of the server socket: $AICV_SOCKET, else aicv.sock in $XDG_RUNTIME_DIR, else in a private
+    aicv-<uid> directory in /tmp."""
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return path
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, 'aicv.sock')
+    return os.path.join('/tmp', f"aicv-{os.getuid()}", 'aicv.sock')
+
+def _is_private(path: str, kind) -> bool:
+    """Whether path is of the given kind (stat.S_ISSOCK, stat.S_ISDIR), not a symlink, owned by the
+    current user and closed to group and others."""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return kind(st.st_mode) and st.st_uid == os.getuid() and not st.st_mode & 0o077
+
+def _private_directory(path: str):
+    """Creates the directory of the socket in /tmp, where other users could otherwise create it first."""
+    directory = os.path.dirname(path)
+    if os.path.dirname(directory) != '/tmp':
+        return
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    if not _is_private(directory, stat.S_ISDIR):
+        raise RuntimeError(f"{directory} is not a private directory of the current user")
+
+def _forwarded_env(env: Dict[str, str]) -> Dict[str, str]:
+    return {name: value for name, value in env.items()
+            if name in FORWARDED_ENV or name.startswith(FORWARDED_ENV_PREFIXES)}
+
+def _pid_path(path: str) -> str:
+    return path + '.pid'
+
+def _send(conn: socket.socket, message: Dict[str, Any]):
+    conn.sendall(json.dumps(message).encode('utf-8'))
+    conn.shutdown(socket.SHUT_WR)
+
+def _receive(conn: socket.socket) -> Dict[str, Any]:
+    chunks = []
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return json.loads(b''.join(chunks).decode('utf-8'))
+
+def _connect(path: str) -> Optional[socket.socket]:
+    """Connects to the server socket, if it is one of the current user's own. Requests carry the caller's
+    environment and the server's reply is trusted, so a socket that another user could have created is
+    never used."""
+    if not _is_private(path, stat.S_ISSOCK):
+        return None
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(path)
+        if hasattr(socket, 'SO_PEERCRED'):
+            # The process listening must run as the current user too
+            credentials = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+            _, uid, _ = struct.unpack('3i', credentials)
+            if uid != os.getuid():
+                raise PermissionError(f"the server on {path} runs as user {uid}")
+    except OSError:
+        conn.close()
+        return None
+    return conn
+
+def forward(argv: List[str]) -> Optional[int]:
+    """Runs a command line on the server, if one is running.
+
+    The server relays text, so a command line that reads stdin or writes a document to stdout must
+    not be forwarded; main() runs those in process.
+
+    Returns:
+        int: The exit status of the command, or None if there is no server to forward to; the caller
+            then runs the command itself
+    """
+    if os.environ.get(NO_DAEMON_ENV):
+        return None
+    path = socket_path()
+    if not os.path.lexists(path):
+        return None
+    conn = _connect(path)
+    if conn is None:
+        # A stale socket of a server that is gone, or one that is not the user's own
+        return None
+    try:
+        # Once the server has the request, it must not run twice: errors from here on are not a reason to fall back
+        _send(conn, {'argv': argv, 'cwd': os.getcwd(), 'env': _forwarded_env(os.environ)})
+        reply = _receive(conn)
+    finally:
+        conn.close()
+    sys.stdout.write(reply.get('stdout', ''))
+    sys.stderr.write(reply.get('stderr', ''))
+    sys.stdout.flush()
+    return reply.get('status', 1)
+
+def warm_up():
+    """Imports the backends and loads the fonts, so that the forked workers inherit them."""
+    import aicv.main  # noqa: F401
+    import aicv.backend.html  # noqa: F401
+    import aicv.backend.markdown  # noqa: F401
+    import aicv.backend.moderncv  # noqa: F401
+    import aicv.utils.latex_compiler  # noqa: F401
+    from aicv.core.extensions import markdown_converter
+    # The workers inherit a converter that is set up already
+    with markdown_converter() as md:
+        md.convert('# aicv')
+    try:
+        from aicv.utils.pdf_converter import html_to_pdf_bytes
+        # The first layout loads the font configuration, which is the slow part of a small PDF
+        html_to_pdf_bytes('<html><body><h1>aicv</h1><p>aicv</p></body></html>', add_page_numbers=True)
+    except Exception as e:
+        print(f"WeasyPrint is not available, PDFs from HTML will fail: {e}")
+
+def _run_request(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs one command line as if `aicv` had been started in the caller's directory, with the caller's
+    values of the variables in FORWARDED_ENV."""
+    import contextlib
+    import io
+    from aicv.main import main
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    saved_cwd, saved_env = os.getcwd(), dict(os.environ)
+    try:
+        os.chdir(request['cwd'])
+        os.environ.clear()
+        os.environ.update({name: value for name, value in saved_env.items() if name not in _forwarded_env(saved_env)})
+        os.environ.update(_forwarded_env(request.get('env', {})))
+        os.environ[NO_DAEMON_ENV] = '1'
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                status = main(request['argv'])
+            except SystemExit as e:
+                # argparse exits on --help and on usage errors
+                status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                if isinstance(e.code, str):
+                    print(e.code, file=sys.stderr)
+            except Exception as e:
+                print(f"Error: {type(e).__name__}: {e}", file=sys.stderr)
+                status = 1
+    finally:
+        os.chdir(saved_cwd)
+        os.environ.clear()
+        os.environ.update(saved_env)
+    return {'status': status or 0, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue()}
+
+def _worker_loop(server: socket.socket, max_requests: int):
+    import signal
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for _ in range(max_requests):
+        conn, _ = server.accept()
+        try:
+            request = _receive(conn)
+            if request.get('command') == 'ping':
+                reply = {'status': 0, 'pid': os.getppid(), 'worker': os.getpid()}
+            else:
+                reply = _run_request(request)
+            _send(conn, reply)
+        except Exception as e:
+            # The client went away, or sent garbage; the worker keeps serving
+            print(f"Request failed: {type(e).__name__}: {e}", file=sys.stderr)
+        finally:
+            conn.close()
+
+class _Stop(Exception):
+    pass
+
+def serve(path: str, workers: int = 4, max_requests: int = DEFAULT_MAX_REQUESTS):
+    """Warms up, then serves requests on a Unix socket with pre-forked workers until SIGTERM or SIGINT.
+
+    Args:
+        path (str): Path of the socket
+        workers (int): Number of worker processes
+        max_requests (int): Requests served by a worker before it is replaced
+    """
+    import signal
+
+    os.environ[NO_DAEMON_ENV] = '1'
+    _private_directory(path)
+    warm_up()
+
+    if os.path.lexists(path):
+        conn = _connect(path)
+        if conn is not None:
+            conn.close()
+            raise RuntimeError(f"An aicv server is already listening on {path}")
+        os.unlink(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+        # Only the owner may connect: requests run arbitrary pymd code as the server's user
+        server.bind(path)
+    finally:
+        os.umask(old_umask)
+    server.listen(128)
+    with open(_pid_path(path), 'w') as f:
+        f.write(str(os.getpid()))
+
+    def stop(signum, frame):
+        raise _Stop()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    def spawn() -> int:
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                _worker_loop(server, max_requests)
+            except BaseException:
+                status = 1
+            finally:
+                os._exit(status)
+        return pid
+
+    children = {spawn() for _ in range(max(1, workers))}
+    print(f"aicv server listening on {path} with {len(children)} workers (pid {os.getpid()})")
+    sys.stdout.flush()
+    try:
+        while True:
+            pid, _ = os.wait()
+            if pid in children:
+                # A worker retired after max_requests, or crashed: keep the pool at full size
+                children.discard(pid)
+                children.add(spawn())
+    except _Stop:
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in children:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        server.close()
+        for name in (path, _pid_path(path)):
+            try:
+                os.unlink(name)
+            except FileNotFoundError:
+                pass
+        print("aicv server stopped")
+
+def _daemonize(log_path: str) -> bool:
+    """Detaches a copy of the process from the terminal, with its output going to log_path.
+
+    Returns:
+        bool: True in the detached process, False in the original one
+    """
+    sys.stdout.flush()
+    if os.fork() > 0:
+        return False
+    os.setsid()
+    if os.fork() > 0:
+        os._exit(0)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    with open(os.devnull, 'rb') as devnull:
+        os.dup2(devnull.fileno(), 0)
+    with open(log_path, 'ab') as log:
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+    return True
+
+def status(path: str) -> Optional[Dict[str, Any]]:
+    """Pings the server. Returns its reply, or None if no server is running."""
+    conn = _connect(path) if os.path.lexists(path) else None
+    if conn is None:
+        return None
+    try:
+        _send(conn, {'command': 'ping'})
+        return _receive(conn)
+    finally:
+        conn.close()
+
+def daemon_main(argv=None):
+    """Entry point for `aicv daemon`"""
+    import argparse
+    import signal
+    import time
+
+    parser = argparse.ArgumentParser(prog='aicv daemon', description='Run a resident aicv server that keeps imports and fonts warm.')
+    parser.add_argument('command', choices=['start', 'stop', 'status'], help='Start, stop or query the server')
+    parser.add_argument('--socket', type=str, help=f'Path of the server socket (default: ${SOCKET_ENV}, or aicv.sock in $XDG_RUNTIME_DIR or /tmp/aicv-<uid>)')
+    parser.add_argument('--workers', '-j', type=int, default=4, help='Number of pre-forked worker processes (default: 4)')
+    parser.add_argument('--max-requests', type=int, default=DEFAULT_MAX_REQUESTS, help=f'Requests served by a worker before it is replaced (default: {DEFAULT_MAX_REQUESTS})')
+    parser.add_argument('--foreground', action='store_true', help='Do not detach from the terminal')
+    parser.add_argument('--log', type=str, help='Log file of a detached server (default: the socket path with .log appended)')
+    args = parser.parse_args(argv)
+    path = args.socket or socket_path()
+
+    if args.command == 'status':
+        reply = status(path)
+        if reply is None:
+            print(f"No aicv server on {path}")
+            return 1
+        print(f"aicv server running on {path} (pid {reply['pid']})")
+        return 0
+
+    if args.command == 'stop':
+        try:
+            with open(_pid_path(path), 'r') as f:
+                pid = int(f.read())
+            os.kill(pid, signal.SIGTERM)
+        except (OSError, ValueError):
+            print(f"No aicv server on {path}")
+            return 1
+        # Wait for the server to remove its socket, so that the next command runs in process
+        for _ in range(100):
+            if not os.path.exists(path):
+                break
+            time.sleep(0.05)
+        print(f"Stopped aicv server {pid}")
+        return 0
+
+    if status(path) is not None:
+        print(f"An aicv server is already running on {path}")
+        return 1
+    try:
+        _private_directory(path)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return 1
+    if args.foreground:
+        try:
+            serve(path, workers=args.workers, max_requests=args.max_requests)
+        except RuntimeError as e:
+            print(f"Error: {e}")
+            return 1
+        return 0
+
+    log_path = args.log or path + '.log'
+    if _daemonize(log_path):
+        status_code = 0
+        try:
+            serve(path, workers=args.workers, max_requests=args.max_requests)
+        except BaseException as e:
+            print(f"Error: {type(e).__name__}: {e}")
+            status_code = 1
+        finally:
+            sys.stdout.flush()
+            os._exit(status_code)
+
+    # The warm-up takes a moment; report once the server answers
+    for _ in range(600):
+        reply = status(path)
+        if reply is not None:
+            print(f"aicv server running on {path} (pid {reply['pid']}, log: {log_path})")
+            return 0
+        time.sleep(0.05)
+    print(f"Error: the aicv server did not start, see {log_path}")
+    return 1
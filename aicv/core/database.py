@@ -0,0 +1,272 @@
+"""
+SQLite database of CV data for the AI-aware CV generator
+
+The database holds the content of personal.json, employment.json, education.json and
+publications.json for many people, in the tables people, jobs, degrees and publications.
+Each entry keeps its JSON object as it was imported, plus the columns used to select and
+order the entries, so that pymd blocks get exactly the data they would read from the files.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Optional
+from aicv.core.sources import DataSource
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS people (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    personal TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    person_id INTEGER NOT NULL REFERENCES people (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    company TEXT,
+    start_date TEXT,
+    end_date TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (person_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS degrees (
+    person_id INTEGER NOT NULL REFERENCES people (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    institution TEXT,
+    degree TEXT,
+    end_date TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (person_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS publications (
+    person_id INTEGER NOT NULL REFERENCES people (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    citation_key TEXT,
+    type TEXT,
+    year TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (person_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS people_by_updated ON people (updated);
+-- Created by earlier versions; entries are only ever read by person
+DROP INDEX IF EXISTS publications_by_year;
+'''
+
+# Section (the key of the JSON file, e.g. employment.json) -> table and the entry fields stored as columns
+SECTION_TABLES = {
+    'employment': ('jobs', ('company', 'start_date', 'end_date')),
+    'education': ('degrees', ('institution', 'degree', 'end_date')),
+    'publications': ('publications', ('citation_key', 'type', 'year')),
+}
+
+_local = threading.local()
+
+def is_database(path: str) -> bool:
+    """Checks whether a file is a SQLite database."""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(16) == b'SQLite format 3\x00'
+    except OSError:
+        return False
+
+def connect(path: str) -> sqlite3.Connection:
+    """Returns a read-only connection to the database, opened once per thread and reused afterwards,
+    so that all the CVs rendered by a batch worker share it."""
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    path = os.path.abspath(path)
+    conn = connections.get(path)
+    if conn is None:
+        conn = connections[path] = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    return conn
+
+def find_person(conn: sqlite3.Connection, key: str) -> Optional[int]:
+    """Returns the id of the person with the given key, or None."""
+    row = conn.execute('SELECT id FROM people WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else None
+
+class CVDatabase:
+    """A database of CV data, opened for reading and importing.
+
+    Args:
+        path (str): Path to the SQLite file, created if needed
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def import_person(self, key: str, personal: Dict[str, Any], sections: Dict[str, List[Dict[str, Any]]]) -> int:
+        """Inserts or replaces the data of one person.
+
+        Args:
+            key (str): Unique name of the person, e.g. the path of their CV folder
+            personal (Dict[str, Any]): Content of personal.json
+            sections (Dict[str, List[Dict[str, Any]]]): Entries by section ('employment', 'education', 'publications')
+        Returns:
+            int: The id of the person
+        """
+        with self.conn:
+            person_id = find_person(self.conn, key)
+            if person_id is not None:
+                self.conn.execute('UPDATE people SET personal = ?, updated = ? WHERE id = ?',
+                                  (json.dumps(personal, ensure_ascii=False), time.time(), person_id))
+                for table, _ in SECTION_TABLES.values():
+                    self.conn.execute(f'DELETE FROM {table} WHERE person_id = ?', (person_id,))
+            else:
+                person_id = self.conn.execute('INSERT INTO people (key, personal, updated) VALUES (?, ?, ?)',
+                                              (key, json.dumps(personal, ensure_ascii=False), time.time())).lastrowid
+
+            for section, entries in sections.items():
+                table, columns = SECTION_TABLES[section]
+                placeholders = ', '.join('?' * (len(columns) + 3))
+                self.conn.executemany(
+                    f"INSERT INTO {table} (person_id, position, {', '.join(columns)}, data) VALUES ({placeholders})",
+                    [(person_id, position, *(_column(entry.get(column)) for column in columns), json.dumps(entry, ensure_ascii=False))
+                     for position, entry in enumerate(entries)])
+        return person_id
+
+    def import_folder(self, key: str, input_dir: str) -> int:
+        """Imports personal.json and the section JSON files of a CV folder. A relative photo path
+        is made absolute, so that the photo is still found when rendering from the database."""
+        with open(os.path.join(input_dir, 'personal.json'), 'r', encoding='utf-8') as f:
+            personal = json.load(f)
+        photo = personal.get('photo')
+        if photo and not os.path.isabs(photo) and os.path.exists(os.path.join(input_dir, photo)):
+            personal['photo'] = os.path.abspath(os.path.join(input_dir, photo))
+
+        sections = {}
+        for section in SECTION_TABLES:
+            path = os.path.join(input_dir, section + '.json')
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    sections[section] = json.load(f).get(section, [])
+        return self.import_person(key, personal, sections)
+
+    def people(self, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Lists the people as dicts with 'id', 'key' and 'size' (bytes of JSON data, a cost estimate),
+        optionally only those imported or updated since the given time."""
+        query = '''SELECT id, key, length(personal)
+                       + (SELECT coalesce(sum(length(data)), 0) FROM jobs WHERE person_id = people.id)
+                       + (SELECT coalesce(sum(length(data)), 0) FROM degrees WHERE person_id = people.id)
+                       + (SELECT coalesce(sum(length(data)), 0) FROM publications WHERE person_id = people.id)
+                   FROM people'''
+        params = ()
+        if since is not None:
+            query += ' WHERE updated >= ?'
+            params = (since,)
+        return [{'id': row[0], 'key': row[1], 'size': row[2]}
+                for row in self.conn.execute(query + ' ORDER BY key', params)]
+
+def _column(value):
+    # Only scalars go into the indexed columns; the full entry is kept in data
+    return value if isinstance(value, (str, int, float)) or value is None else json.dumps(value)
+
+class SQLiteSource(DataSource):
+    """The data of one person in a CV database.
+
+    'personal.json' reads the person's personal info and the section files ('employment.json',
+    'education.json', 'publications.json') the entries of the corresponding table, in their
+    original order, with one indexed query each. Other names, such as the template or the photo,
+    are looked up in the fallback source.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the database, e.g. from connect()
+        person_id (int): Id of the person in the people table
+        fallback (DataSource, optional): Source for the names that are not in the database
+    """
+    def __init__(self, conn: sqlite3.Connection, person_id: int, fallback: Optional[DataSource] = None):
+        self.conn = conn
+        self.person_id = person_id
+        self.fallback = fallback
+
+    def _section(self, name: str):
+        stem, ext = os.path.splitext(os.path.basename(name))
+        if ext != '.json':
+            return None
+        if stem == 'personal':
+            row = self.conn.execute('SELECT personal FROM people WHERE id = ?', (self.person_id,)).fetchone()
+            if row is None:
+                raise KeyError(f"No person with id {self.person_id}")
+            return json.loads(row[0])
+        if stem in SECTION_TABLES:
+            table, _ = SECTION_TABLES[stem]
+            rows = self.conn.execute(f'SELECT data FROM {table} WHERE person_id = ? ORDER BY position', (self.person_id,))
+            return {stem: [json.loads(row[0]) for row in rows]}
+        return None
+
+    def load_json(self, name: str) -> Any:
+        data = self._section(name)
+        if data is not None:
+            return data
+        if self.fallback is None:
+            raise FileNotFoundError(name)
+        return self.fallback.load_json(name)
+
+    def read_bytes(self, name: str) -> bytes:
+        data = self._section(name)
+        if data is not None:
+            return json.dumps(data, ensure_ascii=False).encode('utf-8')
+        if self.fallback is None:
+            raise FileNotFoundError(name)
+        return self.fallback.read_bytes(name)
+
+    def locate(self, name: str) -> Optional[str]:
+        stem, ext = os.path.splitext(os.path.basename(name))
+        if (ext == '.json' and (stem == 'personal' or stem in SECTION_TABLES)) or self.fallback is None:
+            return None
+        return self.fallback.locate(name)
+
+    def searched(self, name: str) -> List[str]:
+        stem, ext = os.path.splitext(os.path.basename(name))
+        if (ext == '.json' and (stem == 'personal' or stem in SECTION_TABLES)) or self.fallback is None:
+            return []
+        return self.fallback.searched(name)
+
+def db_main(argv=None):
+    """Entry point for `aicv db`"""
+    from aicv.core.batch import discover_jobs
+    from aicv.core.bundle import BUNDLE_SUFFIX
+
+    parser = argparse.ArgumentParser(prog='aicv db', description='Manage a SQLite database of CV data.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    imp = commands.add_parser('import', help='Import every CV folder under a directory tree')
+    imp.add_argument('db', type=str, help='Path to the SQLite database, created if needed')
+    imp.add_argument('root', type=str, help='Directory tree containing CV folders')
+    imp.add_argument('--cv-name', type=str, default='cv.md', help='Name of the Markdown file in each CV folder (default: cv.md)')
+
+    ls = commands.add_parser('list', help='List the people in the database')
+    ls.add_argument('db', type=str, help='Path to the SQLite database')
+
+    args = parser.parse_args(argv)
+    with CVDatabase(args.db) as database:
+        if args.command == 'import':
+            jobs = discover_jobs(args.root, cv_name=args.cv_name, include_packed=True)
+            # A bundle keeps its photo inside, where rendering from the database could not find it
+            bundles = [job for job in jobs if job['cv_path'].endswith(BUNDLE_SUFFIX)]
+            jobs = [job for job in jobs if not job['cv_path'].endswith(BUNDLE_SUFFIX)]
+            for job in jobs:
+                # The folder relative to the tree identifies the person, so importing again updates them
+                database.import_folder(os.path.dirname(job['name']) or '.', job['input_dir'])
+            print(f"Imported {len(jobs)} CV folders into {args.db}")
+            if bundles:
+                print(f"Skipped {len(bundles)} {BUNDLE_SUFFIX} bundles; import the folders they were packed from instead")
+        elif args.command == 'list':
+            for person in database.people():
+                print(person['key'])
+    return 0
@@ -0,0 +1,168 @@
+"""
+Deadline-aware generation for the AI-aware CV generator
+
+Executing the pymd blocks and assembling the HTML, Markdown or LaTeX document takes
+milliseconds; the PDF takes seconds, and much longer when WeasyPrint meets a large document or
+pdflatex gets stuck. generate_with_deadline() returns the document as soon as it is built and
+waits for the PDF only as long as the caller's latency budget allows. A PDF that is late keeps
+rendering in the background, and the caller gets a future for it.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Dict, Any, Optional
+from aicv.core.metrics import DOCUMENTS, track_stage
+from aicv.core.processor import assemble, latex_files, load_personal_info, preprocess
+from aicv.core.sources import DataSource
+
+# PDF status reported by generate_with_deadline()
+PDF_NONE = 'none'        # No PDF was requested
+PDF_DONE = 'done'        # The PDF is in the result
+PDF_PENDING = 'pending'  # The PDF is still rendering; see 'pdf_future'
+PDF_FAILED = 'failed'    # The PDF could not be produced; see 'pdf_error'
+
+_pdf_executor = None
+_pdf_executor_lock = threading.Lock()
+
+def _executor() -> ThreadPoolExecutor:
+    # Shared by all requests; its threads are joined at interpreter exit, so pending PDFs are finished
+    global _pdf_executor
+    with _pdf_executor_lock:
+        if _pdf_executor is None:
+            _pdf_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='aicv-pdf')
+        return _pdf_executor
+
+def make_pdf(content: str, backend: str, options: Dict[str, Any], timings: Optional[Dict[str, float]] = None) -> bytes:
+    """Makes the PDF of a document: with pdflatex for moderncv, otherwise with WeasyPrint.
+
+    Args:
+        content (str): The LaTeX or HTML document
+        backend (str): Backend the document was generated with
+        options (Dict[str, Any]): 'paper_size', 'add_page_numbers' and 'base_url' for WeasyPrint,
+            'pdf_timeout' and 'latex_files' (see compile_latex_to_pdf_bytes()) for pdflatex, and
+            'pdf_path', a local path or storage URL the PDF is also written to, with the S3 API
+            endpoint in 'endpoint_url'
+        timings (Dict[str, float], optional): Receives the seconds spent, as 'pdf'
+    Returns:
+        bytes: The PDF
+
+    Raises:
+        RuntimeError: If LaTeX compilation fails
+    """
+    if timings is None:
+        timings = {}
+    start = time.perf_counter()
+    try:
+        with track_stage('pdf', backend):
+            if backend == 'moderncv':
+                from aicv.utils.latex_compiler import compile_latex_to_pdf_bytes
+                use_bibtex = '\\addbibresource' in content and '\\begin{filecontents}' in content
+                pdf = compile_latex_to_pdf_bytes(content, use_bibtex=use_bibtex, timeout=options.get('pdf_timeout'),
+                                                 files=options.get('latex_files'))
+                if pdf is None:
+                    raise RuntimeError("LaTeX compilation failed")
+            else:
+                from aicv.utils.pdf_converter import html_to_pdf_bytes
+                pdf = html_to_pdf_bytes(content, paper_size=options.get('paper_size', 'A4'),
+                                        add_page_numbers=options.get('add_page_numbers', True), base_url=options.get('base_url'))
+        if options.get('pdf_path'):
+            from aicv.utils.storage import save_output
+            save_output(options['pdf_path'], pdf, endpoint_url=options.get('endpoint_url'))
+            print(f"PDF saved to {options['pdf_path']}")
+        return pdf
+    finally:
+        timings['pdf'] = time.perf_counter() - start
+
+def generate_with_deadline(file_path: str, backend: str = 'html', pdf: bool = False, deadline: Optional[float] = None,
+                           personal_info: Optional[Dict[str, Any]] = None, emojis: Optional[bool] = None,
+                           source: Optional[DataSource] = None, pdf_path: Optional[str] = None, paper_size: str = 'A4',
+                           add_page_numbers: bool = True, base_url: Optional[str] = None,
+                           pdf_timeout: Optional[float] = None, block_workers: int = 0,
+                           endpoint_url: Optional[str] = None) -> Dict[str, Any]:
+    """Generates a CV document and, optionally, its PDF within a latency budget.
+
+    The document is always returned. If the PDF is not ready when the deadline expires, the
+    result has the 'pending' PDF status and the PDF keeps rendering in the background: it is
+    written to pdf_path when given, and 'pdf_future' resolves to its bytes.
+
+    Args:
+        file_path (str): Path to the Markdown file (or its name in the data source)
+        backend (str): 'html', 'markdown' or 'moderncv'. The PDF is made from HTML with WeasyPrint,
+            or from LaTeX with pdflatex for moderncv.
+        pdf (bool): Whether to produce the PDF as well
+        deadline (float, optional): Latency budget in seconds from the call. Defaults to waiting for the PDF.
+        personal_info (Dict[str, Any], optional): Personal information; loaded from the source or
+            the directory of file_path if not given
+        emojis (bool, optional): Whether to enable emojis. Defaults to True for html only.
+        source (DataSource, optional): Data source to read the Markdown and JSON files from
+        pdf_path (str, optional): Local path or storage URL the PDF is written to once it is ready
+        paper_size (str): Paper size for WeasyPrint
+        add_page_numbers (bool): Whether WeasyPrint adds page numbers
+        base_url (str, optional): Base for resolving relative URLs in the HTML
+        pdf_timeout (float, optional): Seconds after which a stuck pdflatex is killed, deadline or not
+        block_workers (int): If more than 1, the pymd blocks run concurrently on as many threads
+        endpoint_url (str, optional): S3 API endpoint for an s3:// pdf_path
+    Returns:
+        Dict[str, Any]: 'content' (the document), 'backend', 'pdf_status' (see PDF_*), 'pdf' (bytes
+            or None), 'pdf_future' (Future or None), 'pdf_error' (str or None), 'timings' (seconds
+            per stage: load, parse, render, pdf; 'pdf' is filled in when a pending PDF completes)
+            and 'elapsed' (seconds until the call returned)
+    """
+    start = time.perf_counter()
+    timings = {}
+
+    if personal_info is None:
+        personal_info = load_personal_info(os.path.dirname(os.path.abspath(file_path)), source=source)
+        timings['load'] = time.perf_counter() - start
+
+    if emojis is None or backend == 'moderncv':
+        emojis = backend == 'html'
+
+    try:
+        stage_start = time.perf_counter()
+        with track_stage('parse', backend):
+            processed_content, bib_content = preprocess(file_path, personal_info, backend=backend, emojis=emojis, source=source,
+                                                        block_workers=block_workers)
+        timings['parse'] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        with track_stage('render', backend):
+            content = assemble(processed_content, personal_info, backend=backend, emojis=emojis, bib_content=bib_content, source=source)
+        timings['render'] = time.perf_counter() - stage_start
+    except Exception:
+        DOCUMENTS.inc(backend=backend, status='failed')
+        raise
+    DOCUMENTS.inc(backend=backend, status='ok')
+
+    result = {'content': content, 'backend': backend, 'pdf_status': PDF_NONE, 'pdf': None, 'pdf_future': None,
+              'pdf_error': None, 'timings': timings}
+    if pdf and backend != 'markdown':
+        options = {'paper_size': paper_size, 'add_page_numbers': add_page_numbers, 'base_url': base_url,
+                   'pdf_path': pdf_path, 'pdf_timeout': pdf_timeout, 'endpoint_url': endpoint_url}
+        if backend == 'moderncv':
+            options['latex_files'] = latex_files(personal_info, source)
+        future = _executor().submit(make_pdf, content, backend, options, timings)
+        result['pdf_future'] = future
+        remaining = None if deadline is None else max(0.0, deadline - (time.perf_counter() - start))
+        try:
+            result['pdf'] = future.result(timeout=remaining)
+            result['pdf_status'] = PDF_DONE
+        except TimeoutError:
+            result['pdf_status'] = PDF_PENDING
+            future.add_done_callback(_report_late_failure)
+        except Exception as e:
+            result['pdf_status'] = PDF_FAILED
+            result['pdf_error'] = f"{type(e).__name__}: {e}"
+
+    result['elapsed'] = time.perf_counter() - start
+    return result
+
+def _report_late_failure(future: Future):
+    # Nobody waits for a pending PDF, so its failure would otherwise go unnoticed
+    if not future.cancelled() and future.exception() is not None:
+        print(f"PDF generation failed: {type(future.exception()).__name__}: {future.exception()}")
+
+def format_timings(timings: Dict[str, float]) -> str:
+    """Formats stage timings as 'load 0.002s, parse 0.015s, ...'."""
+    return ', '.join(f"{stage} {seconds:.3f}s" for stage, seconds in timings.items())
@@ -1,115 +1,323 @@
 """
 Custom Markdown extensions for the AI-aware CV generator
 """
-import sys
-import io
+import ast
+import os
 import re
-from markdown.extensions import Extension
-from markdown.preprocessors import Preprocessor
+import threading
+from contextlib import contextmanager
+from functools import lru_cache, partial
+from aicv.core.output import capture, emit
 from aicv.renderers import render
-from aicv.backend.html import EmojisFormatterHtml
-from aicv.backend.markdown import EmojisFormatterMarkdown
-from aicv.backend.moderncv import EmojisFormatterModernCV
 from aicv.utils.escape_latex import escape_latex
 
-class PyMdExtension(Extension):
-    """A custom Markdown extension to handle `pymd` blocks."""
-    def extendMarkdown(self, md):
-        md.registerExtension(self)
-        md.preprocessors.register(PyMdPreprocessor(md), 'pymd', 175)
+# The Python-Markdown package is only needed to convert Markdown to HTML. It is imported on first
+# use, so that the markdown and moderncv backends start without paying for it.
+def __getattr__(name):
+    if name == 'PyMdExtension':
+        from markdown.extensions import Extension
 
+        class PyMdExtension(Extension):
+            """A custom Markdown extension to handle `pymd` blocks."""
+            def extendMarkdown(self, md):
+                md.registerExtension(self)
+                md.preprocessors.register(PyMdPreprocessor(md), 'pymd', 175)
 
-class PyMdPreprocessor(Preprocessor):
-    """A preprocessor that identifies `pymd` blocks, executes the Python code within them, and replaces the block with the result."""
-    def __init__(self, personal_info, backend='markdown', emojis=True):
-        super().__init__(None)
+        globals()['PyMdExtension'] = PyMdExtension
+        return PyMdExtension
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Setting up Python-Markdown is costly, and an instance converts one document at a time. The instances
+# are kept for the next documents, and reset between them.
+_converters = []
+_converters_lock = threading.Lock()
+
+@contextmanager
+def markdown_converter():
+    """Borrows a Python-Markdown converter from the pool."""
+    with _converters_lock:
+        md = _converters.pop() if _converters else None
+    if md is None:
+        import markdown
+        md = markdown.Markdown(extensions=[])
+    try:
+        yield md
+    finally:
+        md.reset()
+        with _converters_lock:
+            _converters.append(md)
+
+def _emojis_formatter(backend):
+    # Only the formatter of the selected backend is imported
+    if backend == 'html':
+        from aicv.backend.html import EmojisFormatterHtml
+        return EmojisFormatterHtml
+    elif backend == 'moderncv':
+        from aicv.backend.moderncv import EmojisFormatterModernCV
+        return EmojisFormatterModernCV
+    from aicv.backend.markdown import EmojisFormatterMarkdown
+    return EmojisFormatterMarkdown
+
+@lru_cache(maxsize=1024)
+def compile_block(code):
+    """Compiles the code of a pymd block. The result is cached by the source, as the blocks of a
+    template are the same for every CV rendered with it.
+
+    Returns:
+        Tuple[CodeType, Optional[Tuple[str, Optional[str]]]]: The code object, and for a block that is
+            just a render('file.json') call with literal arguments, the file name and the backend
+            argument (or None), so that the call is dispatched without exec()
+    """
+    tree = ast.parse(code, '<pymd>')
+    return compile(tree, '<pymd>', 'exec'), _static_render(tree)
+
+def _static_render(tree):
+    if len(tree.body) != 1 or not isinstance(tree.body[0], ast.Expr):
+        return None
+    call = tree.body[0].value
+    if not isinstance(call, ast.Call) or not isinstance(call.func, ast.Name) or call.func.id != 'render':
+        return None
+    if len(call.args) > 2:
+        return None
+    # The parameters of PyMdPreprocessor._render()
+    names = ['json_filename', 'backend'][:len(call.args)] + [keyword.arg for keyword in call.keywords]
+    values = list(call.args) + [keyword.value for keyword in call.keywords]
+    if 'json_filename' not in names or len(set(names)) != len(names) or not set(names) <= {'json_filename', 'backend'}:
+        return None
+    if not all(isinstance(value, ast.Constant) and isinstance(value.value, str) for value in values):
+        return None
+    arguments = dict(zip(names, (value.value for value in values)))
+    return arguments['json_filename'], arguments.get('backend')
+
+def split_blocks(lines):
+    """Splits the lines of a Markdown file into its pieces, in order: ('markdown', lines) for each run of
+    Markdown lines and ('pymd', code) for each pymd block. An unterminated block is dropped."""
+    pymd_code = None
+    md_buffer = []
+    for line in lines:
+        if line.strip().startswith('```pymd'):
+            if md_buffer:
+                yield 'markdown', md_buffer
+                md_buffer = []
+            pymd_code = []
+        elif line.strip() == '```' and pymd_code is not None:
+            yield 'pymd', '\n'.join(pymd_code)
+            pymd_code = None
+        elif pymd_code is not None:
+            pymd_code.append(line)
+        else:
+            md_buffer.append(line)
+    if md_buffer:
+        yield 'markdown', md_buffer
+
+def declared_inputs(lines):
+    """Returns the data files that the pymd blocks of a template render with a plain render('file.json')
+    call, in order, without running anything. Blocks with other code read their files when they run.
+    """
+    names = []
+    for kind, code in split_blocks(lines):
+        if kind != 'pymd':
+            continue
+        try:
+            static = compile_block(code)[1]
+        except SyntaxError:
+            static = None
+        if static and static[0] not in names:
+            names.append(static[0])
+    return names
+
+@lru_cache(maxsize=128)
+def compile_template(text, backend='markdown', emojis=True):
+    """Compiles a Markdown template into its render plan for a backend: the Markdown between the pymd
+    blocks, converted to the backend's format with its section emojis, and the blocks left to run.
+
+    The plan depends on nothing but the template, so it is cached by its text: CVs that share a
+    template only run its pymd blocks with their own data (see PyMdPreprocessor.iter_plan()).
+
+    Args:
+        text (str): The Markdown template
+        backend (str): 'markdown', 'html' or 'moderncv'
+        emojis (bool): Whether section emojis are added
+    Returns:
+        Tuple[Tuple[str, str], ...]: The plan, as PyMdPreprocessor.compile() returns it
+    """
+    return PyMdPreprocessor(None, backend=backend, emojis=emojis).compile(text.splitlines())
+
+class PyMdPreprocessor:
+    """A preprocessor that identifies `pymd` blocks, executes the Python code within them, and replaces the block with the result.
+    It has the interface of a Python-Markdown preprocessor, without depending on the package."""
+    def __init__(self, personal_info, backend='markdown', emojis=True, data_dir=None, dependencies=None, source=None,
+                 block_workers=0, sections=None):
+        self.md = None
         self.personal_info = personal_info
         self.backend = backend
         self.emojis = emojis
+        self.data_dir = data_dir  # Directory to look up JSON data files in
+        self.dependencies = dependencies  # If a list, paths of the JSON files read are appended to it
+        self.source = source  # Data source to read JSON data from, instead of data_dir
+        self.block_workers = block_workers  # If more than 1, the pymd blocks run concurrently on as many threads
+        self.sections = sections  # If a list, the sections of the document model rendered are appended to it
         self.bib_content = ""  # Store bibliography content for moderncv
 
     def run(self, lines):
-        new_lines = []
-        pymd_block = False
-        pymd_code = []
-        md_buffer = []
+        return [line for chunk in self.iter_chunks(lines) for line in chunk.split('\n')]
 
-        import markdown as _markdown
-        md_converter = None
+    def iter_chunks(self, lines):
+        """Processes the lines of a Markdown file piece by piece. Yields the converted text of each run of
+        Markdown lines and the output of each pymd block as soon as it is ready, without the newline
+        that separates it from the previous piece.
+        """
+        return self.iter_plan(compile_template('\n'.join(lines), self.backend, self.emojis))
+
+    def compile(self, lines):
+        """Compiles the lines of a Markdown file into its render plan: the Markdown is converted to the
+        backend's format, and only the pymd blocks are left to run. See compile_template().
+
+        Returns:
+            Tuple[Tuple[str, str], ...]: ('static', text) for each run of converted Markdown that has any
+                lines, ('pymd', code) for each pymd block, in order
+        """
+        formatter = _emojis_formatter(self.backend)
+        pieces = list(split_blocks(lines))
+        converted = None
         if self.backend == 'html':
-            md_converter = _markdown.Markdown(extensions=[])
+            # The Markdown is converted in one pass; the blocks then fill their places
+            converted = iter(self._convert_html(pieces, formatter))
+        plan = []
+        for kind, body in pieces:
+            if kind == 'pymd':
+                plan.append(('pymd', body))
+                continue
+            for text in self._piece(next(converted) if converted else self._convert_markdown(body, formatter)):
+                plan.append(('static', text))
+        return tuple(plan)
 
-        for line in lines:
-            if line.strip().startswith('```pymd'):
-                # Flush markdown buffer before entering pymd block
-                if self.backend == 'html' and md_buffer:
-                    html = md_converter.convert('\n'.join(md_buffer))
-                    if self.emojis:
-                        html = EmojisFormatterHtml.add_section_emojis(html)
-                    new_lines.extend(html.splitlines())
-                    md_buffer = []
-                elif self.backend == 'markdown' and md_buffer:
-                    md_content = '\n'.join(md_buffer)
-                    if self.emojis:
-                        md_content = EmojisFormatterMarkdown.add_section_emojis(md_content)
-                    new_lines.extend(md_content.splitlines())
-                    md_buffer = []
-                elif self.backend == 'moderncv' and md_buffer:
-                    latex_content = self._convert_markdown_to_latex('\n'.join(md_buffer))
-                    if self.emojis:
-                        latex_content = EmojisFormatterModernCV.add_section_emojis(latex_content)
-                    new_lines.extend(latex_content.splitlines())
-                    md_buffer = []
-                pymd_block = True
-                pymd_code = []
-            elif line.strip() == '```' and pymd_block:
-                pymd_block = False
-                # Redirect stdout to capture the output of the executed code
-                old_stdout = sys.stdout
-                sys.stdout = io.StringIO()
-                try:
-                    def render_with_backend(json_filename, backend=self.backend):
-                        from aicv.renderers import render as real_render
-                        result = real_render(json_filename, backend, emojis=self.emojis)
-
-                        # Handle moderncv publications which return tuple (latex_content, bib_content)
-                        if backend == 'moderncv' and isinstance(result, tuple) and len(result) == 2:
-                            latex_content, bib_content = result
-                            # Store bib_content for later use in document generation
-                            if bib_content:
-                                self.bib_content += bib_content + "\n"
-                            return latex_content
-                        else:
-                            return result if result is not None else ""
-
-                    exec('\n'.join(pymd_code), {**globals(), 'render': render_with_backend})
-                    output = sys.stdout.getvalue()
-                    new_lines.extend(output.splitlines())
-                finally:
-                    sys.stdout = old_stdout
-            elif pymd_block:
-                pymd_code.append(line)
+    def iter_plan(self, plan):
+        """Renders a plan returned by compile(): yields its static text, and the output of each pymd
+        block as soon as it is ready, like iter_chunks().
+
+        With block_workers, all the pymd blocks are started at once on a thread pool, and their outputs
+        are stitched in document order. The blocks must not depend on each other's side effects; the
+        document is the same as when they run one after another.
+        """
+        executor = None
+        if self.block_workers > 1:
+            codes = [body for kind, body in plan if kind == 'pymd']
+            if len(codes) > 1:
+                from concurrent.futures import ThreadPoolExecutor
+                executor = ThreadPoolExecutor(max_workers=min(self.block_workers, len(codes)), thread_name_prefix='aicv-pymd')
+                blocks = iter([executor.submit(self._execute, code) for code in codes])
+        try:
+            for kind, body in plan:
+                if kind == 'static':
+                    yield body
+                    continue
+                output, block = next(blocks).result() if executor else self._execute(body)
+                # What the block collected is added in document order, however the blocks were scheduled
+                self.bib_content += block['bib_content']
+                if self.dependencies is not None:
+                    self.dependencies.extend(block['dependencies'])
+                if self.sections is not None:
+                    self.sections.extend(block['sections'])
+                yield from self._piece(output)
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+
+    @staticmethod
+    def _piece(text):
+        # Line endings are normalised as if the document were split into lines and joined again;
+        # a piece without any line contributes nothing
+        lines = text.splitlines()
+        if lines:
+            yield '\n'.join(lines)
+
+    def _convert_markdown(self, md_buffer, formatter):
+        """Converts a run of Markdown lines to the backend's format, for the markdown and moderncv backends."""
+        if self.backend == 'moderncv':
+            content = self._convert_markdown_to_latex('\n'.join(md_buffer))
+        else:
+            content = '\n'.join(md_buffer)
+        if self.emojis:
+            content = formatter.add_section_emojis(content)
+        return content
+
+    def _convert_html(self, pieces, formatter):
+        """Converts the Markdown runs of a document to HTML in one pass, so that Markdown constructs such
+        as reference links work across the pymd blocks. Each block is stood in for by a placeholder
+        paragraph, where the HTML is cut again.
+
+        Returns:
+            List[str]: The HTML of each Markdown run, in order
+        """
+        placeholder = f"aicv{os.urandom(8).hex()}block"
+        parts = []
+        count = 0
+        for kind, body in pieces:
+            if kind == 'markdown':
+                parts.append('\n'.join(body))
             else:
-                md_buffer.append(line)
-
-        # Flush any remaining markdown buffer at the end
-        if self.backend == 'html' and md_buffer:
-            html = md_converter.convert('\n'.join(md_buffer))
-            if self.emojis:
-                html = EmojisFormatterHtml.add_section_emojis(html)
-            new_lines.extend(html.splitlines())
-        elif self.backend == 'markdown' and md_buffer:
-            md_content = '\n'.join(md_buffer)
-            if self.emojis:
-                md_content = EmojisFormatterMarkdown.add_section_emojis(md_content)
-            new_lines.extend(md_content.splitlines())
-        elif self.backend == 'moderncv' and md_buffer:
-            latex_content = self._convert_markdown_to_latex('\n'.join(md_buffer))
-            if self.emojis:
-                latex_content = EmojisFormatterModernCV.add_section_emojis(latex_content)
-            new_lines.extend(latex_content.splitlines())
-
-        return new_lines
+                parts.append(f"{placeholder}{count}")
+                count += 1
+        with markdown_converter() as md:
+            html = md.convert('\n\n'.join(parts))
+        if self.emojis:
+            html = formatter.add_section_emojis(html)
+
+        # Each placeholder paragraph is a block of its own, on its own line
+        pattern = f"\n?<p>{placeholder}(\\d+)</p>\n?"
+        segments = re.split(pattern, html)[::2]
+        found = [int(index) for index in re.findall(pattern, html)]
+        runs = []
+        blocks = 0
+        for kind, body in pieces:
+            if kind == 'markdown':
+                runs.append(blocks)
+            else:
+                blocks += 1
+        if found == list(range(count)) and all(not segments[i].strip() for i in set(range(count + 1)) - set(runs)):
+            return [segments[i] for i in runs]
+
+        # A run left some Markdown construct open, e.g. a raw HTML block, that swallowed a placeholder
+        with markdown_converter() as md:
+            html_runs = [md.convert('\n'.join(body)) for kind, body in pieces if kind == 'markdown']
+        return [formatter.add_section_emojis(run) if self.emojis else run for run in html_runs]
+
+    def _execute(self, code):
+        """Executes the code of a pymd block.
+
+        Returns:
+            Tuple[str, Dict[str, Any]]: What the block printed, and what its render() calls collected:
+                'bib_content' (BibTeX for moderncv), 'dependencies' (paths of the files read) and 'sections'
+                (the sections of the document model rendered)
+        """
+        code_object, static = compile_block(code)
+        block = {'bib_content': '', 'dependencies': [], 'sections': []}
+        # print() of the block, and of the renderers it calls, goes to a sink of this thread only
+        with capture() as output:
+            if static:
+                self._render(*static, block=block)
+            else:
+                exec(code_object, {**globals(), 'print': emit, 'render': partial(self._render, block=block)})
+        return output.getvalue(), block
+
+    def _render(self, json_filename, backend=None, block=None):
+        """render() as pymd blocks see it: renders a data file with the backend of the document."""
+        backend = backend or self.backend
+        dependencies = block['dependencies'] if self.dependencies is not None else None
+        sections = block['sections'] if self.sections is not None else None
+        result = render(json_filename, backend, emojis=self.emojis, data_dir=self.data_dir,
+                        dependencies=dependencies, source=self.source, sections=sections)
+
+        # Handle moderncv publications which return tuple (latex_content, bib_content)
+        if backend == 'moderncv' and isinstance(result, tuple) and len(result) == 2:
+            latex_content, bib_content = result
+            # Store bib_content for later use in document generation
+            if bib_content:
+                block['bib_content'] += bib_content + "\n"
+            return latex_content
+        else:
+            return result if result is not None else ""
 
     def _convert_markdown_to_latex(self, markdown_content):
         """Convert markdown content to LaTeX format suitable for moderncv."""
@@ -0,0 +1,112 @@
+"""
+Several output formats of one CV for the AI-aware CV generator
+
+`aicv cv.md --formats html,md,tex,pdf-weasy,pdf-latex` reads the template, personal.json, the JSON
+files and the photo once, and renders every backend the formats need from them, each once: the PDF
+made by WeasyPrint comes from the same HTML as the html output, and the one made by pdflatex from the
+same LaTeX as the tex output. The two PDF engines run at the same time, each on a thread of its own,
+while the other documents are generated.
+"""
+import os
+from typing import Any, Dict, List, Optional
+from aicv.core.processor import generate, latex_files, load_personal_info
+from aicv.core.sources import CachedSource, DataSource, DirectorySource
+
+# Formats of --formats: format -> (backend, suffix of the output file)
+OUTPUT_FORMATS = {
+    'html': ('html', '.html'),
+    'md': ('markdown', '.markdown'),  # not .md, which would overwrite a cv.md template
+    'tex': ('moderncv', '.tex'),
+    'pdf-weasy': ('html', '.pdf'),
+    'pdf-latex': ('moderncv', '.moderncv.pdf'),
+}
+
+PDF_FORMATS = ('pdf-weasy', 'pdf-latex')
+
+def parse_formats(value: str) -> List[str]:
+    """Parses a comma-separated list of formats, such as 'html,pdf-weasy'.
+
+    Raises:
+        ValueError: For an unknown format
+    """
+    formats = []
+    for name in value.split(','):
+        name = name.strip()
+        if name not in OUTPUT_FORMATS:
+            raise ValueError(f"unknown format '{name}', choose from {', '.join(OUTPUT_FORMATS)}")
+        if name not in formats:
+            formats.append(name)
+    return formats
+
+def generate_formats(file_path: str, formats: List[str], personal_info: Optional[Dict[str, Any]] = None,
+                     emojis: Optional[bool] = None, source: Optional[DataSource] = None, paper_size: str = 'A4',
+                     add_page_numbers: bool = True, base_url: Optional[str] = None,
+                     pdf_timeout: Optional[float] = None, block_workers: int = 0) -> Dict[str, Any]:
+    """Generates a CV in several formats from one load of its inputs.
+
+    Each backend is generated once. The PDFs are started as soon as the document they are made from is
+    ready, and render concurrently with each other and with the remaining backends.
+
+    Args:
+        file_path (str): Path to the Markdown file (or its name in the data source)
+        formats (List[str]): Formats to generate, from OUTPUT_FORMATS
+        personal_info (Dict[str, Any], optional): Personal information; loaded from the source if not given
+        emojis (bool, optional): Whether to enable emojis in the HTML and Markdown. Defaults to html only;
+            LaTeX never has emojis.
+        source (DataSource, optional): Data source to read the Markdown and JSON files from. Defaults to
+            the directory of the Markdown file, then the current directory.
+        paper_size (str): Paper size for WeasyPrint
+        add_page_numbers (bool): Whether WeasyPrint adds page numbers
+        base_url (str, optional): Base for resolving relative URLs in the HTML
+        pdf_timeout (float, optional): Seconds after which a stuck pdflatex is killed
+        block_workers (int): If more than 1, the pymd blocks run concurrently on as many threads
+    Returns:
+        Dict[str, Any]: 'outputs' (the content of each format that was generated, as bytes, in the order
+            of formats) and 'errors' (for each PDF that failed, the error as a string)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from aicv.core.deadline import make_pdf
+
+    if source is None:
+        source = DirectorySource(os.path.dirname(os.path.abspath(file_path)), os.curdir)
+        file_path = os.path.abspath(file_path)
+    source = CachedSource(source)
+    if personal_info is None:
+        personal_info = load_personal_info(source=source)
+
+    # Backends the PDFs are made from go first, so that the PDF engines start early
+    backends = []
+    for name in sorted(formats, key=lambda name: name not in PDF_FORMATS):
+        backend = OUTPUT_FORMATS[name][0]
+        if backend not in backends:
+            backends.append(backend)
+
+    documents = {}
+    futures = {}
+    options = {'paper_size': paper_size, 'add_page_numbers': add_page_numbers, 'base_url': base_url,
+               'pdf_timeout': pdf_timeout, 'latex_files': latex_files(personal_info, source)}
+    # One thread per PDF engine, whatever the number of CPUs: pdflatex runs in a process of its own
+    executor = ThreadPoolExecutor(max_workers=len(PDF_FORMATS), thread_name_prefix='aicv-pdf')
+    try:
+        for backend in backends:
+            backend_emojis = backend == 'html' if emojis is None or backend == 'moderncv' else emojis
+            documents[backend] = generate(file_path, personal_info, backend=backend, emojis=backend_emojis,
+                                          source=source, block_workers=block_workers)
+            for name in PDF_FORMATS:
+                if name in formats and OUTPUT_FORMATS[name][0] == backend:
+                    futures[name] = executor.submit(make_pdf, documents[backend], backend, options)
+    finally:
+        # A PDF is never abandoned half-way, even when a later backend fails
+        executor.shutdown(wait=True)
+
+    result = {'outputs': {}, 'errors': {}}
+    for name in formats:
+        if name in futures:
+            error = futures[name].exception()
+            if error is not None:
+                result['errors'][name] = f"{type(error).__name__}: {error}"
+                continue
+            result['outputs'][name] = futures[name].result()
+        else:
+            result['outputs'][name] = documents[OUTPUT_FORMATS[name][0]].encode('utf-8')
+    return result
@@ -0,0 +1,369 @@
+"""
+Durable SQLite-backed job queue for rendering a backlog of CVs on several hosts
+"""
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    input_dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    cv_path TEXT NOT NULL,
+    output_base TEXT NOT NULL,
+    backend TEXT NOT NULL,
+    options TEXT NOT NULL,
+    priority REAL NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    outputs TEXT,
+    error TEXT,
+    elapsed REAL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    UNIQUE (cv_path, output_base, backend, options)
+);
+CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs (state, priority DESC, id);
+CREATE INDEX IF NOT EXISTS jobs_by_lease ON jobs (state, lease_expires);
+'''
+
+# Job life cycle: queued -> running -> done | failed. A running job whose lease expires
+# (its worker crashed or lost connectivity) goes back to queued, up to max_attempts times.
+STATES = ('queued', 'running', 'done', 'failed')
+
+class JobQueue:
+    """A render job queue stored in a SQLite file.
+
+    Every worker opens the same file; claiming a job happens in an immediate transaction, so
+    two workers never get the same job. Claimed jobs carry a lease that the worker renews with
+    heartbeats while rendering. The database must live on a filesystem with working POSIX locks;
+    rollback journaling is used because WAL does not work on network filesystems.
+
+    Args:
+        path (str): Path to the SQLite file, created if needed
+        max_attempts (int): How many times a job whose lease expired is handed out again
+    """
+    def __init__(self, path: str, max_attempts: int = 3):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _transaction(self):
+        return _Transaction(self.conn)
+
+    def add(self, jobs: List[Dict[str, Any]], options: Dict[str, Any]) -> int:
+        """Adds jobs to the queue. Jobs that already finished are queued again; queued and running
+        jobs are left alone.
+
+        Args:
+            jobs (List[Dict[str, Any]]): Jobs as returned by discover_jobs(), optionally with 'estimated_cost'
+            options (Dict[str, Any]): Render options shared by the jobs
+        Returns:
+            int: Number of jobs that were added or queued again
+        """
+        now = time.time()
+        options_json = json.dumps(options, sort_keys=True)
+        count = 0
+        with self._transaction():
+            for job in jobs:
+                cursor = self.conn.execute(
+                    '''INSERT INTO jobs (input_dir, name, cv_path, output_base, backend, options, priority, created, updated)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT (cv_path, output_base, backend, options) DO UPDATE SET
+                           state = 'queued', attempts = 0, worker = NULL, lease_expires = NULL,
+                           error = NULL, priority = excluded.priority, updated = excluded.updated
+                       WHERE state IN ('done', 'failed')''',
+                    (job['input_dir'], job['name'], job['cv_path'], job['output_base'], options.get('backend', 'html'),
+                     options_json, job.get('estimated_cost', 0.0), now, now))
+                count += cursor.rowcount
+        return count
+
+    def expire_leases(self, now: Optional[float] = None) -> int:
+        """Returns running jobs with an expired lease to the queue, or fails them after max_attempts."""
+        now = now or time.time()
+        with self._transaction():
+            cursor = self.conn.execute(
+                '''UPDATE jobs SET
+                       state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                       error = CASE WHEN attempts >= ? THEN 'Lease expired too many times' ELSE error END,
+                       worker = NULL, lease_expires = NULL, updated = ?
+                   WHERE state = 'running' AND lease_expires < ?''',
+                (self.max_attempts, self.max_attempts, now, now))
+            return cursor.rowcount
+
+    def claim(self, worker: str, lease: float = 60.0) -> Optional[Dict[str, Any]]:
+        """Claims the queued job with the highest priority.
+
+        Args:
+            worker (str): Identifier of the claiming worker
+            lease (float): Seconds until the job is handed to another worker unless heartbeat() is called
+        Returns:
+            Dict[str, Any] | None: The job with its 'id' and decoded 'options', or None if the queue is empty
+        """
+        self.expire_leases()
+        now = time.time()
+        with self._transaction():
+            row = self.conn.execute(
+                "SELECT * FROM jobs WHERE state = 'queued' ORDER BY priority DESC, id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                '''UPDATE jobs SET state = 'running', worker = ?, lease_expires = ?, attempts = attempts + 1, updated = ?
+                   WHERE id = ?''',
+                (worker, now + lease, now, row['id']))
+        job = dict(row)
+        job['options'] = json.loads(job['options'])
+        return job
+
+    def heartbeat(self, job_id: int, worker: str, lease: float = 60.0) -> bool:
+        """Extends the lease of a running job. Returns False if the worker no longer holds the lease."""
+        now = time.time()
+        with self._transaction():
+            cursor = self.conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ? AND worker = ? AND state = 'running'",
+                (now + lease, now, job_id, worker))
+            return cursor.rowcount == 1
+
+    def finish(self, job_id: int, worker: str, result: Dict[str, Any], publish=None) -> bool:
+        """Records the result of a job claimed by the worker. Returns False if the lease was lost meanwhile.
+
+        Args:
+            job_id (int): Identifier of the job
+            worker (str): Identifier of the worker that claimed it
+            result (Dict[str, Any]): Result as returned by render_job()
+            publish (callable, optional): Called with the result once the worker is known to hold the
+                lease, before the result is recorded. The queue stays locked meanwhile, so no other
+                worker can claim or finish the job in between.
+        """
+        with self._transaction():
+            row = self.conn.execute("SELECT id FROM jobs WHERE id = ? AND worker = ? AND state = 'running'",
+                                    (job_id, worker)).fetchone()
+            if row is None:
+                return False
+            if publish is not None:
+                publish(result)
+            state = 'done' if result['ok'] else 'failed'
+            self.conn.execute(
+                '''UPDATE jobs SET state = ?, outputs = ?, error = ?, elapsed = ?, worker = NULL, lease_expires = NULL, updated = ?
+                   WHERE id = ?''',
+                (state, json.dumps(result.get('outputs', [])), result.get('error'), result.get('elapsed'), time.time(), job_id))
+            return True
+
+    def requeue(self, states=('failed',)) -> int:
+        """Queues jobs in the given states again."""
+        placeholders = ', '.join('?' for _ in states)
+        with self._transaction():
+            cursor = self.conn.execute(
+                f'''UPDATE jobs SET state = 'queued', attempts = 0, worker = NULL, lease_expires = NULL, error = NULL, updated = ?
+                    WHERE state IN ({placeholders})''',
+                (time.time(), *states))
+            return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per state."""
+        counts = {state: 0 for state in STATES}
+        for row in self.conn.execute('SELECT state, COUNT(*) AS n FROM jobs GROUP BY state'):
+            counts[row['state']] = row['n']
+        return counts
+
+    def failures(self, limit: int = 20) -> List[Dict[str, Any]]:
+        rows = self.conn.execute(
+            "SELECT id, input_dir, cv_path, error FROM jobs WHERE state = 'failed' ORDER BY updated DESC LIMIT ?", (limit,))
+        return [dict(row) for row in rows]
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back on error. Taking the write lock up front avoids
+    deadlocks between two workers that both read before writing."""
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def work(db_path: str, worker: Optional[str] = None, lease: float = 60.0, heartbeat: float = 15.0,
+         poll: float = 5.0, exit_when_empty: bool = False, quiet: bool = False, traceback: bool = False) -> int:
+    """Claims and renders jobs until the queue is empty (if exit_when_empty) or forever.
+
+    While a job renders, a background thread renews its lease every `heartbeat` seconds. If the
+    worker dies, the lease expires and another worker picks the job up. Outputs are written to
+    staging files first, and only moved into place if the worker still holds the lease when the job
+    is finished: a worker that lost its lease never overwrites the outputs of the worker that took over.
+
+    Returns:
+        int: Number of jobs that failed
+    """
+    from contextlib import ExitStack, redirect_stdout
+    from aicv.core.batch import _init_worker, job_label, render_job
+
+    worker = worker or default_worker_id()
+    job_queue = JobQueue(db_path)
+    warmed_up = set()
+    failed = 0
+    with ExitStack() as stack:
+        stack.callback(job_queue.close)
+        if quiet:
+            stack.enter_context(redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+        while True:
+            job = job_queue.claim(worker, lease=lease)
+            if job is None:
+                if exit_when_empty and job_queue.counts()['running'] == 0:
+                    return failed
+                time.sleep(poll)
+                continue
+
+            options = dict(job['options'], traceback=traceback)
+            warm_key = (options.get('backend'), options.get('pdf'))
+            if warm_key not in warmed_up:
+                _init_worker(options)
+                warmed_up.add(warm_key)
+
+            staging_base = _staging_base(job['output_base'], worker)
+            stop = threading.Event()
+            beat = threading.Thread(target=_heartbeat_loop, args=(db_path, job['id'], worker, lease, heartbeat, stop), daemon=True)
+            beat.start()
+            try:
+                result = render_job(dict(job, output_base=staging_base), options)
+            finally:
+                stop.set()
+                beat.join()
+
+            staged = result['outputs']
+            result['outputs'] = [job['output_base'] + path[len(staging_base):] for path in staged]
+            if not job_queue.finish(job['id'], worker, result, publish=lambda result: _publish(staged, result)):
+                for path in staged:
+                    _remove(path)
+                print(f"LOST {job_label(job)}: lease expired while rendering")
+            elif result['ok']:
+                print(f"OK   {job_label(job)} ({result['elapsed']:.2f}s)")
+            else:
+                failed += 1
+                print(f"FAIL {job_label(job)}: {result['error']}")
+            sys.stdout.flush()
+
+def _staging_base(output_base: str, worker: str) -> str:
+    """Output base of the files a worker writes before they are moved into place: a hidden file
+    next to the output, named after the worker, on the same filesystem so that the move is atomic."""
+    tag = ''.join(c if c.isalnum() or c in '-_' else '_' for c in worker)
+    directory, name = os.path.split(output_base)
+    return os.path.join(directory, f".{name}.{tag}")
+
+def _publish(staged: List[str], result: Dict[str, Any]):
+    """Moves the staged outputs of a job into place. A failed move fails the job."""
+    try:
+        for staged_path, path in zip(staged, result['outputs']):
+            os.replace(staged_path, path)
+    except OSError as e:
+        for path in staged:
+            _remove(path)
+        result['ok'] = False
+        result['error'] = f"{type(e).__name__}: {e}"
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def _work_process(db_path: str, **kwargs):
+    # Target of the processes started by `aicv worker --jobs N`: the failure count becomes the exit status
+    sys.exit(1 if work(db_path, **kwargs) else 0)
+
+def _heartbeat_loop(db_path, job_id, worker, lease, interval, stop):
+    # SQLite connections must not be shared between threads, so the heartbeat gets its own
+    job_queue = JobQueue(db_path)
+    try:
+        while not stop.wait(interval):
+            if not job_queue.heartbeat(job_id, worker, lease=lease):
+                return
+    finally:
+        job_queue.close()
+
+def queue_main(argv=None):
+    """Entry point for `aicv queue`"""
+    from aicv.core.batch import add_render_arguments, discover_jobs, job_label, render_options
+    from aicv.core.scheduling import order_jobs
+
+    parser = argparse.ArgumentParser(prog='aicv queue', description='Manage a durable queue of CV render jobs.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help='Queue every CV folder under a directory tree')
+    add.add_argument('db', type=str, help='Path to the SQLite queue file')
+    add.add_argument('root', type=str, help='Directory tree containing CV folders')
+    add_render_arguments(add)
+
+    status = commands.add_parser('status', help='Show the number of jobs per state')
+    status.add_argument('db', type=str, help='Path to the SQLite queue file')
+    status.add_argument('--failures', action='store_true', help='Also list the most recent failures')
+
+    requeue = commands.add_parser('requeue', help='Queue failed jobs again')
+    requeue.add_argument('db', type=str, help='Path to the SQLite queue file')
+
+    args = parser.parse_args(argv)
+    job_queue = JobQueue(args.db)
+    try:
+        if args.command == 'add':
+            options = render_options(args)
+            del options['quiet'], options['traceback']
+            jobs = order_jobs(discover_jobs(args.root, cv_name=args.cv_name, output_dir=args.output_dir), options)
+            count = job_queue.add(jobs, options)
+            print(f"Queued {count} of {len(jobs)} CV folders in {args.db}")
+        elif args.command == 'status':
+            job_queue.expire_leases()
+            counts = job_queue.counts()
+            print(', '.join(f"{state}: {counts[state]}" for state in STATES))
+            if args.failures:
+                for failure in job_queue.failures():
+                    print(f"FAIL {job_label(failure)}: {failure['error']}")
+        elif args.command == 'requeue':
+            print(f"Queued {job_queue.requeue()} failed jobs again")
+    finally:
+        job_queue.close()
+    return 0
+
+def worker_main(argv=None):
+    """Entry point for `aicv worker`"""
+    parser = argparse.ArgumentParser(prog='aicv worker', description='Render CVs claimed from a queue created by `aicv queue add`.')
+    parser.add_argument('db', type=str, help='Path to the SQLite queue file')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='Number of worker processes to run on this host (default: 1)')
+    parser.add_argument('--lease', type=float, default=60.0, help='Seconds before a job of an unresponsive worker is handed out again (default: 60)')
+    parser.add_argument('--heartbeat', type=float, default=15.0, help='Seconds between lease renewals while rendering (default: 15)')
+    parser.add_argument('--poll', type=float, default=5.0, help='Seconds to wait before checking an empty queue again (default: 5)')
+    parser.add_argument('--exit-when-empty', action='store_true', help='Exit once no jobs are queued or running')
+    parser.add_argument('--quiet', '-q', action='store_true', help='Suppress status messages while rendering')
+    parser.add_argument('--traceback', action='store_true', help='Include tracebacks in failure reports')
+    args = parser.parse_args(argv)
+
+    kwargs = dict(lease=args.lease, heartbeat=args.heartbeat, poll=args.poll, exit_when_empty=args.exit_when_empty,
+                  quiet=args.quiet, traceback=args.traceback)
+    if args.jobs <= 1:
+        return 1 if work(args.db, **kwargs) else 0
+
+    import multiprocessing
+    processes = [multiprocessing.Process(target=_work_process, args=(args.db,), kwargs=kwargs) for _ in range(args.jobs)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return 1 if any(process.exitcode for process in processes) else 0
@@ -0,0 +1,119 @@
+"""
+JSON Lines input with a persistent byte-offset index
+
+Each line of a JSONL export holds one CV: {"personal": {...}, "employment": [...],
+"education": [...], "publications": [...]}. The offsets of the records are stored in a sidecar
+index file the first time the export is opened, and memory-mapped afterwards, so that any record
+is read with a single seek, without parsing the records before it.
+"""
+import json
+import mmap
+import os
+import struct
+from typing import Any, Dict, Iterator, Optional
+
+INDEX_SUFFIX = '.idx'
+INDEX_MAGIC = b'AICVIDX1'
+# Magic, size and mtime_ns of the indexed file, number of records; then one uint64 offset per record
+INDEX_HEADER = struct.Struct('<8sQQQ')
+INDEX_ENTRY = struct.Struct('<Q')
+
+def build_index(jsonl_path: str, index_path: str):
+    """Scans a JSONL file once and writes the offsets of its non-blank lines to index_path."""
+    st = os.stat(jsonl_path)
+    count = 0
+    tmp_path = index_path + '.tmp'
+    with open(jsonl_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+        dst.write(INDEX_HEADER.pack(INDEX_MAGIC, 0, 0, 0))
+        offset = 0
+        for line in src:
+            if line.strip():
+                dst.write(INDEX_ENTRY.pack(offset))
+                count += 1
+            offset += len(line)
+        # The header is written last, so that an interrupted build is never taken for a valid index
+        dst.seek(0)
+        dst.write(INDEX_HEADER.pack(INDEX_MAGIC, st.st_size, st.st_mtime_ns, count))
+    os.replace(tmp_path, index_path)
+
+def _index_is_current(index_path: str, st: os.stat_result) -> bool:
+    try:
+        with open(index_path, 'rb') as f:
+            header = f.read(INDEX_HEADER.size)
+            f.seek(0, os.SEEK_END)
+            index_size = f.tell()
+    except OSError:
+        return False
+    if len(header) < INDEX_HEADER.size:
+        return False
+    magic, size, mtime_ns, count = INDEX_HEADER.unpack(header)
+    return (magic == INDEX_MAGIC and size == st.st_size and mtime_ns == st.st_mtime_ns
+            and index_size == INDEX_HEADER.size + count * INDEX_ENTRY.size)
+
+class JsonlFile:
+    """Random access to the records of a JSONL file.
+
+    The index is <file>.idx next to the JSONL file, or index_path. It is (re)built when it is
+    missing or when the JSONL file changed since it was written.
+
+    Args:
+        path (str): Path to the JSONL file
+        index_path (str, optional): Path to the index file
+    """
+    def __init__(self, path: str, index_path: Optional[str] = None):
+        self.path = path
+        self.index_path = index_path or path + INDEX_SUFFIX
+        st = os.stat(path)
+        if not _index_is_current(self.index_path, st):
+            print(f"Indexing {path}...")
+            build_index(path, self.index_path)
+
+        self._file = open(path, 'rb')
+        self._size = st.st_size
+        with open(self.index_path, 'rb') as f:
+            header = f.read(INDEX_HEADER.size)
+            self._count = INDEX_HEADER.unpack(header)[3]
+            self._index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self._count else None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def offset(self, number: int) -> int:
+        """Byte offset of a record in the JSONL file."""
+        if number < 0:
+            number += self._count
+        if not 0 <= number < self._count:
+            raise IndexError(f"Record {number} out of range: {self.path} has {self._count} records")
+        return INDEX_ENTRY.unpack_from(self._index, INDEX_HEADER.size + number * INDEX_ENTRY.size)[0]
+
+    def record_size(self, number: int) -> int:
+        """Size of a record in bytes, known from the index without reading it."""
+        start = self.offset(number)
+        if number < 0:
+            number += self._count
+        end = self.offset(number + 1) if number + 1 < self._count else self._size
+        return end - start
+
+    def read_line(self, number: int) -> bytes:
+        self._file.seek(self.offset(number))
+        return self._file.readline()
+
+    def __getitem__(self, number: int) -> Dict[str, Any]:
+        return json.loads(self.read_line(number))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for number in range(self._count):
+            yield self[number]
+
+    def close(self):
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,165 @@
+"""
+Build manifest for incremental batch rendering
+"""
+import hashlib
+import json
+import os
+from typing import Dict, Any, Iterable, List, Optional
+from aicv.core.bundle import BUNDLE_SUFFIX
+
+MANIFEST_NAME = '.aicv-manifest.jsonl'
+
+# Options that change the generated documents; others (quiet, traceback, ...) do not
+OUTPUT_OPTIONS = ('backend', 'pdf', 'emojis', 'paper', 'page_numbers')
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Fingerprint of an input that does not exist: the CV is out of date once it appears
+ABSENT = [None, None, None]
+
+def fingerprint(paths: Iterable[str]) -> Dict[str, List]:
+    """Fingerprints of the given files as {path: [size, mtime_ns, sha256]}. Missing files are
+    recorded as ABSENT."""
+    fingerprints = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+            fingerprints[path] = [st.st_size, st.st_mtime_ns, file_digest(path)]
+        except OSError:
+            fingerprints[path] = list(ABSENT)
+    return fingerprints
+
+def output_options(options: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: options.get(key) for key in OUTPUT_OPTIONS}
+
+def entry_key(job: Dict[str, Any], options: Dict[str, Any]) -> str:
+    """Key of a job's manifest entry: one entry per output base and backend."""
+    return f"{options.get('backend', 'html')}:{job['output_base']}"
+
+def _version() -> str:
+    from aicv import __version__
+    return __version__
+
+class Manifest:
+    """Records, for each rendered CV, the fingerprints of every input actually read, and of the
+    paths where the pymd blocks looked for files that were missing, the aicv version and the
+    options, so that unchanged CVs can be skipped on the next run.
+
+    The manifest is an append-only JSON Lines file: each finished job appends one line, so a
+    batch that is interrupted loses nothing but the jobs that were in flight, and the next run
+    resumes where it stopped. When a key appears several times, the last line wins.
+
+    Args:
+        path (str): Path to the manifest file, created on the first record()
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        self.version = _version()
+        self._file = None
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line truncated by a crash
+                        continue
+                    self.entries[entry['key']] = entry
+
+    def is_up_to_date(self, job: Dict[str, Any], options: Dict[str, Any]) -> bool:
+        """Checks whether the outputs of a job exist and were built from the current inputs.
+
+        Inputs whose size and modification time match the manifest are trusted without being
+        read, so checking an unchanged CV costs a few stat() calls. Inputs whose stat changed
+        are hashed; if only their timestamp changed, the new stat is recorded.
+        """
+        entry = self.entries.get(entry_key(job, options))
+        if not entry or entry.get('version') != self.version or entry.get('options') != output_options(options):
+            return False
+        if not all(os.path.exists(path) for path in entry.get('outputs', [])):
+            return False
+
+        touched = False
+        for path, (size, mtime_ns, digest) in entry['inputs'].items():
+            if digest is None:
+                # An input that was looked up in vain
+                if os.path.lexists(path):
+                    return False
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                return False
+            if st.st_size == size and st.st_mtime_ns == mtime_ns:
+                continue
+            if st.st_size != size or file_digest(path) != digest:
+                return False
+            entry['inputs'][path] = [st.st_size, st.st_mtime_ns, digest]
+            touched = True
+
+        if touched:
+            self._append(entry)
+        return True
+
+    def record(self, job: Dict[str, Any], options: Dict[str, Any], inputs: Dict[str, List], outputs: List[str]):
+        """Records a successfully rendered job. The line is flushed immediately."""
+        entry = {
+            'key': entry_key(job, options),
+            'version': self.version,
+            'options': output_options(options),
+            'inputs': inputs,
+            'outputs': outputs,
+        }
+        self.entries[entry['key']] = entry
+        self._append(entry)
+
+    def _append(self, entry: Dict[str, Any]):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self, compact: bool = True):
+        """Closes the manifest, rewriting it with one line per key if anything was appended."""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if compact:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            os.replace(tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # After a crash keep the append-only log as is; it is compacted by the next run
+        self.close(compact=exc_type is None)
+        return False
+
+def job_inputs(item: Dict[str, Any], options: Dict[str, Any]) -> List[str]:
+    """Paths of every input of a rendered job: personal.json, the photo (when it is embedded) and
+    the files collected by preprocess(), including where missing files were looked up."""
+    # A bundle holds personal.json itself and is among the dependencies
+    paths = [] if item['cv_path'].endswith(BUNDLE_SUFFIX) else [os.path.join(item['input_dir'], 'personal.json')]
+    photo_path = (item.get('personal_info') or {}).get('photo_path')
+    if photo_path and (options.get('backend') == 'html' or options.get('pdf')):
+        paths.append(photo_path)
+    paths.extend(item.get('dependencies', []))
+    return list(dict.fromkeys(paths))
+
+def default_manifest_path(root: str, output_dir: Optional[str] = None) -> str:
+    return os.path.join(os.path.abspath(output_dir or root), MANIFEST_NAME)
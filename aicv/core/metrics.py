@@ -0,0 +1,282 @@
+"""
+Metrics for the AI-aware CV generator, exported in the Prometheus text format
+
+The generation entry points count documents and failures and record the latency of every stage
+per backend. The metrics of a process can be scraped over HTTP (start_http_server()) or written
+to a file for the node_exporter textfile collector (write_textfile()). Only the standard library
+is used.
+"""
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Tuple
+
+# Upper bounds of the latency histogram buckets, in seconds: from pymd blocks (milliseconds)
+# to WeasyPrint layouts and pdflatex runs (seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Metric:
+    """Base class of metrics: a name, a help text and label names; values are kept per label values."""
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def samples(self):
+        """Yields (suffix, label string, value) for the exposition format."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return '\n'.join(lines)
+
+class Counter(Metric):
+    """A value that only goes up, such as the number of documents produced."""
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield '', _format_labels(self.label_names, key), value
+
+class Gauge(Metric):
+    """A value that goes up and down, such as the depth of a queue. A gauge can also be computed
+    when it is scraped, by a function set with set_function()."""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values = {}
+        self._functions = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float], **labels):
+        with self._lock:
+            self._functions[self._key(labels)] = function
+
+    def clear_function(self, **labels):
+        with self._lock:
+            self._functions.pop(self._key(labels), None)
+
+    def get(self, **labels) -> float:
+        key = self._key(labels)
+        if key in self._functions:
+            return self._functions[key]()
+        return self._values.get(key, 0.0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key in sorted(set(values) | set(functions)):
+            value = functions[key]() if key in functions else values[key]
+            yield '', _format_labels(self.label_names, key), value
+
+class Histogram(Metric):
+    """Distribution of observed values, such as stage latencies, in cumulative buckets."""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, ([*counts], total, count)) for key, (counts, total, count) in self._series.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield '_bucket', _format_labels(self.label_names, key, f'le="{_format_value(bound)}"'), cumulative
+            yield '_sum', _format_labels(self.label_names, key), total
+            yield '_count', _format_labels(self.label_names, key), count
+
+class Registry:
+    """A set of metrics rendered together."""
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        """Returns all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+# The registry of this process and the metrics recorded by aicv
+REGISTRY = Registry()
+DOCUMENTS = REGISTRY.counter('aicv_documents_total', 'Documents generated, by backend and outcome', ('backend', 'status'))
+STAGE_SECONDS = REGISTRY.histogram('aicv_stage_duration_seconds', 'Time spent in each generation stage', ('stage', 'backend'))
+STAGE_FAILURES = REGISTRY.counter('aicv_stage_failures_total', 'Generation stages that raised an error', ('stage', 'backend'))
+QUEUE_DEPTH = REGISTRY.gauge('aicv_queue_depth', 'Documents left in a batch run (stage="batch") or waiting for a stage of its pipeline', ('stage',))
+IN_FLIGHT = REGISTRY.gauge('aicv_in_flight', 'Documents being generated', ('stage',))
+START_TIME = REGISTRY.gauge('aicv_process_start_time_seconds', 'Start time of the process since the Unix epoch')
+START_TIME.set(time.time())
+
+@contextmanager
+def track_stage(stage: str, backend: str):
+    """Times a stage of a generation, counting it as failed if it raises."""
+    IN_FLIGHT.inc(stage=stage)
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_FAILURES.inc(stage=stage, backend=backend)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage, backend=backend)
+        IN_FLIGHT.dec(stage=stage)
+
+def record_stage(stage: str, backend: str, seconds: float, failed: bool = False):
+    """Records a stage that ran elsewhere, e.g. in a batch worker process."""
+    STAGE_SECONDS.observe(seconds, stage=stage, backend=backend)
+    if failed:
+        STAGE_FAILURES.inc(stage=stage, backend=backend)
+
+def write_textfile(path: str, registry: Registry = REGISTRY):
+    """Atomically writes the metrics to a file, e.g. for the node_exporter textfile collector."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(registry.render())
+    os.replace(tmp_path, path)
+
+def start_http_server(port: int, address: str = '127.0.0.1', registry: Registry = REGISTRY):
+    """Serves the metrics at http://address:port/metrics from a background thread.
+
+    Returns:
+        ThreadingHTTPServer: The server; call shutdown() to stop it
+    """
+    # http.server is imported here, as it is not worth its import time to processes that are not scraped
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes are not worth a status line each
+            pass
+
+    server = ThreadingHTTPServer((address, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name='aicv-metrics').start()
+    return server
+
+class TextfileWriter:
+    """Rewrites a metrics file every `interval` seconds from a background thread, and once more on stop().
+
+    Args:
+        path (str): Path to the metrics file
+        interval (float): Seconds between writes
+    """
+    def __init__(self, path: str, interval: float = 10.0, registry: Registry = REGISTRY):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='aicv-metrics-file')
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            write_textfile(self.path, self.registry)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        write_textfile(self.path, self.registry)
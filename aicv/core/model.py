@@ -0,0 +1,250 @@
+"""
+Document model of the AI-aware CV generator
+
+The JSON data of a CV is read into these classes once, and every backend renders from them: the dates
+of an entry, the names of the authors of a publication and the order of the publications are worked
+out here, not again by each backend. A Document, the header and the sections rendered by the pymd
+blocks of a template, can also be written out as JSON for other tools (see aicv.core.processor.load_document).
+"""
+import re
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+_YEAR = re.compile(r'\b(19|20)\d{2}\b')
+
+def extract_year(date_string) -> str:
+    """Extracts the year from a date string like 'May 2019' or '2019'. 'Present' gives 'present', and a
+    string without a 4-digit year is returned as it is."""
+    if not date_string:
+        return ""
+    if str(date_string).lower() == 'present':
+        return 'present'
+    year_match = _YEAR.search(str(date_string))
+    if year_match:
+        return year_match.group(0)
+    return str(date_string)
+
+def format_date_range(start, end) -> str:
+    """Formats the dates of an entry as shown in the text, e.g. 'May 2019 - Present'."""
+    if start and end:
+        return f"{start} - {end}"
+    elif start:
+        return f"{start} - Present"
+    elif end:
+        return f"Until {end}"
+    return ""
+
+def format_year_range(start, end) -> str:
+    """Formats the dates of an entry as a range of years, e.g. '2019-present'."""
+    start_year = extract_year(start)
+    end_year = extract_year(end)
+    if start_year and end_year:
+        if end_year.lower() == 'present':
+            return f"{start_year}-present"
+        return f"{start_year}-{end_year}"
+    elif start_year:
+        return f"{start_year}-present"
+    elif end_year:
+        return f"-{end_year}"
+    return ""
+
+# The classes declare __slots__ themselves, as dataclass(slots=True) needs Python 3.10. Slotted fields
+# cannot have defaults, so the entries are built with from_dict().
+
+@dataclass
+class Header:
+    """Personal information shown at the top of the CV."""
+    __slots__ = ('first_name', 'family_name', 'degree', 'position', 'date_of_birth', 'address', 'phone',
+                 'email', 'website', 'github', 'linkedin', 'photo', 'extra')
+    first_name: str
+    family_name: str
+    degree: str
+    position: str
+    date_of_birth: str
+    address: str
+    phone: str
+    email: str
+    website: str
+    github: str
+    linkedin: str
+    photo: Optional[str]
+    extra: Dict[str, Any]  # The other fields of personal.json, as they are
+
+    @classmethod
+    def from_dict(cls, personal_info: Dict[str, Any]) -> 'Header':
+        info = dict(personal_info or {})
+        website = info.pop('website', '') or ''
+        if isinstance(website, dict):
+            website = website.get('url', '')
+        photo = info.pop('photo_path', None) or info.get('photo') or None
+        info.pop('photo', None)
+        fields = {name: str(info.pop(name, '') or '') for name in cls.__slots__
+                  if name not in ('website', 'photo', 'extra')}
+        return cls(website=website, photo=photo, extra=info, **fields)
+
+@dataclass
+class Job:
+    """An entry of the employment section."""
+    __slots__ = ('position', 'company', 'location', 'dates', 'years', 'responsibilities')
+    position: str
+    company: str
+    location: str
+    dates: str  # As shown in the text, e.g. 'May 2019 - Present'
+    years: str  # As shown in LaTeX, e.g. '2019-present'
+    responsibilities: List[str]
+
+    @classmethod
+    def from_dict(cls, job: Dict[str, Any]) -> 'Job':
+        # The range of years falls back to the field names of older data files
+        start = job.get('start_date') or job.get('start_year') or job.get('start') or ''
+        end = job.get('end_date') or job.get('end_year') or job.get('end') or ''
+        return cls(position=job.get('position', ''), company=job.get('company', job.get('employer', '')),
+                   location=job.get('location') or '',
+                   dates=format_date_range(job.get('start_date', ''), job.get('end_date', '')),
+                   years=format_year_range(start, end), responsibilities=list(job.get('responsibilities', [])))
+
+@dataclass
+class Degree:
+    """An entry of the education section. The optional fields are None when the data has none."""
+    __slots__ = ('degree', 'institution', 'location', 'dates', 'years', 'dissertation', 'focus_areas',
+                 'department', 'description', 'grade')
+    degree: str
+    institution: str
+    location: str
+    dates: str
+    years: str
+    dissertation: Optional[str]
+    focus_areas: Optional[List[str]]
+    department: Optional[str]
+    description: str
+    grade: str
+
+    @classmethod
+    def from_dict(cls, edu: Dict[str, Any]) -> 'Degree':
+        start = edu.get('start_date') or edu.get('start_year') or ''
+        end = edu.get('end_date') or edu.get('end_year') or ''
+        focus_areas = edu.get('focus_areas')
+        return cls(degree=edu.get('degree', ''), institution=edu.get('institution', ''),
+                   location=edu.get('location', ''),
+                   dates=format_date_range(edu.get('start_date', ''), edu.get('end_date', '')),
+                   years=format_year_range(start, end), dissertation=edu.get('dissertation'),
+                   focus_areas=list(focus_areas) if focus_areas is not None else None,
+                   department=edu.get('department'), description=edu.get('description', ''),
+                   grade=edu.get('grade', ''))
+
+@dataclass
+class Author:
+    """An author of a publication, as given ('First Last' or 'Last, First') and split into names."""
+    __slots__ = ('name', 'last', 'first')
+    name: str
+    last: str
+    first: str  # Empty for a single name
+
+    @classmethod
+    def parse(cls, name: str) -> 'Author':
+        if "," in name:
+            last, first = name.split(",", 1)
+            return cls(name, last.strip(), first.strip())
+        parts = name.split()
+        if len(parts) >= 2:
+            return cls(name, parts[-1], " ".join(parts[:-1]))
+        return cls(name, parts[-1] if parts else '', '')
+
+    def short(self) -> str:
+        """The name as cited in the text: 'Last, F.'"""
+        if self.first:
+            return f"{self.last}, {self.first[0]}."
+        return self.last if "," in self.name else self.name
+
+    def bibtex(self) -> str:
+        """The name as BibTeX expects it: 'Last, First'"""
+        if "," in self.name:
+            return self.name.strip()
+        return f"{self.last}, {self.first}" if self.first else self.name
+
+@dataclass
+class Publication:
+    """An entry of the publications section. The optional fields are None when the data has none."""
+    __slots__ = ('type', 'key', 'authors', 'title', 'year', 'journal', 'volume', 'number', 'pages', 'publisher',
+                 'booktitle', 'organization', 'note', 'citations', 'to_appear')
+    type: str
+    key: str  # BibTeX citation key
+    authors: List[Author]
+    title: str
+    year: Any
+    journal: Optional[str]
+    volume: Any
+    number: Any
+    pages: Optional[str]
+    publisher: Optional[str]
+    booktitle: Optional[str]
+    organization: Optional[str]
+    note: Optional[str]
+    citations: int
+    to_appear: bool  # The note says 'to appear'
+
+    @classmethod
+    def from_dict(cls, pub: Dict[str, Any]) -> 'Publication':
+        authors = [Author.parse(author) for author in pub.get('author', [])]
+        key = pub.get('citation_key')
+        if not key:
+            # Made of the last name of the first author and the year
+            if authors and ("," in authors[0].name or authors[0].last):
+                last_name = authors[0].last.lower()
+            else:
+                last_name = 'unknown'
+            key = ''.join(c for c in last_name if c.isalnum()) + str(pub.get('year', ''))
+        note = pub.get('note')
+        return cls(type=pub.get('type', 'article'), key=key, authors=authors, title=pub.get('title', ''),
+                   year=pub.get('year', ''), journal=pub.get('journal'), volume=pub.get('volume'),
+                   number=pub.get('number'), pages=pub.get('pages'), publisher=pub.get('publisher'),
+                   booktitle=pub.get('booktitle'), organization=pub.get('organization'), note=note,
+                   citations=pub.get('citations', 0), to_appear=bool(note) and 'to appear' in note.lower())
+
+def sort_publications(publications: List[Publication]) -> List[Publication]:
+    """Orders publications as the CV lists them: those to appear first, most recent first, then the
+    others by citation count, most cited first."""
+    to_appear = sorted((pub for pub in publications if pub.to_appear), key=lambda pub: pub.year or 0, reverse=True)
+    regular = sorted((pub for pub in publications if not pub.to_appear), key=lambda pub: pub.citations, reverse=True)
+    return to_appear + regular
+
+# Section kinds, in the order a data file is recognised by, and the class of their entries
+ENTRY_TYPES = {
+    'education': Degree,
+    'employment': Job,
+    'publications': Publication,
+}
+
+def entries(kind: str, items: List[Any]) -> List[Any]:
+    """Returns the entries of a section of the given kind, from JSON data or entries already built."""
+    entry_type = ENTRY_TYPES[kind]
+    result = [item if isinstance(item, entry_type) else entry_type.from_dict(item) for item in items]
+    return sort_publications(result) if kind == 'publications' else result
+
+@dataclass
+class Section:
+    """The data of a section, as rendered by a render() call of a pymd block."""
+    __slots__ = ('kind', 'entries')
+    kind: str  # 'education', 'employment' or 'publications'
+    entries: List[Any]
+
+def build_section(data: Dict[str, Any]) -> Optional['Section']:
+    """Builds the section of a loaded JSON data file, or returns None if it is not one."""
+    for kind in ENTRY_TYPES:
+        if kind in data:
+            return Section(kind, entries(kind, data[kind]))
+    return None
+
+@dataclass
+class Document:
+    """A CV: its header and the sections of its template, in order."""
+    __slots__ = ('header', 'sections')
+    header: Header
+    sections: List[Section]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        import json
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=indent)
@@ -0,0 +1,85 @@
+"""
+Output channel of the pymd blocks of the AI-aware CV generator
+
+A pymd block is replaced by what it prints. Each block prints into its own sink, held in a context
+variable: every thread, and every asyncio task, sees only the sink of the block it runs. Documents
+can thus be generated concurrently in one process. While blocks run, sys.stdout is a proxy that
+writes to the sink of the running block, so that code writing to sys.stdout directly is captured
+too, and to the original stream in every other context.
+"""
+import contextvars
+import io
+import sys
+import threading
+from contextlib import contextmanager
+
+_sink = contextvars.ContextVar('aicv_pymd_sink', default=None)
+
+class _StdoutProxy:
+    """Stands in for sys.stdout while pymd blocks run: writes to the sink of the block running in the
+    current context, and to the stream it replaced everywhere else."""
+    def __init__(self, stream):
+        self.stream = stream
+
+    def _target(self):
+        sink = _sink.get()
+        return self.stream if sink is None else sink
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def writelines(self, lines):
+        self._target().writelines(lines)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name):
+        # encoding, buffer, fileno(), isatty() and the like
+        return getattr(self._target(), name)
+
+# Number of blocks running in the process, which keep the proxy installed
+_running = 0
+_running_lock = threading.Lock()
+
+def _enter_block():
+    global _running
+    with _running_lock:
+        if _running == 0 and sys.stdout is not None and not isinstance(sys.stdout, _StdoutProxy):
+            sys.stdout = _StdoutProxy(sys.stdout)
+        _running += 1
+
+def _leave_block():
+    global _running
+    with _running_lock:
+        _running -= 1
+        if _running == 0 and isinstance(sys.stdout, _StdoutProxy):
+            sys.stdout = sys.stdout.stream
+
+def emit(*values, sep=' ', end='\n', file=None, flush=False):
+    """Prints into the output of the running pymd block, or to sys.stdout outside of one.
+
+    It takes the arguments of print(), and is what print() is within a pymd block. An explicit
+    file is written to as print() would.
+    """
+    if file is None:
+        file = _sink.get()
+        if file is None:
+            file = sys.stdout
+    print(*values, sep=sep, end=end, file=file, flush=flush)
+
+@contextmanager
+def capture():
+    """Collects what emit() prints, and what is written to sys.stdout, in the current context.
+
+    Yields:
+        io.StringIO: The sink; its value is the output once the block is left
+    """
+    sink = io.StringIO()
+    token = _sink.set(sink)
+    _enter_block()
+    try:
+        yield sink
+    finally:
+        _leave_block()
+        _sink.reset(token)
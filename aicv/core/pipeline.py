@@ -0,0 +1,144 @@
+"""
+Staged pipeline executor for the AI-aware CV generator
+"""
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+_DONE = object()
+
+class Stage:
+    """A pipeline stage: a picklable function run on its own pool of worker processes.
+
+    Args:
+        name (str): Stage name, used in error messages
+        fn (callable): Function taking an item and returning the item for the next stage.
+            It must be picklable (a module-level function or a functools.partial of one).
+        workers (int): Number of items processed concurrently by this stage
+        initializer (callable, optional): Called once in every worker process of this stage
+        initargs (tuple): Arguments for the initializer
+    """
+    def __init__(self, name: str, fn: Callable[[Any], Any], workers: int = 1, initializer: Optional[Callable] = None, initargs: Tuple = ()):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.initializer = initializer
+        self.initargs = initargs
+
+def run_pipeline(items: Iterable[Any], stages: List[Stage], queue_size: int = 8, on_error: Optional[Callable[[Any, str, BaseException], Any]] = None,
+                 inboxes: Optional[Dict[str, queue.Queue]] = None):
+    """Runs every item through the stages in order and yields the results as they leave the last stage.
+
+    Every stage has its own process pool with `workers` processes, so a slow stage can be given more
+    concurrency than a cheap one. Stages are connected by queues holding at most `queue_size` items:
+    when a stage falls behind, the stages before it block instead of piling up intermediate results,
+    so memory stays bounded by the queue sizes and the number of workers.
+
+    Args:
+        items (Iterable[Any]): Input items, consumed lazily
+        stages (List[Stage]): Stages to run, in order
+        queue_size (int): Capacity of each queue between stages
+        on_error (callable, optional): Called as on_error(item, stage_name, exception) when a stage raises.
+            Its return value replaces the item and is passed through the remaining stages untouched.
+            If not given, the exception propagates to the caller.
+        inboxes (dict, optional): If given, filled with the input queue of each stage by name, e.g. to
+            monitor the depth of the queues
+    Yields:
+        The items returned by the last stage (or by on_error), in completion order
+    """
+    queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in range(len(stages) + 1)]
+    if inboxes is not None:
+        inboxes.update((stage.name, q) for stage, q in zip(stages, queues))
+    errors = []
+    stop = threading.Event()
+    executors = [ProcessPoolExecutor(max_workers=stage.workers, initializer=stage.initializer, initargs=stage.initargs)
+                 for stage in stages]
+    threads = []
+
+    def put(q, item):
+        # Bounded put that gives up when the pipeline is being torn down
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(q):
+        # Blocking get that returns _DONE when the pipeline is being torn down
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def feed():
+        try:
+            for item in items:
+                # Items travel between stages as (item, failed) pairs; failed items bypass the remaining stages
+                if not put(queues[0], (item, False)):
+                    return
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            for _ in range(stages[0].workers):
+                put(queues[0], _DONE)
+
+    def dispatch(index, remaining):
+        stage, executor = stages[index], executors[index]
+        inbox, outbox = queues[index], queues[index + 1]
+        try:
+            while True:
+                entry = get(inbox)
+                if entry is _DONE:
+                    break
+                item, failed = entry
+                if not failed:
+                    try:
+                        item = executor.submit(stage.fn, item).result()
+                    except Exception as e:
+                        if on_error is None:
+                            raise
+                        item, failed = on_error(item, stage.name, e), True
+                if not put(outbox, (item, failed)):
+                    break
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            # The last dispatcher of a stage to finish signals the next stage
+            with remaining[1]:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                next_workers = stages[index + 1].workers if index + 1 < len(stages) else 1
+                for _ in range(next_workers):
+                    put(outbox, _DONE)
+
+    threads.append(threading.Thread(target=feed, daemon=True))
+    for index, stage in enumerate(stages):
+        remaining = [stage.workers, threading.Lock()]
+        for _ in range(stage.workers):
+            threads.append(threading.Thread(target=dispatch, args=(index, remaining), daemon=True))
+
+    try:
+        for thread in threads:
+            thread.start()
+        while True:
+            entry = get(queues[-1])
+            if entry is _DONE:
+                break
+            yield entry[0]
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        for executor in executors:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    if errors:
+        raise errors[0]
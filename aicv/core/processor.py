@@ -1,37 +1,243 @@
 """
 Core logic for the AI-aware CV generator
 """
-from typing import Dict, Any, Optional
-from aicv.core.extensions import PyMdExtension, PyMdPreprocessor
-from aicv.backend.markdown import create_markdown
-from aicv.backend.html import create_html
-from aicv.backend.moderncv import create_moderncv
+import os
+import time
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+from aicv.core.extensions import PyMdPreprocessor, compile_template
+from aicv.core.metrics import DOCUMENTS, record_stage
+from aicv.core.model import Document, Header
+from aicv.core.sources import DataSource, DirectorySource
 
-def generate(file_path: str, personal_info: Dict[str, Any], backend: str = 'markdown', emojis: bool = True) -> str:
-    """Reads a Markdown file, processes it with the custom extension, and returns the
-    processed markdown, html or latex content.
-    This provides a clean intermediate markdown, html or latex representation.
+def load_personal_info(input_dir: Optional[str] = None, source: Optional[DataSource] = None) -> Dict[str, Any]:
+    """Loads personal.json from the given directory or data source and resolves the photo path.
+
+    Args:
+        input_dir (str, optional): Directory containing personal.json (usually the directory of cv.md)
+        source (DataSource, optional): Data source to read personal.json from instead of input_dir
+    Returns:
+        Dict[str, Any]: Personal information with 'photo_path' set to an absolute path or None
+    """
+    if source is None:
+        source = DirectorySource(input_dir)
+    # A copy, as a caching source hands out the same dict to every caller
+    personal_info = dict(source.load_json('personal.json'))
+
+    if 'photo' in personal_info and personal_info['photo']:
+        photo_path = personal_info['photo']
+        if not os.path.isabs(photo_path):
+            personal_info['photo_path'] = source.locate(photo_path)
+        else:
+            personal_info['photo_path'] = photo_path
+    else:
+        personal_info['photo_path'] = None
+
+    return personal_info
+
+def latex_files(personal_info: Dict[str, Any], source: Optional[DataSource] = None) -> Dict[str, bytes]:
+    """Returns the files pdflatex must find next to a moderncv document that are not local files.
+
+    A relative photo that the source holds but cannot locate on the local filesystem, such as the
+    photo of a .cvpack bundle, is referred to by its relative name in the LaTeX document; it has to be
+    written into the directory pdflatex runs in.
+
+    Returns:
+        Dict[str, bytes]: Content of each file by its name relative to the document
+    """
+    photo = personal_info.get('photo')
+    if not photo or os.path.isabs(photo) or personal_info.get('photo_path') or source is None or not source.exists(photo):
+        return {}
+    return {photo: source.read_bytes(photo)}
+
+def preprocess(file_path: str, personal_info: Dict[str, Any], backend: str = 'markdown', emojis: bool = True,
+               dependencies: Optional[List[str]] = None, source: Optional[DataSource] = None,
+               block_workers: int = 0) -> Tuple[str, str]:
+    """Reads a Markdown file and executes its pymd blocks, without building the final document.
 
     Args:
         file_path (str): Path to the Markdown file
         personal_info (Dict[str, Any]): Personal information dictionary
         backend (str): The backend to use for processing. Can be 'markdown', 'html', or 'moderncv'
         emojis (bool): Whether to enable emojis in the CV text (except personal info)
+        dependencies (List[str], optional): If given, the paths of the Markdown file and of every
+            JSON file read by the pymd blocks are appended to it, with the paths where a file was
+            looked up before it was found, or in vain
+        source (DataSource, optional): Data source to read the Markdown file and the JSON files from.
+            Defaults to the directory of the Markdown file, then the current directory.
+        block_workers (int): If more than 1, the pymd blocks run concurrently on as many threads, for
+            templates whose blocks are independent. The result is the same as when they run in order.
     Returns:
-        str: The processed content with all pymd blocks executed
+        Tuple[str, str]: The processed content and the BibTeX content collected for moderncv
+    """
+    preprocessor, plan = _open_template(file_path, personal_info, backend, emojis, dependencies, source, block_workers)
+    processed_content = '\n'.join(preprocessor.iter_plan(plan))
+    return processed_content, preprocessor.bib_content
+
+def _open_template(file_path, personal_info, backend, emojis, dependencies, source, block_workers, sections=None):
+    """Reads a Markdown file and returns a preprocessor for it, with the render plan of the file to run it on.
+    The plan is compiled once per template text and backend (see compile_template())."""
+    if source is None:
+        source = DirectorySource(os.path.dirname(os.path.abspath(file_path)), os.curdir)
+        file_path = os.path.abspath(file_path)
+
+    file_content = source.read_text(file_path)
+    path = source.locate(file_path)
+    if dependencies is not None and path:
+        dependencies.append(path)
+
+    preprocessor = PyMdPreprocessor(personal_info, backend=backend, emojis=emojis,
+                                    dependencies=dependencies, source=source, block_workers=block_workers,
+                                    sections=sections)
+    return preprocessor, compile_template(file_content, backend, emojis)
+
+def load_document(file_path: str, personal_info: Dict[str, Any], source: Optional[DataSource] = None,
+                  block_workers: int = 0) -> Document:
+    """Runs the pymd blocks of a Markdown file and returns the document model of the CV: the header and
+    the data of every section the blocks render, in order (see aicv.core.model). Document.to_json()
+    writes it out for other tools.
+
+    Args:
+        file_path (str): Path to the Markdown file
+        personal_info (Dict[str, Any]): Personal information dictionary
+        source (DataSource, optional): Data source to read the Markdown file and the JSON files from
+        block_workers (int): If more than 1, the pymd blocks run concurrently on as many threads
+    Returns:
+        Document: The document model
     """
-    with open(file_path, 'r', encoding='utf-8') as f:
-        file_content = f.read()
+    sections = []
+    preprocessor, plan = _open_template(file_path, personal_info, 'markdown', False, None, source, block_workers,
+                                        sections=sections)
+    for _ in preprocessor.iter_plan(plan):
+        pass
+    return Document(Header.from_dict(personal_info), sections)
+
+def _separated(chunks: Iterable[str]) -> Iterator[str]:
+    """Prefixes every chunk but the first with the newline that joins it to the previous one."""
+    separator = ''
+    for chunk in chunks:
+        yield separator + chunk
+        separator = '\n'
+
+def _timed(chunks: Iterable[str], timing: Dict[str, Any]) -> Iterator[str]:
+    """Passes the chunks through, adding the time spent producing them to timing['seconds'] and
+    setting timing['failed'] if producing one raises."""
+    iterator = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        except Exception:
+            timing['failed'] = True
+            raise
+        finally:
+            timing['seconds'] += time.perf_counter() - start
+        yield chunk
 
-    preprocessor = PyMdPreprocessor(personal_info, backend=backend, emojis=emojis)
-    processed_lines = preprocessor.run(file_content.splitlines())
-    processed_content = '\n'.join(processed_lines)
+def assemble(processed_content: str, personal_info: Dict[str, Any], backend: str = 'markdown', emojis: bool = True, bib_content: str = '',
+             source: Optional[DataSource] = None) -> str:
+    """Wraps preprocessed content into the complete markdown, html or latex document.
 
+    Args:
+        processed_content (str): Content returned by preprocess()
+        personal_info (Dict[str, Any]): Personal information dictionary
+        backend (str): The backend to use. Can be 'markdown', 'html', or 'moderncv'
+        emojis (bool): Whether to enable emojis in the CV text (except personal info)
+        bib_content (str): BibTeX content returned by preprocess(), used by moderncv
+        source (DataSource, optional): Data source to read the photo from, for html
+    Returns:
+        str: The complete document
+    """
+    # Only the selected backend is imported
     if backend == 'html':
-        return create_html(processed_content, personal_info, emojis=emojis)
+        from aicv.backend.html import create_html
+        return create_html(processed_content, personal_info, emojis=emojis, source=source)
     elif backend == 'moderncv':
-        # Pass the bibliography content collected during processing
-        bib_content = getattr(preprocessor, 'bib_content', '')
+        from aicv.backend.moderncv import create_moderncv
         return create_moderncv(processed_content, personal_info, bib_content)
     else: # markdown
+        from aicv.backend.markdown import create_markdown
         return create_markdown(processed_content, personal_info, emojis=emojis)
+
+def generate_iter(file_path: str, personal_info: Dict[str, Any], backend: str = 'markdown', emojis: bool = True,
+                  source: Optional[DataSource] = None, block_workers: int = 0) -> Iterator[str]:
+    """Generates the markdown, html or latex content of a CV in chunks, which can be written out as
+    they come instead of holding the whole document.
+
+    The chunks are the header with the personal info, the converted text of each run of Markdown
+    lines and the output of each pymd block, each yielded as soon as it is ready, then the end of
+    the document. The moderncv preamble inlines the bibliography, so the moderncv backend only yields
+    once every pymd block has run. Joined, the chunks are the document generate() returns.
+
+    Args:
+        file_path (str): Path to the Markdown file
+        personal_info (Dict[str, Any]): Personal information dictionary
+        backend (str): The backend to use for processing. Can be 'markdown', 'html', or 'moderncv'
+        emojis (bool): Whether to enable emojis in the CV text (except personal info)
+        source (DataSource, optional): Data source to read the Markdown file and the JSON files from
+        block_workers (int): If more than 1, the pymd blocks run concurrently on as many threads, for
+            templates whose blocks are independent. The result is the same as when they run in order.
+    Yields:
+        str: The next chunk of the document
+    """
+    # Parsing and rendering interleave: the time spent reading the template and running the pymd blocks
+    # is the parse stage, the rest is render, except the time the caller spends between two chunks
+    parse = {'seconds': 0.0, 'failed': False}
+    failed = False
+    waiting = 0.0
+    start = time.perf_counter()
+    try:
+        try:
+            preprocessor, plan = _open_template(file_path, personal_info, backend, emojis, None, source, block_workers)
+        except Exception:
+            parse['failed'] = True
+            raise
+        finally:
+            parse['seconds'] += time.perf_counter() - start
+        chunks = _separated(_timed(preprocessor.iter_plan(plan), parse))
+
+        # Only the selected backend is imported
+        if backend == 'html':
+            from aicv.backend.html import iter_html
+            document = iter_html(chunks, personal_info, emojis=emojis, source=source)
+        elif backend == 'moderncv':
+            from aicv.backend.moderncv import iter_moderncv
+            chunks = list(chunks)
+            document = iter_moderncv(chunks, personal_info, preprocessor.bib_content)
+        else: # markdown
+            from aicv.backend.markdown import iter_markdown
+            document = iter_markdown(chunks, personal_info, emojis=emojis)
+        for chunk in document:
+            paused = time.perf_counter()
+            yield chunk
+            waiting += time.perf_counter() - paused
+    except Exception:
+        failed = True
+        DOCUMENTS.inc(backend=backend, status='failed')
+        raise
+    finally:
+        render_seconds = time.perf_counter() - start - waiting - parse['seconds']
+        record_stage('parse', backend, parse['seconds'], failed=parse['failed'])
+        record_stage('render', backend, render_seconds, failed=failed and not parse['failed'])
+    DOCUMENTS.inc(backend=backend, status='ok')
+
+def generate(file_path: str, personal_info: Dict[str, Any], backend: str = 'markdown', emojis: bool = True,
+             source: Optional[DataSource] = None, block_workers: int = 0) -> str:
+    """Reads a Markdown file, processes it with the custom extension, and returns the
+    processed markdown, html or latex content.
+    This provides a clean intermediate markdown, html or latex representation.
+
+    Args:
+        file_path (str): Path to the Markdown file
+        personal_info (Dict[str, Any]): Personal information dictionary
+        backend (str): The backend to use for processing. Can be 'markdown', 'html', or 'moderncv'
+        emojis (bool): Whether to enable emojis in the CV text (except personal info)
+        source (DataSource, optional): Data source to read the Markdown file and the JSON files from
+        block_workers (int): If more than 1, the pymd blocks run concurrently on as many threads, for
+            templates whose blocks are independent. The result is the same as when they run in order.
+    Returns:
+        str: The processed content with all pymd blocks executed
+    """
+    return ''.join(generate_iter(file_path, personal_info, backend=backend, emojis=emojis, source=source,
+                                 block_workers=block_workers))
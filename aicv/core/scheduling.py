@@ -0,0 +1,122 @@
+"""
+Cost estimation and longest-processing-time-first ordering of batch jobs
+"""
+import json
+import os
+import statistics
+from typing import Dict, Any, List, Optional
+
+# Relative cost of a CV, before scaling, by the signals that are cheap to obtain up front
+BASE_COST = 1.0
+ENTRY_COSTS = {
+    'publications.json': ('publications', 0.05),
+    'employment.json': ('employment', 0.1),
+    'education.json': ('education', 0.05),
+}
+PHOTO_COST_PER_MB = 0.5
+# The size of a JSONL record or of a person's data in a database stands in for the entry counts
+RECORD_COST_PER_KB = 0.1
+BACKEND_FACTORS = {'markdown': 0.2, 'html': 1.0, 'moderncv': 1.0}
+PDF_FACTORS = {'html': 10.0, 'moderncv': 20.0}
+
+def count_entries(json_path: str, key: str) -> int:
+    """Returns the number of entries in a section JSON file, or 0 if it is missing or malformed."""
+    try:
+        with open(json_path, 'r') as f:
+            data = json.load(f)
+        return len(data.get(key, []))
+    except (OSError, ValueError, AttributeError, TypeError):
+        return 0
+
+def _photo_size(input_dir: str) -> int:
+    try:
+        with open(os.path.join(input_dir, 'personal.json'), 'r') as f:
+            photo = json.load(f).get('photo')
+        if photo:
+            return os.path.getsize(os.path.join(input_dir, photo))
+    except (OSError, ValueError, AttributeError, TypeError):
+        pass
+    return 0
+
+def estimate_cost(job: Dict[str, Any], options: Dict[str, Any]) -> float:
+    """Estimates the relative cost of rendering a job from entry counts, photo size and backend.
+
+    The result is in arbitrary units: only the ratios between jobs matter, unless it is scaled
+    by timings from previous runs (see order_jobs()).
+    """
+    cost = BASE_COST
+    if 'record_size' in job:
+        cost += RECORD_COST_PER_KB * job['record_size'] / 1024
+    else:
+        for filename, (key, per_entry) in ENTRY_COSTS.items():
+            cost += per_entry * count_entries(os.path.join(job['input_dir'], filename), key)
+
+    backend = options.get('backend', 'html')
+    if backend == 'html' or options.get('pdf'):
+        # The photo is only read when it is embedded into HTML or a PDF
+        cost += PHOTO_COST_PER_MB * _photo_size(job['input_dir']) / (1024 * 1024)
+
+    cost *= BACKEND_FACTORS.get(backend, 1.0)
+    if options.get('pdf'):
+        cost *= PDF_FACTORS.get(backend, 1.0)
+    return cost
+
+def timing_key(job: Dict[str, Any], options: Dict[str, Any]) -> str:
+    """Key identifying a job and the way it is rendered in the timings file."""
+    backend = options.get('backend', 'html')
+    if options.get('pdf') and backend != 'markdown':
+        backend += '+pdf'
+    if 'record' in job:
+        return f"{backend}:{job['jsonl']}#{job['record']}"
+    if 'person' in job:
+        return f"{backend}:{job['database']}#{job['person']}"
+    return f"{backend}:{job['cv_path']}"
+
+def load_timings(path: str) -> Dict[str, float]:
+    """Loads the timings recorded by previous runs, or an empty dict if there are none."""
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: ignoring unreadable timings file {path}: {e}")
+        return {}
+
+def save_timings(path: str, timings: Dict[str, float]):
+    """Atomically writes the timings to the given file."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(timings, f, indent=0, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def order_jobs(jobs: List[Dict[str, Any]], options: Dict[str, Any], timings: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """Orders jobs longest-processing-time first, which keeps a long job from setting the makespan
+    by starting last.
+
+    Each job gets an 'estimated_cost' field. Jobs with a recorded timing use it directly; the
+    estimates of the others are scaled to seconds by the median ratio between recorded timings
+    and estimates, so that both can be compared.
+
+    Args:
+        jobs (List[Dict[str, Any]]): Jobs as returned by discover_jobs()
+        options (Dict[str, Any]): Batch options (backend and pdf affect the cost)
+        timings (Dict[str, float], optional): Seconds per timing_key() from previous runs
+    Returns:
+        List[Dict[str, Any]]: The jobs, most expensive first
+    """
+    timings = timings or {}
+    estimates = [estimate_cost(job, options) for job in jobs]
+
+    ratios = []
+    for job, estimate in zip(jobs, estimates):
+        recorded = timings.get(timing_key(job, options))
+        if recorded is not None and estimate > 0:
+            ratios.append(recorded / estimate)
+    scale = statistics.median(ratios) if ratios else 1.0
+
+    for job, estimate in zip(jobs, estimates):
+        recorded = timings.get(timing_key(job, options))
+        job['estimated_cost'] = recorded if recorded is not None else estimate * scale
+
+    return sorted(jobs, key=lambda job: job['estimated_cost'], reverse=True)
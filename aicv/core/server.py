@@ -0,0 +1,338 @@
+"""
+HTTP render service for the AI-aware CV generator
+
+`aicv serve ROOT` renders the CV folders under ROOT on demand:
+
+    GET  /cv/<folder>?format=html|markdown|moderncv|pdf
+    POST /render?format=...        (body: a JSON record, rendered with --template)
+    GET  /metrics                  (Prometheus text format)
+
+Every response carries an ETag computed from the SHA-256 of the inputs (the template, the JSON
+files and the photo), the format and the aicv version. The inputs are hashed without rendering
+anything, and the hashes are cached by size and modification time. A request whose
+If-None-Match matches gets a 304 at the cost of a few stat() calls, and a request for a
+document that is still in the cache gets it without running generate() or WeasyPrint.
+Identical requests that arrive while a document is rendering wait for that one render instead
+of starting their own.
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+from aicv.core.manifest import file_digest
+from aicv.core.metrics import REGISTRY
+from aicv.core.sources import DataSource, DirectorySource, RecordSource
+
+# format -> (backend, content type)
+FORMATS = {
+    'html': ('html', 'text/html; charset=utf-8'),
+    'markdown': ('markdown', 'text/markdown; charset=utf-8'),
+    'moderncv': ('moderncv', 'application/x-tex; charset=utf-8'),
+    'pdf': ('html', 'application/pdf'),
+}
+
+DEFAULT_CACHE_SIZE = 256
+
+RESPONSES = REGISTRY.counter('aicv_serve_responses_total', 'Documents served, by how they were obtained: '
+                             'render, cache, coalesced (waited for a concurrent render) or not_modified', ('result',))
+
+class DigestCache:
+    """SHA-256 of files, recomputed only when their size or modification time changes."""
+    def __init__(self):
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def digest(self, path: str) -> Optional[str]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            cached = self._digests.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        digest = file_digest(path)
+        with self._lock:
+            self._digests[path] = (key, digest)
+        return digest
+
+    def folder_inputs(self, folder: str, cv_name: str) -> Dict[str, Optional[str]]:
+        """Digests of everything a CV folder can be rendered from: the template, the JSON files and the photo."""
+        names = [cv_name] + sorted(name for name in os.listdir(folder) if name.endswith('.json'))
+        inputs = {name: self.digest(os.path.join(folder, name)) for name in names}
+        try:
+            with open(os.path.join(folder, 'personal.json'), 'rb') as f:
+                photo = json.loads(f.read()).get('photo')
+        except (OSError, ValueError):
+            photo = None
+        if photo:
+            inputs['photo:' + photo] = self.digest(os.path.join(folder, photo))
+        return inputs
+
+class Coalescer:
+    """Runs a function once per key at a time: callers asking for a key that is being computed
+    wait for the running call and share its result (or exception)."""
+    def __init__(self):
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def run(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Returns the result of fn() and whether this caller waited for another one's call."""
+        with self._lock:
+            future = self._running.get(key)
+            leader = future is None
+            if leader:
+                future = self._running[key] = Future()
+        if not leader:
+            return future.result(), True
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._running[key]
+        return future.result(), False
+
+class RenderService:
+    """Renders CVs for the HTTP handler, with ETags, an LRU cache and request coalescing.
+
+    Args:
+        root (str): Directory containing the CV folders
+        cv_name (str): Name of the Markdown file in each folder
+        template (str, optional): Markdown template for posted JSON records
+        cache_size (int): Documents kept in memory
+        options (Dict[str, Any], optional): emojis, paper and page_numbers, as for `aicv batch`
+    """
+    def __init__(self, root: str, cv_name: str = 'cv.md', template: Optional[str] = None,
+                 cache_size: int = DEFAULT_CACHE_SIZE, options: Optional[Dict[str, Any]] = None):
+        self.root = os.path.realpath(root)
+        self.cv_name = cv_name
+        self.template = os.path.abspath(template) if template else None
+        self.cache_size = cache_size
+        self.options = dict(options or {})
+        self.digests = DigestCache()
+        self.coalescer = Coalescer()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def resolve(self, folder: str) -> Optional[str]:
+        """Path of a CV folder under the root, or None if there is none (or it is outside the root)."""
+        path = os.path.realpath(os.path.join(self.root, folder.strip('/')))
+        if path != self.root and not path.startswith(self.root + os.sep):
+            return None
+        if not os.path.isfile(os.path.join(path, self.cv_name)):
+            return None
+        return path
+
+    def etag(self, fmt: str, inputs: Dict[str, Any]) -> str:
+        from aicv import __version__
+        options = {key: self.options.get(key) for key in ('emojis', 'paper', 'page_numbers')}
+        payload = json.dumps([__version__, fmt, options, sorted(inputs.items())], sort_keys=True)
+        return '"' + hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32] + '"'
+
+    def folder_etag(self, folder: str, fmt: str) -> str:
+        return self.etag(fmt, self.digests.folder_inputs(folder, self.cv_name))
+
+    def record_etag(self, body: bytes, fmt: str) -> str:
+        inputs = self.digests.folder_inputs(os.path.dirname(self.template), os.path.basename(self.template))
+        inputs['record'] = hashlib.sha256(body).hexdigest()
+        return self.etag(fmt, inputs)
+
+    def cached(self, etag: str) -> Optional[bytes]:
+        with self._cache_lock:
+            document = self._cache.get(etag)
+            if document is not None:
+                self._cache.move_to_end(etag)
+            return document
+
+    def get(self, etag: str, render: Callable[[], bytes]) -> bytes:
+        """Returns the document of an ETag from the cache, or renders it once for all concurrent callers."""
+        document = self.cached(etag)
+        if document is not None:
+            RESPONSES.inc(result='cache')
+            return document
+
+        def render_and_store():
+            document = render()
+            with self._cache_lock:
+                self._cache[etag] = document
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            return document
+
+        document, coalesced = self.coalescer.run(etag, render_and_store)
+        RESPONSES.inc(result='coalesced' if coalesced else 'render')
+        return document
+
+    def render(self, cv_path: str, source: DataSource, fmt: str, base_url: Optional[str]) -> bytes:
+        from aicv.core.processor import generate, load_personal_info
+
+        backend = FORMATS[fmt][0]
+        emojis = self.options.get('emojis')
+        if emojis is None or backend == 'moderncv':
+            emojis = backend == 'html'
+        personal_info = load_personal_info(source=source)
+        content = generate(cv_path, personal_info, backend=backend, emojis=emojis, source=source)
+        if fmt != 'pdf':
+            return content.encode('utf-8')
+        from aicv.utils.pdf_converter import html_to_pdf_bytes
+        return html_to_pdf_bytes(content, paper_size=self.options.get('paper', 'A4'),
+                                 add_page_numbers=self.options.get('page_numbers', True), base_url=base_url)
+
+    def render_folder(self, folder: str, fmt: str) -> bytes:
+        return self.render(self.cv_name, DirectorySource(folder), fmt, base_url=folder)
+
+    def render_record(self, body: bytes, fmt: str) -> bytes:
+        record = json.loads(body)
+        if not isinstance(record, dict):
+            raise ValueError("the record must be a JSON object")
+        template_dir = os.path.dirname(self.template)
+        source = RecordSource(record, fallback=DirectorySource(template_dir))
+        return self.render(os.path.basename(self.template), source, fmt, base_url=template_dir)
+
+class RenderHandler(BaseHTTPRequestHandler):
+    """HTTP front end of a RenderService (set as the `service` class attribute)."""
+    service: RenderService = None
+    server_version = 'aicv'
+
+    def _format(self, query: Dict[str, list]) -> Optional[str]:
+        fmt = query.get('format', ['html'])[0]
+        if fmt not in FORMATS:
+            self._send_error(400, f"Unknown format {fmt}: use one of {', '.join(FORMATS)}")
+            return None
+        return fmt
+
+    def _send_error(self, status: int, message: str):
+        body = (message + '\n').encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_modified(self, etag: str) -> bool:
+        # If-None-Match may list several ETags, or be *
+        header = self.headers.get('If-None-Match')
+        if not header:
+            return False
+        tags = [tag.strip() for tag in header.split(',')]
+        if etag not in tags and f"W/{etag}" not in tags and '*' not in tags:
+            return False
+        RESPONSES.inc(result='not_modified')
+        self.send_response(304)
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        return True
+
+    def _send_document(self, fmt: str, etag: str, render: Callable[[], bytes]):
+        if self._not_modified(etag):
+            return
+        try:
+            document = self.service.get(etag, render)
+        except ImportError as e:
+            self._send_error(501, f"{e}")
+            return
+        except (ValueError, FileNotFoundError) as e:
+            self._send_error(400, f"{type(e).__name__}: {e}")
+            return
+        except Exception as e:
+            self._send_error(500, f"Rendering failed: {type(e).__name__}: {e}")
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', FORMATS[fmt][1])
+        self.send_header('Content-Length', str(len(document)))
+        self.send_header('ETag', etag)
+        # Clients may keep the document, but must revalidate it with If-None-Match
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(document)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path == '/metrics':
+            from aicv.core.metrics import CONTENT_TYPE
+            body = REGISTRY.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if not url.path.startswith('/cv/'):
+            self._send_error(404, "Not found: use /cv/<folder>?format=html|markdown|moderncv|pdf")
+            return
+        fmt = self._format(query)
+        if fmt is None:
+            return
+        folder = self.service.resolve(unquote(url.path[len('/cv/'):]))
+        if folder is None:
+            self._send_error(404, f"No CV folder {unquote(url.path[len('/cv/'):])}")
+            return
+        etag = self.service.folder_etag(folder, fmt)
+        self._send_document(fmt, etag, lambda: self.service.render_folder(folder, fmt))
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/render':
+            self._send_error(404, "Not found: POST a JSON record to /render?format=...")
+            return
+        if self.service.template is None:
+            self._send_error(400, "The server was started without --template, so it cannot render posted records")
+            return
+        fmt = self._format(parse_qs(url.query))
+        if fmt is None:
+            return
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        etag = self.service.record_etag(body, fmt)
+        self._send_document(fmt, etag, lambda: self.service.render_record(body, fmt))
+
+def make_server(service: RenderService, port: int, address: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Creates the HTTP server of a render service; call serve_forever() on it."""
+    handler = type('Handler', (RenderHandler,), {'service': service})
+    server = ThreadingHTTPServer((address, port), handler)
+    server.daemon_threads = True
+    return server
+
+def serve_main(argv=None):
+    """Entry point for `aicv serve`"""
+    parser = argparse.ArgumentParser(prog='aicv serve', description='Serve CVs over HTTP, rendered on demand.')
+    parser.add_argument('root', type=str, help='Directory containing the CV folders')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on (default: 8000)')
+    parser.add_argument('--address', type=str, default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--cv-name', type=str, default='cv.md', help='Name of the Markdown file in each CV folder (default: cv.md)')
+    parser.add_argument('--template', type=str, help='Markdown template for JSON records posted to /render')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE, help=f'Number of documents kept in memory (default: {DEFAULT_CACHE_SIZE})')
+    parser.add_argument('--paper', type=str, default='A4', help='PDF paper size (default: A4)')
+    parser.add_argument('--no-page-numbers', action='store_true', help='Disable page numbers in PDF output')
+    parser.add_argument('--emojis', dest='emojis', action='store_true', help='Enable emojis in CV text')
+    parser.add_argument('--no-emojis', dest='emojis', action='store_false', help='Disable emojis in CV text')
+    parser.set_defaults(emojis=None)
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.root):
+        print(f"Error: {args.root} is not a directory")
+        return 1
+    options = {'emojis': args.emojis, 'paper': args.paper, 'page_numbers': not args.no_page_numbers}
+    service = RenderService(args.root, cv_name=args.cv_name, template=args.template, cache_size=args.cache_size, options=options)
+    server = make_server(service, args.port, args.address)
+    print(f"Serving CVs from {args.root} at http://{args.address}:{server.server_port}/cv/<folder>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
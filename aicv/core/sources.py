@@ -0,0 +1,208 @@
+"""
+Data sources for the AI-aware CV generator
+
+A data source provides the files of one CV by name ('cv.md', 'personal.json', 'employment.json',
+the photo, ...), wherever they actually live.
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+class DataSource:
+    """Base class of data sources. Subclasses implement read_bytes() and usually locate()."""
+
+    def read_bytes(self, name: str) -> bytes:
+        """Returns the content of the named file. Raises FileNotFoundError if there is none."""
+        raise NotImplementedError
+
+    def read_text(self, name: str) -> str:
+        return self.read_bytes(name).decode('utf-8')
+
+    def load_json(self, name: str) -> Any:
+        """Returns the parsed content of the named JSON file. Raises FileNotFoundError if there is none."""
+        return json.loads(self.read_bytes(name))
+
+    def exists(self, name: str) -> bool:
+        try:
+            self.read_bytes(name)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def locate(self, name: str) -> Optional[str]:
+        """Returns the path of the named file on the local filesystem, or None if it is not a local file."""
+        return None
+
+    def searched(self, name: str) -> List[str]:
+        """Returns the local paths that are looked up for the named file, in order, up to the one it is
+        found at; all of them if there is none. A file that appears at one of the paths changes what
+        is read, so they are all inputs of a document that reads the name."""
+        path = self.locate(name)
+        return [path] if path else []
+
+class DirectorySource(DataSource):
+    """Files looked up in one or more directories, in order.
+
+    Args:
+        directories (str): Directories to search; absolute names are used as they are
+    """
+    def __init__(self, *directories: str):
+        self.directories = directories or (os.curdir,)
+
+    def locate(self, name: str) -> Optional[str]:
+        if os.path.isabs(name):
+            return name if os.path.exists(name) else None
+        for directory in self.directories:
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                return os.path.abspath(path)
+        return None
+
+    def read_bytes(self, name: str) -> bytes:
+        path = self.locate(name)
+        if path is None:
+            raise FileNotFoundError(name)
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def exists(self, name: str) -> bool:
+        return self.locate(name) is not None
+
+    def searched(self, name: str) -> List[str]:
+        if os.path.isabs(name):
+            return [name]
+        paths = []
+        for directory in self.directories:
+            path = os.path.abspath(os.path.join(directory, name))
+            paths.append(path)
+            if os.path.exists(path):
+                break
+        return paths
+
+class RecordSource(DataSource):
+    """A CV held in a dict, such as a line of a JSON Lines export.
+
+    The record maps section names to their data: 'personal' (or 'personal_info') holds the
+    content of personal.json, and 'employment', 'education' and 'publications' the lists that
+    would be in the corresponding JSON files. 'employment.json' thus reads as
+    {"employment": record["employment"]}. Other names, such as the template or the photo, are
+    looked up in the fallback source.
+
+    Args:
+        record (Dict[str, Any]): The CV data
+        fallback (DataSource, optional): Source for the names that are not in the record
+    """
+    PERSONAL_KEYS = ('personal', 'personal_info')
+
+    def __init__(self, record: Dict[str, Any], fallback: Optional[DataSource] = None):
+        self.record = record
+        self.fallback = fallback
+
+    def _section(self, name: str):
+        base = os.path.basename(name)
+        stem, ext = os.path.splitext(base)
+        if ext != '.json':
+            return None
+        if stem == 'personal':
+            for key in self.PERSONAL_KEYS:
+                if key in self.record:
+                    return self.record[key]
+            return None
+        if stem in self.record:
+            return {stem: self.record[stem]}
+        return None
+
+    def load_json(self, name: str) -> Any:
+        data = self._section(name)
+        if data is not None:
+            return data
+        if self.fallback is None:
+            raise FileNotFoundError(name)
+        return self.fallback.load_json(name)
+
+    def read_bytes(self, name: str) -> bytes:
+        data = self._section(name)
+        if data is not None:
+            return json.dumps(data, ensure_ascii=False).encode('utf-8')
+        if self.fallback is None:
+            raise FileNotFoundError(name)
+        return self.fallback.read_bytes(name)
+
+    def exists(self, name: str) -> bool:
+        if self._section(name) is not None:
+            return True
+        return self.fallback is not None and self.fallback.exists(name)
+
+    def locate(self, name: str) -> Optional[str]:
+        if self._section(name) is not None or self.fallback is None:
+            return None
+        return self.fallback.locate(name)
+
+    def searched(self, name: str) -> List[str]:
+        if self._section(name) is not None or self.fallback is None:
+            return []
+        return self.fallback.searched(name)
+
+class MemorySource(DataSource):
+    """Files already read into memory, e.g. prefetched from remote storage.
+
+    Args:
+        files (Dict[str, bytes]): Content by file name
+        fallback (DataSource, optional): Source for the names that are not in memory; it also locates
+            the files on the local filesystem
+    """
+    def __init__(self, files: Dict[str, bytes], fallback: Optional[DataSource] = None):
+        self.files = files
+        self.fallback = fallback
+
+    def read_bytes(self, name: str) -> bytes:
+        try:
+            return self.files[os.path.normpath(name).replace(os.sep, '/')]
+        except KeyError:
+            if self.fallback is None:
+                raise FileNotFoundError(name)
+            return self.fallback.read_bytes(name)
+
+    def exists(self, name: str) -> bool:
+        if os.path.normpath(name).replace(os.sep, '/') in self.files:
+            return True
+        return self.fallback is not None and self.fallback.exists(name)
+
+    def locate(self, name: str) -> Optional[str]:
+        return self.fallback.locate(name) if self.fallback is not None else None
+
+    def searched(self, name: str) -> List[str]:
+        if os.path.normpath(name).replace(os.sep, '/') in self.files or self.fallback is None:
+            return []
+        return self.fallback.searched(name)
+
+class CachedSource(DataSource):
+    """Another data source whose files are read, and whose JSON files are parsed, only once. Used when one
+    CV is rendered several times, e.g. for several backends. The parsed JSON is shared and must not be modified.
+
+    Args:
+        source (DataSource): The source to read from
+    """
+    def __init__(self, source: DataSource):
+        self.source = source
+        self.files = {}
+        self.json = {}
+
+    def read_bytes(self, name: str) -> bytes:
+        if name not in self.files:
+            self.files[name] = self.source.read_bytes(name)
+        return self.files[name]
+
+    def load_json(self, name: str) -> Any:
+        if name not in self.json:
+            self.json[name] = self.source.load_json(name)
+        return self.json[name]
+
+    def exists(self, name: str) -> bool:
+        return name in self.files or name in self.json or self.source.exists(name)
+
+    def locate(self, name: str) -> Optional[str]:
+        return self.source.locate(name)
+
+    def searched(self, name: str) -> List[str]:
+        return self.source.searched(name)
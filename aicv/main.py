@@ -5,43 +5,302 @@ Main entry point for the CV generation tool
 """
 
 import argparse
-import json
+import contextlib
+import importlib
+import io
 import os
-from aicv.core.processor import generate # Keep this for other backends
-from aicv.utils.pdf_converter import convert_html_to_pdf
-from aicv.utils.latex_compiler import compile_latex_to_pdf
+import sys
+from aicv.core.processor import generate, generate_iter, latex_files, load_document, load_personal_info # Keep this for other backends
+from aicv.utils.storage import StorageSource, is_url, save_output, split_url
 
-def main():
+# Subcommands dispatched before the regular argument parsing: name -> (module, entry point)
+SUBCOMMANDS = {
+    'batch': ('aicv.core.batch', 'main'),
+    'queue': ('aicv.core.jobqueue', 'queue_main'),
+    'worker': ('aicv.core.jobqueue', 'worker_main'),
+    'db': ('aicv.core.database', 'db_main'),
+    'pack': ('aicv.core.bundle', 'pack_main'),
+    'daemon': ('aicv.core.daemon', 'daemon_main'),
+    'serve': ('aicv.core.server', 'serve_main'),
+}
+
+# Formats of the document written to stdout: format -> backend
+STREAM_FORMATS = {
+    'html': 'html',
+    'markdown': 'markdown',
+    'moderncv': 'moderncv',  # the LaTeX source
+    'pdf': 'html',  # WeasyPrint
+    'moderncv-pdf': 'moderncv',  # pdflatex
+    'json': None,  # the document model
+}
+
+# Name of a Markdown template read from stdin; its JSON files are looked up in the current directory
+STDIN_TEMPLATE = 'cv.md'
+
+def _stdin_source():
+    """Reads a .cvpack bundle or a Markdown template from stdin.
+
+    Returns:
+        Tuple[DataSource, str, Optional[str]]: The data source, the name of the template in it, and the
+            directory that relative URLs of the HTML are resolved against
+    """
+    from aicv.core.bundle import BUNDLE_MAGIC, BundleSource
+    from aicv.core.sources import DirectorySource, MemorySource
+
+    data = sys.stdin.buffer.read()
+    if data.startswith(BUNDLE_MAGIC):
+        # zipfile needs to seek, which a pipe cannot; BytesIO shares the buffer instead of copying it
+        stream = io.BytesIO(data)
+        stream.name = '<stdin>'
+        source = BundleSource(stream)
+        return source, source.template, None
+    source = MemorySource({STDIN_TEMPLATE: data}, fallback=DirectorySource(os.curdir))
+    return source, STDIN_TEMPLATE, os.getcwd()
+
+def _uses_stdio(args) -> bool:
+    """Whether a parsed command line reads its input from stdin or writes a document to stdout."""
+    return args.file_path == '-' or bool(args.format) or '-' in (args.output, args.pdf_output, args.markdown, args.json)
+
+def _stream_format(args) -> str:
+    """Format of the document written to stdout: --format, or the one the other flags select."""
+    if args.format:
+        return args.format
+    if args.json:
+        return 'json'
+    if args.markdown:
+        return 'markdown'
+    if args.moderncv:
+        return 'moderncv-pdf'
+    return 'pdf' if args.pdf else 'html'
+
+def _generate_to_stream(args, personal_info, source, input_dir, document) -> int:
+    """Generates one document and writes it to the binary stream document, or to the path given for its format."""
+    fmt = _stream_format(args)
+    backend = STREAM_FORMATS[fmt]
+    emojis_enabled = backend == 'html' if args.emojis is None or backend == 'moderncv' else args.emojis
+    if fmt in ('pdf', 'moderncv-pdf'):
+        path = args.pdf_output
+    elif fmt == 'json':
+        path = args.json
+    else:
+        path = args.markdown if fmt == 'markdown' else args.output
+    if fmt == 'json':
+        chunks = [load_document(args.file_path, personal_info, source=source, block_workers=args.block_workers).to_json() + '\n']
+    else:
+        chunks = generate_iter(args.file_path, personal_info, backend=backend, emojis=emojis_enabled, source=source,
+                               block_workers=args.block_workers)
+    if fmt not in ('pdf', 'moderncv-pdf') and path in (None, '-'):
+        # Each part of the document is written out as soon as it is rendered
+        for chunk in chunks:
+            document.write(chunk.encode('utf-8'))
+            document.flush()
+        return 0
+    content = ''.join(chunks)
+
+    if fmt == 'pdf':
+        try:
+            from aicv.utils.pdf_converter import html_to_pdf_bytes
+        except ImportError:
+            print("WeasyPrint is not installed. Please install it to generate PDF output from HTML.")
+            print("You can install it with: pip install weasyprint")
+            return 1
+        data = html_to_pdf_bytes(content, paper_size=args.paper, add_page_numbers=not args.no_page_numbers, base_url=input_dir)
+    elif fmt == 'moderncv-pdf':
+        from aicv.utils.latex_compiler import compile_latex_to_pdf_bytes
+        # pdflatex needs files, so it still runs in a private temporary directory; only the PDF comes back
+        use_bibtex_run = '\\addbibresource' in content and '\\begin{filecontents}' in content
+        data = compile_latex_to_pdf_bytes(content, use_bibtex=use_bibtex_run, files=latex_files(personal_info, source))
+        if data is None:
+            return 1
+    else:
+        data = content.encode('utf-8')
+
+    if path and path != '-':
+        save_output(path, data, endpoint_url=args.s3_endpoint)
+        print(f"Output saved to {path}")
+    else:
+        document.write(data)
+        document.flush()
+    return 0
+
+def _generate_formats(args, personal_info, source, input_dir, output_base) -> int:
+    """Generates the formats of --formats from one load of the inputs, and saves each one next to the input."""
+    from aicv.core.formats import OUTPUT_FORMATS, generate_formats
+
+    result = generate_formats(args.file_path, args.formats, personal_info=personal_info, emojis=args.emojis, source=source,
+                              paper_size=args.paper, add_page_numbers=not args.no_page_numbers, base_url=input_dir,
+                              block_workers=args.block_workers)
+    for name, data in result['outputs'].items():
+        path = output_base + OUTPUT_FORMATS[name][1]
+        save_output(path, data, endpoint_url=args.s3_endpoint)
+        print(f"Output ({name}) saved to {path}")
+    for name, error in result['errors'].items():
+        print(f"PDF generation ({name}) failed: {error}")
+    return 1 if result['errors'] else 0
+
+def _generate_with_deadline(args, personal_info, backend, emojis_enabled, source, input_dir, output_base):
+    """Generates the document and, within --deadline seconds, the PDF. A late PDF is finished in the background,
+    and written before the process exits."""
+    from aicv.core.deadline import PDF_FAILED, PDF_PENDING, format_timings, generate_with_deadline
+
+    output_pdf_path = args.pdf_output or output_base + ".pdf"
+    want_pdf = (args.pdf or args.moderncv) and not args.markdown
+    result = generate_with_deadline(args.file_path, backend=backend, pdf=want_pdf, deadline=args.deadline,
+                                    personal_info=personal_info, emojis=emojis_enabled, source=source,
+                                    pdf_path=output_pdf_path, paper_size=args.paper,
+                                    add_page_numbers=not args.no_page_numbers, base_url=input_dir, block_workers=args.block_workers,
+                                    endpoint_url=args.s3_endpoint)
+    content = result['content']
+
+    if args.markdown:
+        save_output(args.markdown, content, endpoint_url=args.s3_endpoint)
+        print(f"Markdown representation saved to {args.markdown}")
+    elif args.moderncv:
+        tex_path = os.path.splitext(output_pdf_path)[0] + ".tex"
+        save_output(tex_path, content, endpoint_url=args.s3_endpoint)
+        print(f"LaTeX file with inline bibliography saved to {tex_path}")
+    elif not args.pdf or args.output or result['pdf_status'] in (PDF_PENDING, PDF_FAILED):
+        # Without a PDF in time, the HTML is what the caller gets
+        output_html_path = args.output or output_base + ".html"
+        save_output(output_html_path, content, endpoint_url=args.s3_endpoint)
+        print(f"HTML output saved to {output_html_path}")
+
+    if result['pdf_status'] == PDF_PENDING:
+        print(f"PDF pending: not ready after {args.deadline}s, still rendering to {output_pdf_path}")
+    elif result['pdf_status'] == PDF_FAILED:
+        print(f"PDF generation failed: {result['pdf_error']}")
+    if args.stage_timings:
+        print(f"Timings: {format_timings(result['timings'])}")
+        if result['pdf_status'] == PDF_PENDING:
+            result['pdf_future'].add_done_callback(lambda future: print(f"Timings: pdf {result['timings']['pdf']:.3f}s"))
+    return 1 if result['pdf_status'] == PDF_FAILED else 0
+
+def main(argv=None):
     """Main entry point for the CV generation tool"""
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] in SUBCOMMANDS:
+        module_name, function_name = SUBCOMMANDS[argv[0]]
+        module = importlib.import_module(module_name)
+        return getattr(module, function_name)(argv[1:])
+
     parser = argparse.ArgumentParser(description='Process a Markdown file with pymd blocks.')
-    parser.add_argument('file_path', type=str, help='Path to the Markdown file (used as a base for finding JSON data)')
-    parser.add_argument('--output', '-o', type=str, help='Output HTML file path (default: input_file.html)')
+    parser.add_argument('file_path', type=str, help='Path or storage URL (s3://bucket/key) of the Markdown file (used as a base for finding JSON data), '
+                                                    'a .cvpack bundle, or - to read either from stdin')
+    parser.add_argument('--output', '-o', type=str, help='Output HTML file path (default: input_file.html), or - for stdout')
     parser.add_argument('--pdf', '-p', action='store_true', help='Generate PDF output only (no HTML via WeasyPrint)')
-    parser.add_argument('--pdf-output', type=str, help='Output PDF file path (default: input_file.pdf)')
+    parser.add_argument('--pdf-output', type=str, help='Output PDF file path (default: input_file.pdf), or - for stdout')
     parser.add_argument('--moderncv', action='store_true', help='Generate PDF output using moderncv LaTeX style')
     # The --bibtex flag for compile_latex_to_pdf is handled by checking if a .bib file was generated.
     # No explicit user flag needed if we auto-detect based on bib_content.
     parser.add_argument('--paper', type=str, default='A4', help='PDF paper size (default: A4, for WeasyPrint PDF)')
     parser.add_argument('--no-page-numbers', action='store_true', help='Disable page numbers in PDF output (for WeasyPrint PDF)')
-    parser.add_argument('--markdown', type=str, help='Output intermediate Markdown file and exit')
+    parser.add_argument('--markdown', type=str, help='Output intermediate Markdown file (or - for stdout) and exit')
+    parser.add_argument('--formats', type=str, help='Generate several formats from one load of the inputs, as a comma-separated list of '
+                                                    'html, md, tex, pdf-weasy and pdf-latex. They are saved next to the input, as .html, '
+                                                    '.markdown, .tex, .pdf and .moderncv.pdf; the two PDF engines run concurrently')
+    parser.add_argument('--json', type=str, help='Output the document model of the CV as JSON (or - for stdout) and exit')
+    parser.add_argument('--format', type=str, choices=list(STREAM_FORMATS),
+                        help='Write only this document to stdout: html, markdown, moderncv (LaTeX), pdf (WeasyPrint), moderncv-pdf (pdflatex) '
+                             'or json (document model). '
+                             'This is the default with - as the input, for the format the other options select')
     parser.add_argument('--emojis', dest='emojis', action='store_true', help='Enable emojis in CV text (except personal info and LaTeX)')
     parser.add_argument('--no-emojis', dest='emojis', action='store_false', help='Disable emojis in CV text')
     parser.set_defaults(emojis=None)
-    args = parser.parse_args()
+    parser.add_argument('--jsonl', type=str, help='Read the CV data from a record of this JSON Lines file instead of the JSON files')
+    parser.add_argument('--record', type=int, default=0, help='Number of the JSONL record to render, starting from 0 (default: 0)')
+    parser.add_argument('--db', type=str, help='Read the CV data of a person from this SQLite database (see `aicv db import`)')
+    parser.add_argument('--person', type=str, help='Key of the person to render from the database')
+    parser.add_argument('--deadline', type=float, help='Latency budget in seconds: if the PDF is not ready in time, save the HTML/LaTeX now '
+                                                       'and finish the PDF in the background')
+    parser.add_argument('--stage-timings', action='store_true', help='Report the time spent in each generation stage')
+    parser.add_argument('--block-workers', type=int, default=0, help='Run the pymd blocks concurrently on this many threads, e.g. when they read '
+                                                                     'from slow storage; the blocks must be independent (default: one after another)')
+    parser.add_argument('--s3-endpoint', type=str, help='S3 API endpoint for s3:// URLs, e.g. http://localhost:9000 for MinIO (default: AWS_ENDPOINT_URL)')
+    args = parser.parse_args(argv)
+    if not _uses_stdio(args):
+        # Runs on the resident server when `aicv daemon start` was used, which skips the imports and the font setup.
+        # The server relays text, not stdin or the bytes of a document written to stdout
+        from aicv.core.daemon import forward
+        status = forward(argv)
+        if status is not None:
+            return status
+    if args.formats:
+        from aicv.core.formats import parse_formats
+        try:
+            args.formats = parse_formats(args.formats)
+        except ValueError as e:
+            parser.error(f"--formats: {e}")
+        if _uses_stdio(args):
+            parser.error('--formats writes files, and cannot be used with stdin or stdout')
+        if args.deadline is not None or args.stage_timings:
+            parser.error('--formats cannot be used with --deadline or --stage-timings')
+
+    if not _uses_stdio(args):
+        return _process(parser, args)
+    if args.deadline is not None or args.stage_timings:
+        parser.error('--deadline and --stage-timings cannot be used when the document goes to stdout')
+    # stdout carries the document bytes only; status messages go to stderr
+    document = sys.stdout.buffer
+    with contextlib.redirect_stdout(sys.stderr):
+        return _process(parser, args, document)
 
+def _process(parser, args, document=None):
+    """Generates the documents of a parsed command line. With a binary stream as document, only one
+    document is generated, and written to it."""
     input_dir = os.path.dirname(os.path.abspath(args.file_path))
-    personal_json_path = os.path.join(input_dir, 'personal.json')
-    with open(personal_json_path, 'r') as personal_file:
-        personal_info = json.load(personal_file)
-
-    if 'photo' in personal_info and personal_info['photo']:
-        photo_path = personal_info['photo']
-        if not os.path.isabs(photo_path):
-            personal_info['photo_path'] = os.path.abspath(os.path.join(input_dir, photo_path))
-        else:
-            personal_info['photo_path'] = photo_path
-    else:
-        personal_info['photo_path'] = None
+    output_base = os.path.splitext(args.file_path)[0]
+    source = None
+    if args.file_path == '-':
+        source, args.file_path, input_dir = _stdin_source()
+    elif is_url(args.file_path):
+        # The JSON files and the photo are read next to the Markdown file in the storage
+        storage, args.file_path = split_url(args.file_path, endpoint_url=args.s3_endpoint)
+        source = StorageSource(storage)
+        input_dir = None
+    elif args.file_path.endswith('.cvpack'):
+        from aicv.core.bundle import BundleSource
+        # Everything is read from the bundle; the outputs are named after it
+        source = BundleSource(args.file_path)
+        args.file_path = source.template
+    elif args.jsonl:
+        from aicv.core.jsonl import JsonlFile
+        from aicv.core.sources import DirectorySource, RecordSource
+        with JsonlFile(args.jsonl) as records:
+            try:
+                record = records[args.record]
+            except IndexError as e:
+                print(f"Error: {e}")
+                return 1
+        # The template and the photo are still looked up next to the Markdown file
+        source = RecordSource(record, fallback=DirectorySource(input_dir, os.curdir))
+        args.file_path = os.path.abspath(args.file_path)
+        output_base += f"_{args.record}"
+    elif args.db:
+        from aicv.core.database import SQLiteSource, connect, find_person
+        from aicv.core.sources import DirectorySource
+        if not args.person:
+            parser.error('--person is required with --db')
+        conn = connect(args.db)
+        person_id = find_person(conn, args.person)
+        if person_id is None:
+            print(f"Error: no person {args.person} in {args.db}")
+            return 1
+        source = SQLiteSource(conn, person_id, fallback=DirectorySource(input_dir, os.curdir))
+        args.file_path = os.path.abspath(args.file_path)
+        output_base += '_' + args.person.replace(os.sep, '_')
+    personal_info = load_personal_info(input_dir, source=source)
+    if document is not None:
+        return _generate_to_stream(args, personal_info, source, input_dir, document)
+
+    if args.formats:
+        return _generate_formats(args, personal_info, source, input_dir, output_base)
+
+    if args.json:
+        model = load_document(args.file_path, personal_info, source=source, block_workers=args.block_workers)
+        save_output(args.json, model.to_json() + '\n', endpoint_url=args.s3_endpoint)
+        print(f"Document model saved to {args.json}")
+        return
 
     if args.markdown:
         backend = 'markdown'
@@ -62,26 +321,28 @@ def main():
     if backend == 'moderncv':
         emojis_enabled = False
 
-    content = generate(args.file_path, personal_info, backend=backend, emojis=emojis_enabled)
+    if args.deadline is not None or args.stage_timings:
+        return _generate_with_deadline(args, personal_info, backend, emojis_enabled, source, input_dir, output_base)
+
+    content = generate(args.file_path, personal_info, backend=backend, emojis=emojis_enabled, source=source,
+                       block_workers=args.block_workers)
 
     if args.markdown:
-        with open(args.markdown, 'w', encoding='utf-8') as f:
-            f.write(content)
+        save_output(args.markdown, content, endpoint_url=args.s3_endpoint)
         print(f"Markdown representation saved to {args.markdown}")
         return
 
     output_pdf_path = args.pdf_output
     if not output_pdf_path:
-        base, _ = os.path.splitext(args.file_path)
-        output_pdf_path = base + ".pdf"
+        output_pdf_path = output_base + ".pdf"
 
     if args.moderncv:
+        from aicv.utils.latex_compiler import compile_latex_to_pdf, compile_latex_to_pdf_bytes
         # 'content' here is latex_content with inline bibliography
         tex_base_name = os.path.splitext(output_pdf_path)[0]
         tex_path = tex_base_name + ".tex"
 
-        with open(tex_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        save_output(tex_path, content, endpoint_url=args.s3_endpoint)
         print(f"LaTeX file with inline bibliography saved to {tex_path}")
 
         # Since we're using inline bibliography with filecontents, we need to run bibtex
@@ -89,43 +350,45 @@ def main():
         # if there are publications (the content will contain \addbibresource and filecontents)
         use_bibtex_run = '\\addbibresource' in content and '\\begin{filecontents}' in content
 
-        # Pass the directory of the tex file as current_working_dir
-        # and the bibtex flag to the compiler function.
-        compile_latex_to_pdf(tex_path, output_pdf_path, use_bibtex=use_bibtex_run, working_directory=os.path.dirname(tex_path))
+        files = latex_files(personal_info, source)
+        if is_url(output_pdf_path) or files:
+            # pdflatex runs in a private temporary directory, with the photo if it is not a local file
+            # (e.g. in a bundle); only the PDF is uploaded or saved
+            pdf = compile_latex_to_pdf_bytes(content, use_bibtex=use_bibtex_run, files=files)
+            if pdf is not None:
+                save_output(output_pdf_path, pdf, endpoint_url=args.s3_endpoint)
+                print(f"PDF successfully generated: {output_pdf_path}")
+        else:
+            # Pass the directory of the tex file as current_working_dir
+            # and the bibtex flag to the compiler function.
+            compile_latex_to_pdf(tex_path, output_pdf_path, use_bibtex=use_bibtex_run, working_directory=os.path.dirname(tex_path))
 
     elif args.pdf: # PDF via HTML (WeasyPrint)
         try:
+            # WeasyPrint takes hundreds of milliseconds to import, so it is only loaded when a PDF is requested
+            from aicv.utils.pdf_converter import html_to_pdf_bytes, save_html_as_pdf
             html_content_for_pdf = content
             if backend != 'html': # If user specified --pdf with --markdown (which exits) or an unexpected state
                 # This case should ideally not be hit if --markdown exits.
                 # If we are here, it means --pdf is true, --moderncv is false.
                 # We need HTML content.
                 print(f"Warning: Generating PDF from a non-HTML backend ('{backend}'). Re-generating content as HTML.")
-                html_content_for_pdf = generate(args.file_path, personal_info, backend='html', emojis=emojis_enabled)
-
-            # Determine path for the HTML file to be converted
-            # If args.output (HTML output path) is specified, use it. Otherwise, create a temporary HTML file.
-            html_to_convert_path = args.output
-            created_temp_html = False
-            if not html_to_convert_path:
-                # Create a temporary HTML file path
-                temp_html_dir = os.path.dirname(output_pdf_path) # Save temp HTML near PDF
-                temp_html_name = os.path.splitext(os.path.basename(output_pdf_path))[0] + "_temp_for_pdf.html"
-                html_to_convert_path = os.path.join(temp_html_dir, temp_html_name)
-                created_temp_html = True
-
-            # Write the HTML content to the path (either user-specified or temporary)
-            # The 'generate' function for HTML backend already produces a full HTML document string.
-            with open(html_to_convert_path, 'w', encoding='utf-8') as f:
-                 f.write(html_content_for_pdf)
-            if created_temp_html:
-                print(f"Temporary HTML for PDF generation saved to {html_to_convert_path}")
-
-            convert_html_to_pdf(html_to_convert_path, output_pdf_path, paper_size=args.paper, add_page_numbers=not args.no_page_numbers)
-
-            if created_temp_html and os.path.exists(html_to_convert_path): # Clean up temp html
-                os.remove(html_to_convert_path)
-                print(f"Removed temporary HTML file: {html_to_convert_path}")
+                html_content_for_pdf = generate(args.file_path, personal_info, backend='html', emojis=emojis_enabled, source=source,
+                                                block_workers=args.block_workers)
+
+            # If args.output (HTML output path) is specified, also save the HTML there.
+            # The PDF is rendered straight from the HTML string, without a temporary file.
+            if args.output:
+                save_output(args.output, html_content_for_pdf, endpoint_url=args.s3_endpoint)
+                print(f"HTML output saved to {args.output}")
+
+            if is_url(output_pdf_path):
+                pdf = html_to_pdf_bytes(html_content_for_pdf, paper_size=args.paper, add_page_numbers=not args.no_page_numbers)
+                save_output(output_pdf_path, pdf, endpoint_url=args.s3_endpoint)
+                print(f"PDF saved to {output_pdf_path}")
+            else:
+                save_html_as_pdf(html_content_for_pdf, output_pdf_path, paper_size=args.paper, add_page_numbers=not args.no_page_numbers,
+                                 base_url=input_dir)
 
         except ImportError:
             print("WeasyPrint is not installed. Please install it to generate PDF output from HTML.")
@@ -134,11 +397,10 @@ def main():
             print(f"An error occurred during PDF generation via HTML: {e}")
 
     elif not args.pdf and not args.moderncv: # Only generate HTML
-        output_html_path = args.output or os.path.splitext(args.file_path)[0] + ".html"
+        output_html_path = args.output or output_base + ".html"
         # 'content' is already the full HTML string from generate()
-        with open(output_html_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        save_output(output_html_path, content, endpoint_url=args.s3_endpoint)
         print(f"HTML output saved to {output_html_path}")
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,46 +1,64 @@
 """
 Renderers package for the AI-aware CV generator
 """
-import json
 import os
+from aicv.core.model import build_section
+from aicv.core.output import emit
+from aicv.core.sources import DirectorySource
 from .education import render_education
 from .employment import render_employment
 from .publications import render_publications
 
-def render(json_filename, backend, emojis=True):
-    """Reads a JSON file and renders the content based on its type and backend."""
-    # Check if the file exists in the current directory
-    if not os.path.exists(json_filename):
-        # If not, check in the same directory as cv.md
-        cv_md_path = os.path.join(os.path.dirname(__file__), '../../example/cv.md')
-        json_filename = os.path.join(os.path.dirname(cv_md_path), os.path.basename(json_filename))
+SECTION_RENDERERS = {
+    'education': render_education,
+    'employment': render_employment,
+    'publications': render_publications,
+}
 
-    if not os.path.exists(json_filename):
-        print(f"File {json_filename} not found.")
+def render(json_filename, backend, emojis=True, data_dir=None, dependencies=None, source=None, sections=None):
+    """Reads a JSON file and renders the content based on its type and backend.
+
+    The file is read from the given data source (see aicv.core.sources). Without one,
+    relative file names are looked up in data_dir (the directory of cv.md) first,
+    then in the current directory. If a dependencies list is given, the paths the
+    file was looked up at are appended to it, up to the one it was read from, or
+    all of them if it is missing. If a sections list is given, the
+    section built from the file (see aicv.core.model) is appended to it.
+    """
+    if source is None:
+        source = DirectorySource(data_dir, os.curdir) if data_dir else DirectorySource(os.curdir)
+
+    if dependencies is not None:
+        # Also where the file was looked up in vain, so that a file appearing there is noticed
+        dependencies.extend(source.searched(json_filename))
+
+    try:
+        data = source.load_json(json_filename)
+    except FileNotFoundError:
+        emit(f"File {json_filename} not found.")
         return
 
-    with open(json_filename, 'r') as f:
-        data = json.load(f)
-
-    if "education" in data:
-        result = render_education(data["education"], backend, emojis=emojis)
-        print(result)
-        return result
-    elif "employment" in data:
-        result = render_employment(data["employment"], backend, emojis=emojis)
-        print(result)
-        return result
-    elif "publications" in data:
-        result = render_publications(data["publications"], backend, emojis=emojis)
-
-        # Handle moderncv publications which return tuple (latex_content, bib_content)
-        if backend == 'moderncv' and isinstance(result, tuple) and len(result) == 2:
-            latex_content, bib_content = result
-            print(latex_content)
-            return result  # Return the tuple for processing in extensions
-        else:
-            print(result)
-            return result
-    else:
-        print("Invalid data format.")
+    section = build_section(data)
+    if section is not None and sections is not None:
+        sections.append(section)
+    return render_section(section, backend, emojis=emojis)
+
+def render_data(data, backend, emojis=True):
+    """Renders already loaded JSON data based on its type and backend. The result is also emitted
+    into the output of the running pymd block (see aicv.core.output)."""
+    return render_section(build_section(data), backend, emojis=emojis)
+
+def render_section(section, backend, emojis=True):
+    """Renders a section of the document model with the given backend, and emits the result like render_data()."""
+    if section is None:
+        emit("Invalid data format.")
         return None
+    result = SECTION_RENDERERS[section.kind](section.entries, backend, emojis=emojis)
+
+    # Handle moderncv publications which return tuple (latex_content, bib_content)
+    if backend == 'moderncv' and isinstance(result, tuple) and len(result) == 2:
+        latex_content, bib_content = result
+        emit(latex_content)
+        return result  # Return the tuple for processing in extensions
+    emit(result)
+    return result
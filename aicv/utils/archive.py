@@ -0,0 +1,85 @@
+"""
+Archive output for the AI-aware CV generator
+"""
+import io
+import tarfile
+import time
+import zipfile
+
+# Suffix -> tarfile stream mode. .tar.zst is handled separately because tarfile has no zstd support.
+TAR_MODES = {
+    '.tar': 'w|',
+    '.tar.gz': 'w|gz',
+    '.tgz': 'w|gz',
+    '.tar.bz2': 'w|bz2',
+    '.tar.xz': 'w|xz',
+}
+
+class ArchiveWriter:
+    """Writes documents as members of a single tar or zip archive.
+
+    The archive is written sequentially, one member after the other, so it can live on a
+    network filesystem without creating a file per document. The format is chosen from the
+    file name: .zip, .tar, .tar.gz/.tgz, .tar.bz2, .tar.xz or .tar.zst (requires the
+    zstandard package).
+
+    Args:
+        path (str): Path of the archive to create
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._file = None
+        self._zstd_writer = None
+        self._zip = None
+        self._tar = None
+
+        lower = path.lower()
+        if lower.endswith('.zip'):
+            self._zip = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED)
+        elif lower.endswith(('.tar.zst', '.tar.zstd', '.tzst')):
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError("Writing .tar.zst archives requires the zstandard package: pip install zstandard")
+            self._file = open(path, 'wb')
+            self._zstd_writer = zstandard.ZstdCompressor().stream_writer(self._file)
+            self._tar = tarfile.open(fileobj=self._zstd_writer, mode='w|')
+        else:
+            for suffix, mode in TAR_MODES.items():
+                if lower.endswith(suffix):
+                    self._tar = tarfile.open(path, mode=mode)
+                    break
+            else:
+                raise ValueError(f"Unsupported archive format: {path} (use .zip, .tar, .tar.gz, .tar.bz2, .tar.xz or .tar.zst)")
+
+    def add(self, name: str, data):
+        """Adds a member. Text is stored as UTF-8."""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if self._zip is not None:
+            self._zip.writestr(name, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            info.mode = 0o644
+            self._tar.addfile(info, io.BytesIO(data))
+        self.count += 1
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+        if self._tar is not None:
+            self._tar.close()
+        if self._zstd_writer is not None:
+            self._zstd_writer.close()
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
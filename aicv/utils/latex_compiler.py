@@ -4,8 +4,10 @@ LaTeX compilation utilities for the AI-aware CV generator
 import os
 import subprocess
 import shutil
+import tempfile
 
-def compile_latex_to_pdf(tex_path: str, output_pdf_path: str, use_bibtex: bool = False, working_directory: str | None = None):
+def compile_latex_to_pdf(tex_path: str, output_pdf_path: str, use_bibtex: bool = False, working_directory: str | None = None,
+                         timeout: float | None = None):
     """
     Compiles a .tex file to .pdf using pdflatex and bibtex (if use_bibtex is True).
 
@@ -14,6 +16,10 @@ def compile_latex_to_pdf(tex_path: str, output_pdf_path: str, use_bibtex: bool =
         output_pdf_path (str): Path for the PDF output.
         use_bibtex (bool): Whether to run bibtex. Defaults to False.
         working_directory (str | None): The directory to run latex commands from. Defaults to tex_path's directory.
+        timeout (float | None): Seconds after which a stuck pdflatex or bibtex run is killed. Defaults to no limit.
+
+    Returns:
+        str | None: Path to the generated PDF file, or None if compilation failed
     """
     tex_filename = os.path.basename(tex_path)
     base_name = os.path.splitext(tex_filename)[0]
@@ -46,22 +52,22 @@ def compile_latex_to_pdf(tex_path: str, output_pdf_path: str, use_bibtex: bool =
     try:
         # First pdflatex pass
         print(f"Running pdflatex (1st pass) on {tex_filename} (output to {compile_dir})...")
-        subprocess.run(pdflatex_cmd, check=True, capture_output=True, text=True, cwd=compile_dir)
+        subprocess.run(pdflatex_cmd, check=True, capture_output=True, text=True, cwd=compile_dir, timeout=timeout)
 
         if use_bibtex:
             # BibTeX pass
             # Bibtex needs to be run in the directory where the .aux file is.
             print(f"Running bibtex on {base_name}.aux in {compile_dir}...")
-            subprocess.run(bibtex_cmd, check=True, capture_output=True, text=True, cwd=compile_dir)
+            subprocess.run(bibtex_cmd, check=True, capture_output=True, text=True, cwd=compile_dir, timeout=timeout)
 
             # Second pdflatex pass (for bibliography)
             print(f"Running pdflatex (2nd pass) on {tex_filename}...")
-            subprocess.run(pdflatex_cmd, check=True, capture_output=True, text=True, cwd=compile_dir)
+            subprocess.run(pdflatex_cmd, check=True, capture_output=True, text=True, cwd=compile_dir, timeout=timeout)
 
         # Third pdflatex pass (for cross-references and final layout)
         # Some complex documents might need a third pass even without bibtex for other references.
         print(f"Running pdflatex (final pass) on {tex_filename}...")
-        subprocess.run(pdflatex_cmd, check=True, capture_output=True, text=True, cwd=compile_dir)
+        subprocess.run(pdflatex_cmd, check=True, capture_output=True, text=True, cwd=compile_dir, timeout=timeout)
 
         # The generated PDF will be in compile_dir with name base_name.pdf
         generated_pdf_in_compile_dir = os.path.join(compile_dir, base_name + ".pdf")
@@ -73,10 +79,14 @@ def compile_latex_to_pdf(tex_path: str, output_pdf_path: str, use_bibtex: bool =
                 os.makedirs(final_output_dir)
             shutil.move(generated_pdf_in_compile_dir, output_pdf_path)
             print(f"PDF successfully generated: {output_pdf_path}")
+            return output_pdf_path
         else:
             print(f"Error: PDF file {generated_pdf_in_compile_dir} not found after compilation.")
             return
 
+    except subprocess.TimeoutExpired as e:
+        print(f"Error: LaTeX compilation of {tex_filename} timed out after {e.timeout} seconds")
+        return
     except subprocess.CalledProcessError as e:
         print(f"Error during LaTeX compilation: {e}")
         print("Stdout:", e.stdout)
@@ -109,6 +119,108 @@ def compile_latex_to_pdf(tex_path: str, output_pdf_path: str, use_bibtex: bool =
         # The .tex and .bib files are managed by main.py, so not removed here.
         pass
 
+def compile_latex_to_pdf_bytes(latex_content: str, use_bibtex: bool = False, base_name: str = 'cv',
+                               timeout: float | None = None, files: dict | None = None) -> bytes | None:
+    """
+    Compiles LaTeX source held in memory to PDF.
+
+    pdflatex can only work on files, so the source and the auxiliary files live in a private
+    temporary directory that is removed afterwards.
+
+    Args:
+        latex_content (str): The LaTeX document.
+        use_bibtex (bool): Whether to run bibtex. Defaults to False.
+        base_name (str): Base name of the temporary .tex file. Defaults to 'cv'.
+        timeout (float | None): Seconds after which a stuck pdflatex or bibtex run is killed. Defaults to no limit.
+        files (dict | None): Other files the document refers to, such as the photo, as bytes by their
+            relative names. They are written next to the .tex file.
+
+    Returns:
+        bytes | None: The PDF document, or None if compilation failed
+    """
+    with tempfile.TemporaryDirectory(prefix='aicv-latex-') as temp_dir:
+        tex_path = os.path.join(temp_dir, base_name + '.tex')
+        pdf_path = os.path.join(temp_dir, base_name + '.pdf')
+        with open(tex_path, 'w', encoding='utf-8') as f:
+            f.write(latex_content)
+        _write_files(temp_dir, files)
+        if not compile_latex_to_pdf(tex_path, pdf_path, use_bibtex=use_bibtex, working_directory=temp_dir, timeout=timeout):
+            return None
+        with open(pdf_path, 'rb') as f:
+            return f.read()
+
+def _write_files(directory: str, files: dict | None):
+    """Writes files, as bytes by their relative names, into directory."""
+    for name, data in (files or {}).items():
+        path = os.path.normpath(os.path.join(directory, name))
+        if os.path.dirname(path) != directory:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+async def _run_async(cmd, cwd: str, timeout: float | None):
+    import asyncio
+
+    # In a session of its own, so that its whole process group can be killed (pdflatex may start mktexpk etc.)
+    process = await asyncio.create_subprocess_exec(*cmd, cwd=cwd, stdin=asyncio.subprocess.DEVNULL,
+                                                   stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+                                                   start_new_session=True)
+    try:
+        output, _ = await asyncio.wait_for(process.communicate(), timeout)
+    except BaseException:
+        # Cancelled or timed out: the children must not outlive the request
+        if process.returncode is None:
+            import signal
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            await process.wait()
+        raise
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, output=output.decode('utf-8', 'replace'))
+
+async def acompile_latex_to_pdf_bytes(latex_content: str, use_bibtex: bool = False, base_name: str = 'cv',
+                                      timeout: float | None = None, files: dict | None = None) -> bytes:
+    """
+    Compiles LaTeX source held in memory to PDF without blocking the event loop.
+
+    The passes are those of compile_latex_to_pdf(), run with asyncio.create_subprocess_exec. If the
+    calling task is cancelled or a pass times out, the running pdflatex or bibtex is killed.
+
+    Args:
+        latex_content (str): The LaTeX document.
+        use_bibtex (bool): Whether to run bibtex. Defaults to False.
+        base_name (str): Base name of the temporary .tex file. Defaults to 'cv'.
+        timeout (float | None): Seconds after which a stuck pdflatex or bibtex run is killed. Defaults to no limit.
+        files (dict | None): Other files the document refers to, such as the photo, as bytes by their
+            relative names. They are written next to the .tex file.
+
+    Returns:
+        bytes: The PDF document
+
+    Raises:
+        RuntimeError: If a pass fails, with the end of its output
+        asyncio.TimeoutError: If a pass takes longer than timeout
+    """
+    with tempfile.TemporaryDirectory(prefix='aicv-latex-') as temp_dir:
+        tex_path = os.path.join(temp_dir, base_name + '.tex')
+        with open(tex_path, 'w', encoding='utf-8') as f:
+            f.write(latex_content)
+        _write_files(temp_dir, files)
+        pdflatex_cmd = ['pdflatex', '-interaction=nonstopmode', '-output-directory', temp_dir, tex_path]
+        passes = [pdflatex_cmd]
+        if use_bibtex:
+            passes += [['bibtex', os.path.join(temp_dir, base_name)], pdflatex_cmd]
+        passes.append(pdflatex_cmd)
+        for cmd in passes:
+            try:
+                await _run_async(cmd, temp_dir, timeout)
+            except subprocess.CalledProcessError as e:
+                raise RuntimeError(f"{cmd[0]} failed with exit status {e.returncode}:\n{e.output[-2000:]}")
+        with open(os.path.join(temp_dir, base_name + '.pdf'), 'rb') as f:
+            return f.read()
+
 if __name__ == '__main__':
     # Example usage (requires a sample.tex and sample.bib in a 'temp_compile' directory)
     
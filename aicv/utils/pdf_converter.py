@@ -2,9 +2,41 @@
 PDF conversion utilities for the AI-aware CV generator
 """
 import os
-import tempfile
 import weasyprint
-from pathlib import Path
+
+PAGE_NUMBER_CSS = """
+        @page {
+            @bottom-right {
+                content: "Page " counter(page) " of " counter(pages);
+                font-family: var(--font-primary);
+                font-size: 10pt;
+                color: #666;
+                padding-right: 10mm;
+            }
+            size: A4 portrait;
+            margin: 20mm 15mm 20mm 15mm;
+        }
+        """
+
+def html_to_pdf_bytes(html_content, paper_size="A4", add_page_numbers=True, base_url=None):
+    """
+    Convert an HTML document to PDF in memory using WeasyPrint.
+
+    Args:
+        html_content (str): The HTML document
+        paper_size (str, optional): Paper size for the PDF. Defaults to "A4"
+        add_page_numbers (bool, optional): Whether to add page numbers. Defaults to True
+        base_url (str, optional): Base for resolving relative URLs in the document
+
+    Returns:
+        bytes: The PDF document
+    """
+    # Add page numbers CSS if requested
+    if add_page_numbers:
+        # Insert page number CSS before the closing </style> tag
+        html_content = html_content.replace('</style>', f'{PAGE_NUMBER_CSS}\n</style>')
+
+    return weasyprint.HTML(string=html_content, base_url=base_url).write_pdf()
 
 def convert_html_to_pdf(html_path, pdf_path=None, paper_size="A4", add_page_numbers=True):
     """
@@ -31,42 +63,28 @@ def convert_html_to_pdf(html_path, pdf_path=None, paper_size="A4", add_page_numb
     with open(html_path, 'r', encoding='utf-8') as f:
         html_content = f.read()
 
-    # Add page numbers CSS if requested
-    if add_page_numbers:
-        # Insert page number CSS before the closing </style> tag
-        page_number_css = """
-        @page {
-            @bottom-right {
-                content: "Page " counter(page) " of " counter(pages);
-                font-family: var(--font-primary);
-                font-size: 10pt;
-                color: #666;
-                padding-right: 10mm;
-            }
-            size: A4 portrait;
-            margin: 20mm 15mm 20mm 15mm;
-        }
-        """
-        html_content = html_content.replace('</style>', f'{page_number_css}\n</style>')
+    return save_html_as_pdf(html_content, pdf_path, paper_size=paper_size, add_page_numbers=add_page_numbers,
+                            base_url=os.path.dirname(os.path.abspath(html_path)))
 
-    # Create a temporary file with the modified HTML content
-    with tempfile.NamedTemporaryFile(suffix='.html', delete=False, mode='w', encoding='utf-8') as temp_file:
-        temp_file.write(html_content)
-        temp_html_path = temp_file.name
+def save_html_as_pdf(html_content, pdf_path, paper_size="A4", add_page_numbers=True, base_url=None):
+    """
+    Convert an HTML document held in memory to a PDF file using WeasyPrint.
 
-    try:
-        # Convert HTML to PDF
-        html = weasyprint.HTML(filename=temp_html_path)
-        pdf = html.write_pdf()
+    Args:
+        html_content (str): The HTML document
+        pdf_path (str): Path for the PDF output
+        paper_size (str, optional): Paper size for the PDF. Defaults to "A4"
+        add_page_numbers (bool, optional): Whether to add page numbers. Defaults to True
+        base_url (str, optional): Base for resolving relative URLs in the document
 
-        # Write the PDF to file
-        with open(pdf_path, 'wb') as f:
-            f.write(pdf)
+    Returns:
+        str: Path to the generated PDF file
+    """
+    pdf = html_to_pdf_bytes(html_content, paper_size=paper_size, add_page_numbers=add_page_numbers, base_url=base_url)
 
-        print(f"PDF saved to {pdf_path}")
-        return pdf_path
+    # Write the PDF to file
+    with open(pdf_path, 'wb') as f:
+        f.write(pdf)
 
-    finally:
-        # Clean up the temporary file
-        if os.path.exists(temp_html_path):
-            os.unlink(temp_html_path)
+    print(f"PDF saved to {pdf_path}")
+    return pdf_path
@@ -0,0 +1,292 @@
+"""
+Storage backends for the inputs and outputs of the AI-aware CV generator
+
+A storage maps keys ('team/alice/cv.md') to file contents. Local directories, S3-compatible
+object stores (AWS, MinIO, Ceph, ...) and memory are supported, and open_storage() picks one
+from a URL. Besides the blocking read() and write(), every storage has read_async() and
+write_async(), which run on a small thread pool, so that the latency of a remote store is
+overlapped with rendering instead of adding up file after file.
+"""
+import os
+import posixpath
+import threading
+from typing import TYPE_CHECKING, Dict, Iterable, Optional
+from aicv.core.sources import DataSource
+
+if TYPE_CHECKING:
+    # concurrent.futures pulls in logging; the single-CV command line never needs it
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+# Number of concurrent requests per storage
+DEFAULT_IO_THREADS = 16
+
+def is_url(path: str) -> bool:
+    """Checks whether a path names a storage URL (s3://, memory://) rather than a local file."""
+    return '://' in path and not path.startswith('file://')
+
+class Storage:
+    """Base class of storages. Subclasses implement read(), write() and list()."""
+    scheme = ''
+
+    def __init__(self, io_threads: int = DEFAULT_IO_THREADS):
+        self.io_threads = io_threads
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def read(self, key: str) -> bytes:
+        """Returns the content stored under key. Raises FileNotFoundError if there is none."""
+        raise NotImplementedError
+
+    def write(self, key: str, data):
+        """Stores data (bytes, or str stored as UTF-8) under key, replacing any previous content."""
+        raise NotImplementedError
+
+    def list(self, prefix: str = '') -> Dict[str, int]:
+        """Returns {key: size} for every key starting with prefix."""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.read(key)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def url(self, key: str) -> str:
+        """URL of a key, for status messages."""
+        return f"{self.scheme}://{key}"
+
+    def _pool(self) -> 'ThreadPoolExecutor':
+        from concurrent.futures import ThreadPoolExecutor
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.io_threads, thread_name_prefix='aicv-storage')
+            return self._executor
+
+    def read_async(self, key: str) -> 'Future':
+        """Starts reading a key in the background. The future's result is the content."""
+        return self._pool().submit(self.read, key)
+
+    def write_async(self, key: str, data) -> 'Future':
+        """Starts writing a key in the background."""
+        return self._pool().submit(self.write, key, data)
+
+    def read_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """Reads several keys concurrently."""
+        futures = {key: self.read_async(key) for key in keys}
+        return {key: future.result() for key, future in futures.items()}
+
+    def close(self):
+        """Waits for pending writes and releases the thread pool."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+def _encode(data) -> bytes:
+    return data.encode('utf-8') if isinstance(data, str) else data
+
+class LocalStorage(Storage):
+    """Files under a local directory.
+
+    Args:
+        root (str): Directory the keys are relative to
+    """
+    scheme = 'file'
+
+    def __init__(self, root: str = os.curdir, io_threads: int = DEFAULT_IO_THREADS):
+        super().__init__(io_threads)
+        self.root = os.path.abspath(root)
+
+    def path(self, key: str) -> str:
+        """Local path of a key."""
+        return os.path.join(self.root, *key.split('/'))
+
+    def read(self, key: str) -> bytes:
+        with open(self.path(key), 'rb') as f:
+            return f.read()
+
+    def write(self, key: str, data):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(_encode(data))
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self.path(key))
+
+    def list(self, prefix: str = '') -> Dict[str, int]:
+        keys = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                key = os.path.relpath(path, self.root).replace(os.sep, '/')
+                if key.startswith(prefix):
+                    keys[key] = os.path.getsize(path)
+        return keys
+
+    def url(self, key: str) -> str:
+        return self.path(key)
+
+class MemoryStorage(Storage):
+    """Files held in a dict, e.g. for tests or to hand documents to the calling program.
+
+    Args:
+        files (Dict[str, bytes], optional): Initial content
+    """
+    scheme = 'memory'
+
+    def __init__(self, files: Optional[Dict[str, bytes]] = None, io_threads: int = DEFAULT_IO_THREADS):
+        super().__init__(io_threads)
+        self.files = dict(files or {})
+
+    def read(self, key: str) -> bytes:
+        try:
+            return self.files[key]
+        except KeyError:
+            raise FileNotFoundError(self.url(key))
+
+    def write(self, key: str, data):
+        with self._lock:
+            self.files[key] = _encode(data)
+
+    def exists(self, key: str) -> bool:
+        return key in self.files
+
+    def list(self, prefix: str = '') -> Dict[str, int]:
+        with self._lock:
+            return {key: len(data) for key, data in sorted(self.files.items()) if key.startswith(prefix)}
+
+class S3Storage(Storage):
+    """Objects in a bucket of an S3-compatible store.
+
+    Credentials and the region come from the usual AWS environment variables and files. Set
+    endpoint_url (or the AWS_ENDPOINT_URL environment variable) to use MinIO or another
+    S3-compatible server.
+
+    Args:
+        bucket (str): Bucket name
+        prefix (str): Prefix of every key in the bucket
+        endpoint_url (str, optional): URL of the S3 API endpoint
+        client (optional): boto3 S3 client to use instead of creating one
+    """
+    scheme = 's3'
+
+    def __init__(self, bucket: str, prefix: str = '', endpoint_url: Optional[str] = None, client=None,
+                 io_threads: int = DEFAULT_IO_THREADS):
+        super().__init__(io_threads)
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        if client is None:
+            try:
+                import boto3
+                from botocore.config import Config
+            except ImportError:
+                raise ImportError("S3 storage requires the boto3 package: pip install boto3")
+            # One connection per I/O thread, so that concurrent requests do not wait for each other
+            client = boto3.client('s3', endpoint_url=endpoint_url or os.environ.get('AWS_ENDPOINT_URL'),
+                                  config=Config(max_pool_connections=io_threads))
+        self.client = client
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def read(self, key: str) -> bytes:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))
+        except self.client.exceptions.NoSuchKey:
+            raise FileNotFoundError(self.url(key))
+        return response['Body'].read()
+
+    def write(self, key: str, data):
+        self.client.put_object(Bucket=self.bucket, Key=self._object_key(key), Body=_encode(data))
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+            return True
+        except self.client.exceptions.ClientError:
+            return False
+
+    def list(self, prefix: str = '') -> Dict[str, int]:
+        keys = {}
+        strip = len(self.prefix) + 1 if self.prefix else 0
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._object_key(prefix)):
+            for obj in page.get('Contents', []):
+                keys[obj['Key'][strip:]] = obj['Size']
+        return keys
+
+    def url(self, key: str) -> str:
+        return f"s3://{self.bucket}/{self._object_key(key)}"
+
+# Named in-memory storages, so that memory://NAME refers to the same files everywhere in a process
+_memory_storages = {}
+
+def open_storage(url: str, endpoint_url: Optional[str] = None) -> Storage:
+    """Opens the storage for a URL: s3://bucket/prefix, memory://name, or a local directory.
+
+    Args:
+        url (str): Storage URL or local path
+        endpoint_url (str, optional): S3 API endpoint, for S3-compatible servers such as MinIO
+    Returns:
+        Storage: The storage; keys are relative to the URL
+    """
+    if url.startswith('s3://'):
+        bucket, _, prefix = url[len('s3://'):].partition('/')
+        return S3Storage(bucket, prefix, endpoint_url=endpoint_url)
+    if url.startswith('memory://'):
+        name = url[len('memory://'):]
+        if name not in _memory_storages:
+            _memory_storages[name] = MemoryStorage()
+        return _memory_storages[name]
+    if url.startswith('file://'):
+        url = url[len('file://'):]
+    return LocalStorage(url)
+
+def split_url(url: str, endpoint_url: Optional[str] = None):
+    """Splits the URL of a file into its directory's storage and its name."""
+    directory, name = posixpath.split(url.rstrip('/'))
+    return open_storage(directory, endpoint_url=endpoint_url), name
+
+class StorageSource(DataSource):
+    """The files of one CV under a prefix of a storage.
+
+    Args:
+        storage (Storage): Storage holding the files
+        prefix (str): Key prefix of the CV folder, e.g. 'team/alice'
+    """
+    def __init__(self, storage: Storage, prefix: str = ''):
+        self.storage = storage
+        self.prefix = prefix.strip('/')
+
+    def _key(self, name: str) -> str:
+        name = posixpath.normpath(name.replace(os.sep, '/'))
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def read_bytes(self, name: str) -> bytes:
+        return self.storage.read(self._key(name))
+
+    def exists(self, name: str) -> bool:
+        return self.storage.exists(self._key(name))
+
+    def locate(self, name: str) -> Optional[str]:
+        if isinstance(self.storage, LocalStorage) and self.exists(name):
+            return self.storage.path(self._key(name))
+        return None
+
+def save_output(path: str, data, endpoint_url: Optional[str] = None):
+    """Writes a document (str as UTF-8, or bytes) to a local path or a storage URL."""
+    if is_url(path):
+        storage, key = split_url(path, endpoint_url=endpoint_url)
+        storage.write(key, data)
+        return
+    with open(path, 'wb') as f:
+        f.write(_encode(data))
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test script for the asyncio API of AICV (aicv.core.aio).
+agenerate() must return what generate() does for every backend, no more documents than the
+semaphore allows may be generated at once, agenerate_pdf() must give pdflatex the photo of a
+bundle, and a cancelled or timed-out pdflatex must be killed with the processes it started.
+pdflatex is stood in for by a shell script on PATH, so no TeX installation is needed.
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import aicv.core.processor
+from aicv.core.aio import agenerate, agenerate_pdf
+from aicv.core.bundle import BundleSource, create_bundle
+from aicv.core.processor import generate, load_personal_info
+from aicv.utils.latex_compiler import acompile_latex_to_pdf_bytes
+
+EXAMPLE_DIR = Path(__file__).parent.parent / 'example'
+
+# Called as pdflatex -interaction=nonstopmode -output-directory DIR TEX: lists the files next to the .tex
+# file, then, with FAKE_PDFLATEX_SLEEP set, records its pid and that of a child and waits for the child
+FAKE_PDFLATEX = """#!/bin/sh
+ls "$3" > "$FAKE_PDFLATEX_LOG/files"
+if [ -n "$FAKE_PDFLATEX_SLEEP" ]; then
+    sleep 60 &
+    echo $! > "$FAKE_PDFLATEX_LOG/child.pid"
+    echo $$ > "$FAKE_PDFLATEX_LOG/pdflatex.pid"
+    wait
+fi
+printf '%%PDF-1.5' > "$3/$(basename "$4" .tex).pdf"
+"""
+
+class FakePdflatex:
+    """Puts the fake pdflatex, and a bibtex that does nothing, first on PATH while in use."""
+    def __init__(self, sleep=False):
+        self.sleep = sleep
+
+    def __enter__(self):
+        self.dir = tempfile.mkdtemp()
+        script = os.path.join(self.dir, 'pdflatex')
+        with open(script, 'w') as f:
+            f.write(FAKE_PDFLATEX)
+        with open(os.path.join(self.dir, 'bibtex'), 'w') as f:
+            f.write('#!/bin/sh\n')
+        for name in ('pdflatex', 'bibtex'):
+            os.chmod(os.path.join(self.dir, name), 0o755)
+        self.saved = {name: os.environ.get(name) for name in ('PATH', 'FAKE_PDFLATEX_LOG', 'FAKE_PDFLATEX_SLEEP')}
+        os.environ['PATH'] = self.dir + os.pathsep + os.environ.get('PATH', '')
+        os.environ['FAKE_PDFLATEX_LOG'] = self.dir
+        os.environ['FAKE_PDFLATEX_SLEEP'] = '1' if self.sleep else ''
+        return self
+
+    def __exit__(self, *exc):
+        for name, value in self.saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        shutil.rmtree(self.dir)
+
+    def read(self, name):
+        path = os.path.join(self.dir, name)
+        return Path(path).read_text() if os.path.exists(path) else None
+
+def alive(pid):
+    """Whether a process is running; a zombie that nobody reaped is not."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+def wait_until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+def test_agenerate_matches_generate():
+    personal_info = load_personal_info(str(EXAMPLE_DIR))
+    for backend in ('markdown', 'html', 'moderncv'):
+        expected = generate(str(EXAMPLE_DIR / 'cv.md'), personal_info, backend=backend, emojis=False)
+        # With the inputs read by agenerate() and with the caller's personal information
+        assert asyncio.run(agenerate(str(EXAMPLE_DIR / 'cv.md'), backend=backend, emojis=False)) == expected, backend
+        assert asyncio.run(agenerate(str(EXAMPLE_DIR / 'cv.md'), personal_info, backend=backend, emojis=False)) == expected
+
+def test_semaphore_bound():
+    running, peak = [0], [0]
+    lock = threading.Lock()
+    generate = aicv.core.processor.generate
+    def slow_generate(*args, **kwargs):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.1)
+        with lock:
+            running[0] -= 1
+        return generate(*args, **kwargs)
+
+    async def run():
+        semaphore = asyncio.Semaphore(2)
+        return await asyncio.gather(*[agenerate(str(EXAMPLE_DIR / 'cv.md'), semaphore=semaphore) for _ in range(6)])
+
+    aicv.core.processor.generate = slow_generate
+    try:
+        documents = asyncio.run(run())
+    finally:
+        aicv.core.processor.generate = generate
+    assert len(set(documents)) == 1
+    assert peak[0] == 2, peak[0]
+
+def test_pdf_from_bundle():
+    with tempfile.TemporaryDirectory() as tmp:
+        bundle_path = os.path.join(tmp, 'alice.cvpack')
+        create_bundle(str(EXAMPLE_DIR), bundle_path)
+        with FakePdflatex() as pdflatex, BundleSource(bundle_path) as source:
+            pdf = asyncio.run(agenerate_pdf(source.template, backend='moderncv', source=source))
+            assert pdf == b'%PDF-1.5'
+            # The photo of the bundle is written next to the .tex file
+            assert {'cv.tex', 'photo.jpg'} <= set(pdflatex.read('files').split())
+
+def test_cancel_kills_pdflatex():
+    with FakePdflatex(sleep=True) as pdflatex:
+        async def cancel():
+            task = asyncio.ensure_future(acompile_latex_to_pdf_bytes('\\documentclass{article}'))
+            while pdflatex.read('pdflatex.pid') is None:
+                await asyncio.sleep(0.02)
+            task.cancel()
+            try:
+                await task
+                assert False, "the compilation must be cancelled"
+            except asyncio.CancelledError:
+                pass
+
+        asyncio.run(cancel())
+        pids = [int(pdflatex.read('pdflatex.pid')), int(pdflatex.read('child.pid'))]
+        assert wait_until(lambda: not any(alive(pid) for pid in pids)), "pdflatex or its child survived the cancellation"
+
+def test_timeout_kills_pdflatex():
+    with FakePdflatex(sleep=True) as pdflatex:
+        start = time.monotonic()
+        try:
+            asyncio.run(agenerate_pdf(str(EXAMPLE_DIR / 'cv.md'), backend='moderncv', timeout=0.5))
+            assert False, "the compilation must time out"
+        except asyncio.TimeoutError:
+            pass
+        assert time.monotonic() - start < 30
+        pids = [int(pdflatex.read('pdflatex.pid')), int(pdflatex.read('child.pid'))]
+        assert wait_until(lambda: not any(alive(pid) for pid in pids)), "pdflatex or its child survived the timeout"
+
+if __name__ == '__main__':
+    test_agenerate_matches_generate()
+    test_semaphore_bound()
+    test_pdf_from_bundle()
+    test_cancel_kills_pdflatex()
+    test_timeout_kills_pdflatex()
+    print("All asyncio API tests passed.")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test script for archive output in AICV (`aicv batch --archive`).
+Every supported format must hold the documents as members named after their CV folders, and a
+batch written into an archive must produce the documents it writes as separate files. The
+.tar.zst check is skipped if the zstandard package is not installed.
+"""
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import zipfile
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aicv.core.batch import main as batch_main
+from aicv.utils.archive import ArchiveWriter
+
+EXAMPLE_DIR = Path(__file__).parent.parent / 'example'
+
+def read_members(path):
+    """Returns the members of a zip or tar archive as a dict of bytes."""
+    if path.endswith('.zip'):
+        with zipfile.ZipFile(path) as archive:
+            return {name: archive.read(name) for name in archive.namelist()}
+    if path.endswith('.tar.zst'):
+        import zstandard
+        with open(path, 'rb') as f:
+            data = zstandard.ZstdDecompressor().stream_reader(f).read()
+        archive = tarfile.open(fileobj=io.BytesIO(data))
+    else:
+        archive = tarfile.open(path)
+    with archive:
+        return {member.name: archive.extractfile(member).read() for member in archive.getmembers()}
+
+def test_formats():
+    suffixes = ['.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz']
+    try:
+        import zstandard  # noqa: F401
+        suffixes.append('.tar.zst')
+    except ImportError:
+        print("zstandard is not installed, skipping the .tar.zst check")
+    with tempfile.TemporaryDirectory() as tmp:
+        for suffix in suffixes:
+            path = os.path.join(tmp, 'out' + suffix)
+            with ArchiveWriter(path) as archive:
+                archive.add('alice/cv.html', '<p>Zoë</p>')
+                archive.add('bob/cv.pdf', b'%PDF-1.7')
+            assert archive.count == 2
+            assert read_members(path) == {'alice/cv.html': '<p>Zoë</p>'.encode('utf-8'), 'bob/cv.pdf': b'%PDF-1.7'}, suffix
+
+        try:
+            ArchiveWriter(os.path.join(tmp, 'out.rar'))
+            assert False, "an unknown format must raise ValueError"
+        except ValueError:
+            pass
+
+def test_batch_into_archive():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / 'cvs'
+        for person in ('alice', 'bob'):
+            shutil.copytree(EXAMPLE_DIR, root / 'team' / person)
+        archive_path = os.path.join(tmp, 'cvs.tar.gz')
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert batch_main([str(root), '--markdown', '--jobs', '2', '--archive', archive_path]) == 0
+        members = read_members(archive_path)
+        assert sorted(members) == ['team/alice/cv.processed.md', 'team/bob/cv.processed.md']
+        # Nothing is written next to the CV folders
+        assert not (root / 'team' / 'alice' / 'cv.processed.md').exists()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            batch_main([str(root), '--markdown', '--jobs', '1', '--no-manifest'])
+        expected = (root / 'team' / 'alice' / 'cv.processed.md').read_bytes()
+        assert members['team/alice/cv.processed.md'] == expected
+
+if __name__ == '__main__':
+    test_formats()
+    test_batch_into_archive()
+    print("All archive tests passed.")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test script for batch rendering in AICV (`aicv batch`).
+Every CV folder of a tree must be found and rendered as `aicv` renders it alone, outputs must go
+next to each cv.md or into a mirror tree, and a failing folder must not stop the others but must
+make the command fail.
+"""
+import contextlib
+import io
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aicv.core.batch import default_jobs, discover_jobs, main as batch_main
+from aicv.core.processor import generate, load_personal_info
+
+EXAMPLE_DIR = Path(__file__).parent.parent / 'example'
+
+def run_batch(*argv):
+    """Runs `aicv batch` and returns its exit status and what it printed."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        status = batch_main([str(arg) for arg in argv])
+    return status, output.getvalue()
+
+def make_tree(root):
+    """Two CV folders, a folder without section files and a folder without cv.md."""
+    shutil.copytree(EXAMPLE_DIR, root / 'team' / 'alice')
+    shutil.copytree(EXAMPLE_DIR, root / 'team' / 'bob')
+    (root / 'notes').mkdir()
+    shutil.copy(EXAMPLE_DIR / 'cv.md', root / 'notes')
+    shutil.copy(EXAMPLE_DIR / 'personal.json', root / 'notes')
+    (root / 'data').mkdir()
+    shutil.copy(EXAMPLE_DIR / 'employment.json', root / 'data')
+
+def test_discover_jobs():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_tree(root)
+        jobs = discover_jobs(tmp)
+        assert [job['name'] for job in jobs] == ['team/alice/cv', 'team/bob/cv']
+        assert jobs[0]['output_base'] == str(root / 'team' / 'alice' / 'cv')
+
+        jobs = discover_jobs(tmp, output_dir=str(root / 'out'))
+        assert jobs[1]['output_base'] == str(root / 'out' / 'team' / 'bob' / 'cv')
+
+def test_batch_matches_single_cv():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_tree(root)
+        status, output = run_batch(tmp, '--markdown', '--jobs', '2', '--no-manifest')
+        assert status == 0, output
+        assert output.count('OK ') == 2
+
+        expected = generate(str(EXAMPLE_DIR / 'cv.md'), load_personal_info(str(EXAMPLE_DIR)), backend='markdown', emojis=False)
+        for person in ('alice', 'bob'):
+            assert (root / 'team' / person / 'cv.processed.md').read_text(encoding='utf-8') == expected
+        assert not (root / 'notes' / 'cv.processed.md').exists()
+
+def test_output_dir():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / 'in'
+        make_tree(root)
+        status, output = run_batch(root, '--jobs', '1', '--output-dir', Path(tmp) / 'out', '--no-manifest')
+        assert status == 0, output
+        assert (Path(tmp) / 'out' / 'team' / 'alice' / 'cv.html').exists()
+        assert not (root / 'team' / 'alice' / 'cv.html').exists()
+
+def test_failure_is_reported():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_tree(root)
+        (root / 'team' / 'bob' / 'personal.json').write_text('{broken')
+        status, output = run_batch(tmp, '--markdown', '--jobs', '2', '--no-manifest')
+        assert status == 1
+        assert f"FAIL {root / 'team' / 'bob'}: JSONDecodeError" in output, output
+        assert 'Done: 1 succeeded, 1 failed' in output
+        assert (root / 'team' / 'alice' / 'cv.processed.md').exists()
+
+def test_default_jobs():
+    assert default_jobs() >= 1
+
+if __name__ == '__main__':
+    test_discover_jobs()
+    test_batch_matches_single_cv()
+    test_output_dir()
+    test_failure_is_reported()
+    test_default_jobs()
+    print("All batch tests passed.")
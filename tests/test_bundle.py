@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test script for single-file CV bundles in AICV (`aicv pack` and .cvpack input).
+A bundle must hold the files a CV reads and nothing else, be read without extraction from a
+path or a stream, render as the folder it was packed from, and give pdflatex the photo that
+a moderncv document refers to.
+"""
+import contextlib
+import io
+import json
+import shutil
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aicv.core.batch import main as batch_main
+from aicv.core.bundle import MANIFEST_NAME, BundleSource, create_bundle, pack_main
+from aicv.core.processor import generate, latex_files, load_personal_info
+
+EXAMPLE_DIR = Path(__file__).parent.parent / 'example'
+
+EXTRA_BLOCK = "\n# Extra\n\n```pymd\nrender('extra.json')\n```\n"
+
+def make_folder(root):
+    """The example CV, with a JSON file its template reads and files it does not."""
+    folder = root / 'alice'
+    shutil.copytree(EXAMPLE_DIR, folder)
+    with open(folder / 'cv.md', 'a') as f:
+        f.write(EXTRA_BLOCK)
+    (folder / 'extra.json').write_text(json.dumps({'employment': [{'position': 'Engineer', 'company': 'Initech'}]}))
+    (folder / 'manifest.json').write_text('{"stray": true}')
+    (folder / 'notes.json').write_text('{}')
+    (folder / '.aicv-manifest.jsonl').write_text('{}\n')
+    return folder
+
+def test_members():
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = make_folder(Path(tmp))
+        bundle_path = str(Path(tmp) / 'alice.cvpack')
+        members = create_bundle(str(folder), bundle_path)
+        assert members == ['cv.md', 'personal.json', 'education.json', 'employment.json', 'extra.json',
+                           'publications.json', 'photo.jpg']
+        with zipfile.ZipFile(bundle_path) as archive:
+            names = archive.namelist()
+            assert names == [MANIFEST_NAME] + members
+            assert json.loads(archive.read(MANIFEST_NAME))['template'] == 'cv.md'
+            # Stored, so that each member is read with a seek
+            assert all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist())
+
+def test_reserved_manifest_name():
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = make_folder(Path(tmp))
+        with open(folder / 'cv.md', 'a') as f:
+            f.write("\n```pymd\nrender('manifest.json')\n```\n")
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            status = pack_main([str(folder)])
+        assert status == 1
+        assert 'reserved for the bundle manifest' in output.getvalue()
+        assert not (Path(tmp) / 'alice.cvpack').exists()
+
+def test_render_from_bundle():
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = make_folder(Path(tmp))
+        bundle_path = str(Path(tmp) / 'alice.cvpack')
+        create_bundle(str(folder), bundle_path)
+        expected = generate(str(folder / 'cv.md'), load_personal_info(str(folder)), backend='markdown', emojis=False)
+
+        with BundleSource(bundle_path) as source:
+            assert source.template == 'cv.md'
+            assert source.exists('extra.json') and not source.exists('notes.json')
+            assert generate(source.template, load_personal_info(source=source), backend='markdown', emojis=False,
+                            source=source) == expected
+        # A bundle read from a stream, e.g. stdin
+        with open(bundle_path, 'rb') as f, BundleSource(io.BytesIO(f.read())) as source:
+            assert generate(source.template, load_personal_info(source=source), backend='markdown', emojis=False,
+                            source=source) == expected
+
+        # aicv batch picks up the bundle and names its outputs after it; the folder it was packed from is the same CV
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert batch_main([tmp, '--markdown', '--jobs', '1', '--no-manifest']) == 0
+        assert (Path(tmp) / 'alice.processed.md').read_text(encoding='utf-8') == expected
+        assert not (folder / 'cv.processed.md').exists()
+        # Unless the folder itself is given
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert batch_main([str(folder), '--markdown', '--jobs', '1', '--no-manifest']) == 0
+        assert (folder / 'cv.processed.md').read_text(encoding='utf-8') == expected
+
+def test_pack_again():
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = make_folder(Path(tmp) / 'team')
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert pack_main([tmp]) == 0
+        bundle_path = Path(tmp) / 'team' / 'alice.cvpack'
+        assert bundle_path.exists()
+        # The folder is packed again, also with its bundle next to it
+        with open(folder / 'extra.json', 'w') as f:
+            json.dump({'employment': [{'position': 'Engineer', 'company': 'Globex'}]}, f)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            assert pack_main([tmp]) == 0
+        assert output.getvalue() == f"Bundle saved to {bundle_path}\n"
+        with BundleSource(str(bundle_path)) as source:
+            assert 'Globex' in source.read_text('extra.json')
+
+def test_photo_for_pdflatex():
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = make_folder(Path(tmp))
+        bundle_path = str(Path(tmp) / 'alice.cvpack')
+        create_bundle(str(folder), bundle_path)
+        with BundleSource(bundle_path) as source:
+            personal_info = load_personal_info(source=source)
+            assert personal_info['photo_path'] is None
+            assert latex_files(personal_info, source) == {'photo.jpg': (EXAMPLE_DIR / 'photo.jpg').read_bytes()}
+        # A folder's photo is a local file, which pdflatex finds by its path
+        assert latex_files(load_personal_info(str(folder))) == {}
+
+def test_not_a_bundle():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'other.zip')
+        with zipfile.ZipFile(path, 'w') as archive:
+            archive.writestr('cv.md', '# CV')
+        try:
+            BundleSource(path)
+            assert False, "a zip archive without a manifest must raise ValueError"
+        except ValueError:
+            pass
+
+if __name__ == '__main__':
+    test_members()
+    test_reserved_manifest_name()
+    test_render_from_bundle()
+    test_pack_again()
+    test_photo_for_pdflatex()
+    test_not_a_bundle()
+    print("All bundle tests passed.")
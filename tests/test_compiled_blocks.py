@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test script for compiled pymd blocks in AICV (compile_block() and declared_inputs()).
+A block that is just render('file.json') with literal arguments must be recognised and rendered
+without exec(); any other block must run as Python code. A compiled block and a compiled template
+must be reused for every CV, and still render each CV with its own data.
+"""
+import json
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import aicv.core.extensions
+from aicv.core.extensions import compile_block, compile_template, declared_inputs
+from aicv.core.processor import generate, load_personal_info
+
+EXAMPLE_DIR = Path(__file__).parent.parent / 'example'
+
+def test_fast_path():
+    # Positional and keyword arguments, as PyMdPreprocessor._render() takes them
+    assert compile_block("render('employment.json')")[1] == ('employment.json', None)
+    assert compile_block("render('employment.json', 'html')")[1] == ('employment.json', 'html')
+    assert compile_block("render('employment.json', backend='html')")[1] == ('employment.json', 'html')
+    assert compile_block("render(backend='moderncv', json_filename='employment.json')")[1] == ('employment.json', 'moderncv')
+    assert compile_block("\nrender('employment.json')  # the jobs\n")[1] == ('employment.json', None)
+
+    for code in ["name = 'employment.json'\nrender(name)",        # a non-literal argument
+                 "render(f'{1}.json')",
+                 "render('employment.json')\nprint('more')",       # another statement
+                 "print(render('employment.json'))",              # not a bare call
+                 "x = render('employment.json')",
+                 "render('employment.json', 'html', 'extra')",    # arguments render() does not take
+                 "render('employment.json', style='compact')",
+                 "render(backend='html')",
+                 "render('employment.json', json_filename='education.json')",
+                 "render('employment.json', None)",
+                 "renderer.render('employment.json')"]:
+        code_object, static = compile_block(code)
+        assert static is None, code
+        assert code_object is not None
+
+    try:
+        compile_block("render('employment.json'")
+        assert False, "a block with a syntax error must raise SyntaxError"
+    except SyntaxError:
+        pass
+
+def test_declared_inputs():
+    lines = (EXAMPLE_DIR / 'cv.md').read_text(encoding='utf-8').splitlines()
+    assert declared_inputs(lines) == ['employment.json', 'education.json', 'publications.json']
+    # Files of blocks with other code, of broken blocks and repeated files are not listed
+    lines += ['```pymd', "render('extra.json'", '```',
+              '```pymd', "for name in ['more.json']:", '    render(name)', '```',
+              '```pymd', "render('employment.json', backend='html')", '```']
+    assert declared_inputs(lines) == ['employment.json', 'education.json', 'publications.json']
+
+def count_exec():
+    """Counts the exec() calls of the pymd preprocessor, until the returned restore function is called."""
+    calls = []
+    def counting_exec(code, globals_=None, locals_=None):
+        calls.append(code)
+        return exec(code, globals_, locals_)
+    aicv.core.extensions.exec = counting_exec
+    def restore():
+        del aicv.core.extensions.exec
+    return calls, restore
+
+def test_render_without_exec():
+    personal_info = load_personal_info(str(EXAMPLE_DIR))
+    calls, restore = count_exec()
+    try:
+        generate(str(EXAMPLE_DIR / 'cv.md'), personal_info, backend='markdown')
+        assert calls == []
+        with tempfile.TemporaryDirectory() as tmp:
+            folder = Path(tmp) / 'alice'
+            shutil.copytree(EXAMPLE_DIR, folder)
+            documents = []
+            for code in ("render('employment.json')", "name = 'employment.json'\nrender(name)"):
+                (folder / 'cv.md').write_text(f"# CV\n\n```pymd\n{code}\n```\n", encoding='utf-8')
+                documents.append(generate(str(folder / 'cv.md'), personal_info, backend='markdown'))
+        assert len(calls) == 1
+    finally:
+        restore()
+    # Both paths render the same
+    assert documents[0] == documents[1] and '**Position**' in documents[0]
+
+def test_cache_renders_each_cv():
+    template = "# CV\n\n```pymd\nname = 'employment.json'\nrender(name)\n```\n\n```pymd\nrender('education.json')\n```\n"
+    with tempfile.TemporaryDirectory() as tmp:
+        folders = []
+        for company in ('Initech', 'Globex'):
+            folder = Path(tmp) / company
+            shutil.copytree(EXAMPLE_DIR, folder)
+            (folder / 'cv.md').write_text(template, encoding='utf-8')
+            with open(folder / 'employment.json', encoding='utf-8') as f:
+                employment = json.load(f)
+            employment['employment'][0]['company'] = company
+            (folder / 'employment.json').write_text(json.dumps(employment), encoding='utf-8')
+            folders.append(folder)
+
+        blocks, templates = compile_block.cache_info(), compile_template.cache_info()
+        documents = [generate(str(folder / 'cv.md'), load_personal_info(str(folder)), backend='html', emojis=False)
+                     for folder in folders]
+        # The second CV reuses the compiled template and blocks of the first
+        assert compile_template.cache_info().hits == templates.hits + 1
+        assert compile_block.cache_info().hits >= blocks.hits + 2
+        assert 'Initech' in documents[0] and 'Globex' not in documents[0]
+        assert 'Globex' in documents[1] and 'Initech' not in documents[1]
+
+if __name__ == '__main__':
+    test_fast_path()
+    test_declared_inputs()
+    test_render_without_exec()
+    test_cache_renders_each_cv()
+    print("All compiled block tests passed.")
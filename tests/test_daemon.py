@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Test script for the resident server of AICV (`aicv daemon`).
+A command forwarded to the server must write the same files and return the same exit status as
+one run in process; a stale or foreign socket must make `aicv` run in process; and a command
+that reads stdin or writes a document to stdout must never be forwarded.
+"""
+import contextlib
+import io
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import aicv.core.daemon
+from aicv.core.daemon import NO_DAEMON_ENV, SOCKET_ENV, forward, status
+from aicv.main import main
+
+EXAMPLE_DIR = Path(__file__).parent.parent / 'example'
+PACKAGE_DIR = str(Path(__file__).parent.parent)
+
+def aicv_command(*args):
+    """Command line of `aicv`, run from this source tree."""
+    return [sys.executable, '-c', 'import sys; from aicv.main import main; sys.exit(main())'] + [str(arg) for arg in args]
+
+@contextlib.contextmanager
+def running_server(path):
+    """Runs `aicv daemon start --foreground` on the socket path until the block ends."""
+    env = dict(os.environ, PYTHONPATH=PACKAGE_DIR)
+    env.pop(NO_DAEMON_ENV, None)
+    command = aicv_command('daemon', 'start', '--foreground', '--socket', path, '--workers', '1')
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(600):
+            if status(path) is not None:
+                break
+            assert server.poll() is None, "the server exited during its start"
+            time.sleep(0.05)
+        else:
+            raise AssertionError("the server did not start")
+        yield server
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+@contextlib.contextmanager
+def socket_env(path, no_daemon=False):
+    """Points aicv at the socket path, or makes it run in process with no_daemon."""
+    saved = {name: os.environ.get(name) for name in (SOCKET_ENV, NO_DAEMON_ENV)}
+    os.environ[SOCKET_ENV] = path
+    if no_daemon:
+        os.environ[NO_DAEMON_ENV] = '1'
+    else:
+        os.environ.pop(NO_DAEMON_ENV, None)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+def quietly(fn, *args):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        result = fn(*args)
+    return result, output.getvalue()
+
+def test_forward():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        shutil.copytree(EXAMPLE_DIR, root / 'alice')
+        path = str(root / 'aicv.sock')
+        with running_server(path) as server, socket_env(path):
+            # The server writes the file relative to the caller's working directory
+            saved_cwd = os.getcwd()
+            os.chdir(root / 'alice')
+            try:
+                result, output = quietly(forward, ['cv.md', '--markdown', 'forwarded.md'])
+            finally:
+                os.chdir(saved_cwd)
+            assert result == 0 and 'Markdown representation saved to forwarded.md' in output, output
+
+            with socket_env(path, no_daemon=True):
+                quietly(main, [str(root / 'alice' / 'cv.md'), '--markdown', str(root / 'alice' / 'local.md')])
+            assert (root / 'alice' / 'forwarded.md').read_text() == (root / 'alice' / 'local.md').read_text()
+
+            # The exit status of the command comes back, also for usage errors
+            with contextlib.redirect_stderr(io.StringIO()) as errors:
+                assert quietly(forward, [str(root / 'alice' / 'missing.md')])[0] == 1
+                assert quietly(forward, [str(root / 'alice' / 'cv.md'), '--bogus'])[0] == 2
+            assert 'unrecognized arguments: --bogus' in errors.getvalue()
+            assert server.poll() is None
+
+        # The server removed its socket when it stopped: aicv runs in process
+        assert not os.path.lexists(path)
+        with socket_env(path):
+            assert forward(['cv.md']) is None
+
+def test_stale_socket():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'aicv.sock')
+        # A socket nobody listens on, as a killed server leaves it
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(path)
+        stale.close()
+        os.chmod(path, 0o600)
+        with socket_env(path):
+            assert forward(['cv.md']) is None
+            # A socket other users can connect to is not used either
+            os.chmod(path, 0o666)
+            assert forward(['cv.md']) is None
+
+def test_stdio_is_not_forwarded():
+    forwarded = []
+    forward = aicv.core.daemon.forward
+    aicv.core.daemon.forward = lambda argv: forwarded.append(argv)
+    try:
+        cv_path = str(EXAMPLE_DIR / 'cv.md')
+        quietly(main, [cv_path, '--markdown', os.devnull])
+        assert len(forwarded) == 1
+        for stdio in (['--markdown=-'], ['-o-'], ['--output', '-'], ['--json=-'], ['--pdf-output=-'], ['--format', 'html']):
+            # The command runs in process; a PDF may fail here for lack of WeasyPrint, which does not matter
+            document = io.TextIOWrapper(io.BytesIO())
+            with contextlib.redirect_stdout(document), contextlib.redirect_stderr(io.StringIO()):
+                try:
+                    main([cv_path] + stdio)
+                except Exception:
+                    pass
+            assert len(forwarded) == 1, stdio
+    finally:
+        aicv.core.daemon.forward = forward
+
+def test_stdout_with_server():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'aicv.sock')
+        cv_path = str(EXAMPLE_DIR / 'cv.md')
+        env = dict(os.environ, PYTHONPATH=PACKAGE_DIR, **{SOCKET_ENV: path})
+        env.pop(NO_DAEMON_ENV, None)
+        expected = subprocess.run(aicv_command(cv_path, '--markdown', '-'), env=dict(env, **{NO_DAEMON_ENV: '1'}),
+                                  capture_output=True, check=True).stdout
+        assert b'**Position**' in expected
+        with running_server(path):
+            for stdio in (['--markdown=-'], ['--markdown', '-']):
+                result = subprocess.run(aicv_command(cv_path, *stdio), env=env, capture_output=True)
+                assert result.returncode == 0, result.stderr
+                assert result.stdout == expected, stdio
+
+if __name__ == '__main__':
+    test_forward()
+    test_stale_socket()
+    test_stdio_is_not_forwarded()
+    test_stdout_with_server()
+    print("All resident server tests passed.")
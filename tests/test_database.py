@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test script for the SQLite data source in AICV (`aicv db` and `aicv batch cvs.db --template cv.md`).
+An imported person must read back exactly the data of their CV folder, in its original order,
+importing again must update them, and a person rendered from the database must match the CV
+rendered from the folder.
+"""
+import contextlib
+import io
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aicv.core.batch import main as batch_main
+from aicv.core.bundle import create_bundle
+from aicv.core.database import CVDatabase, SQLiteSource, connect, db_main, find_person, is_database
+from aicv.core.processor import generate, load_personal_info
+from aicv.core.sources import DirectorySource
+
+EXAMPLE_DIR = Path(__file__).parent.parent / 'example'
+
+def quietly(fn, argv):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        status = fn([str(arg) for arg in argv])
+    return status, output.getvalue()
+
+def make_tree(root):
+    for person in ('alice', 'bob'):
+        shutil.copytree(EXAMPLE_DIR, root / 'team' / person)
+
+def test_import_and_read_back():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_tree(root / 'cvs')
+        db = root / 'cvs.db'
+        status, output = quietly(db_main, ['import', db, root / 'cvs'])
+        assert status == 0 and 'Imported 2 CV folders' in output
+        assert is_database(str(db)) and not is_database(str(EXAMPLE_DIR / 'cv.md'))
+        assert quietly(db_main, ['list', db])[1].split() == ['team/alice', 'team/bob']
+
+        conn = connect(str(db))
+        source = SQLiteSource(conn, find_person(conn, 'team/alice'), fallback=DirectorySource(str(EXAMPLE_DIR)))
+        for section in ('employment', 'education', 'publications'):
+            with open(EXAMPLE_DIR / f"{section}.json", 'r', encoding='utf-8') as f:
+                assert source.load_json(f"{section}.json") == {section: json.load(f)[section]}
+        # The photo is found next to the original folder
+        personal = source.load_json('personal.json')
+        assert personal['photo'] == str(root / 'cvs' / 'team' / 'alice' / 'photo.jpg')
+        # Other files come from the fallback
+        assert source.read_text('cv.md') == (EXAMPLE_DIR / 'cv.md').read_text(encoding='utf-8')
+        assert find_person(conn, 'team/carol') is None
+
+def test_import_again_updates():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_tree(root / 'cvs')
+        db = str(root / 'cvs.db')
+        quietly(db_main, ['import', db, root / 'cvs'])
+        since = time.time()
+        (root / 'cvs' / 'team' / 'bob' / 'employment.json').write_text(json.dumps({'employment': []}))
+        with CVDatabase(db) as database:
+            database.import_folder('team/bob', str(root / 'cvs' / 'team' / 'bob'))
+            assert [person['key'] for person in database.people()] == ['team/alice', 'team/bob']
+            assert [person['key'] for person in database.people(since=since)] == ['team/bob']
+            person_id = find_person(database.conn, 'team/bob')
+            assert SQLiteSource(database.conn, person_id).load_json('employment.json') == {'employment': []}
+
+def test_bundles_are_skipped():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_tree(root / 'cvs')
+        create_bundle(str(root / 'cvs' / 'team' / 'bob'), str(root / 'cvs' / 'carol.cvpack'))
+        status, output = quietly(db_main, ['import', root / 'cvs.db', root / 'cvs'])
+        assert status == 0
+        assert 'Imported 2 CV folders' in output and 'Skipped 1 .cvpack bundles' in output, output
+
+def test_batch_from_database():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_tree(root / 'cvs')
+        db = root / 'people.db'
+        quietly(db_main, ['import', db, root / 'cvs'])
+        status, output = quietly(batch_main, [db, '--template', EXAMPLE_DIR / 'cv.md', '--markdown', '--jobs', '1',
+                                              '--person', 'team/bob'])
+        assert status == 0, output
+        # The outputs go to a directory named after the database, one folder per selected person
+        expected = generate(str(EXAMPLE_DIR / 'cv.md'), load_personal_info(str(EXAMPLE_DIR)), backend='markdown', emojis=False)
+        assert (root / 'people' / 'team' / 'bob' / 'cv.processed.md').read_text(encoding='utf-8') == expected
+        assert not (root / 'people' / 'team' / 'alice').exists()
+
+if __name__ == '__main__':
+    test_import_and_read_back()
+    test_import_again_updates()
+    test_bundles_are_skipped()
+    test_batch_from_database()
+    print("All database tests passed.")
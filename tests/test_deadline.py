@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test script for deadline-aware generation in AICV (`--deadline` and `--stage-timings`).
+A PDF that is ready in time must come with the document; a late one must keep rendering in the
+background and still be written; a failed one must be reported; and every stage must be timed.
+pdflatex is stood in for by a function that sleeps, so no TeX installation is needed.
+"""
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import aicv.utils.latex_compiler
+import aicv.utils.storage
+from aicv.core.deadline import PDF_DONE, PDF_FAILED, PDF_NONE, PDF_PENDING, generate_with_deadline
+from aicv.main import main
+
+EXAMPLE_DIR = Path(__file__).parent.parent / 'example'
+
+@contextlib.contextmanager
+def fake_pdflatex(delay=0.0, fail=False):
+    """Replaces pdflatex with a function that takes delay seconds; yields the files it was given."""
+    calls = []
+    def compile_latex_to_pdf_bytes(content, use_bibtex=False, timeout=None, files=None, **kwargs):
+        calls.append(files)
+        time.sleep(delay)
+        return None if fail else b'%PDF-1.5 ' + content[:10].encode('utf-8')
+
+    saved = aicv.utils.latex_compiler.compile_latex_to_pdf_bytes
+    aicv.utils.latex_compiler.compile_latex_to_pdf_bytes = compile_latex_to_pdf_bytes
+    try:
+        yield calls
+    finally:
+        aicv.utils.latex_compiler.compile_latex_to_pdf_bytes = saved
+
+def quietly(fn, *args, **kwargs):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        result = fn(*args, **kwargs)
+    return result, output.getvalue()
+
+def test_pdf_in_time():
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, 'cv.pdf')
+        with fake_pdflatex() as calls:
+            result, output = quietly(generate_with_deadline, str(EXAMPLE_DIR / 'cv.md'), backend='moderncv', pdf=True,
+                                     deadline=30, pdf_path=pdf_path)
+        assert result['pdf_status'] == PDF_DONE and result['pdf_error'] is None
+        assert '\\documentclass' in result['content']
+        assert result['pdf'] == Path(pdf_path).read_bytes() and result['pdf'].startswith(b'%PDF')
+        assert f"PDF saved to {pdf_path}" in output
+        # A photo next to the template is found by its path, so nothing else is copied for pdflatex
+        assert calls == [{}]
+        assert list(result['timings']) == ['load', 'parse', 'render', 'pdf']
+        assert all(seconds >= 0 for seconds in result['timings'].values())
+        assert result['elapsed'] >= result['timings']['pdf']
+
+        # Markdown has no PDF
+        result = generate_with_deadline(str(EXAMPLE_DIR / 'cv.md'), backend='markdown', pdf=True, deadline=30)
+        assert result['pdf_status'] == PDF_NONE and result['pdf_future'] is None
+        assert 'pdf' not in result['timings']
+
+def test_pdf_pending():
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, 'cv.pdf')
+        with fake_pdflatex(delay=0.5):
+            result, _ = quietly(generate_with_deadline, str(EXAMPLE_DIR / 'cv.md'), backend='moderncv', pdf=True,
+                                deadline=0.05, pdf_path=pdf_path)
+            # The document is there at once; the PDF is not
+            assert result['pdf_status'] == PDF_PENDING and result['pdf'] is None
+            assert result['elapsed'] < 0.5
+            assert 'pdf' not in result['timings']
+            assert not os.path.exists(pdf_path)
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                pdf = result['pdf_future'].result(timeout=30)
+        assert pdf.startswith(b'%PDF') and Path(pdf_path).read_bytes() == pdf
+        assert result['timings']['pdf'] >= 0.5
+
+def test_pdf_failed():
+    with fake_pdflatex(fail=True):
+        result = generate_with_deadline(str(EXAMPLE_DIR / 'cv.md'), backend='moderncv', pdf=True, deadline=30)
+    assert result['pdf_status'] == PDF_FAILED and result['pdf'] is None
+    assert result['pdf_error'] == 'RuntimeError: LaTeX compilation failed'
+    # The document is still returned
+    assert '\\documentclass' in result['content']
+
+def test_command_line():
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copytree(EXAMPLE_DIR, os.path.join(tmp, 'alice'))
+        cv_path = os.path.join(tmp, 'alice', 'cv.md')
+
+        # The PDF, written from the background thread, goes to the same S3 endpoint as the other outputs
+        saved = []
+        save_output = aicv.utils.storage.save_output
+        def record_save_output(path, data, endpoint_url=None):
+            saved.append((path, endpoint_url))
+            return save_output(path, data, endpoint_url=endpoint_url)
+
+        aicv.utils.storage.save_output = record_save_output
+        try:
+            with fake_pdflatex():
+                status, output = quietly(main, [cv_path, '--moderncv', '--deadline', '30', '--stage-timings',
+                                                '--s3-endpoint', 'http://localhost:9000'])
+        finally:
+            aicv.utils.storage.save_output = save_output
+        assert status == 0, output
+        assert saved == [(os.path.join(tmp, 'alice', 'cv.pdf'), 'http://localhost:9000')]
+        assert os.path.exists(os.path.join(tmp, 'alice', 'cv.tex'))
+        assert 'Timings: load' not in output and 'Timings: parse' in output and ' pdf ' in output, output
+
+        with fake_pdflatex(fail=True):
+            status, output = quietly(main, [cv_path, '--moderncv', '--deadline', '30'])
+        assert status == 1
+        assert 'PDF generation failed: RuntimeError: LaTeX compilation failed' in output
+
+if __name__ == '__main__':
+    test_pdf_in_time()
+    test_pdf_pending()
+    test_pdf_failed()
+    test_command_line()
+    print("All deadline tests passed.")
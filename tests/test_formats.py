@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test script for generating several formats of a CV at once in AICV (`--formats`).
+Every format must be the document generate() makes for its backend, while each input file is read once.
+"""
+import sys
+from collections import Counter
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aicv.core.formats import generate_formats, parse_formats
+from aicv.core.processor import generate, load_personal_info
+from aicv.core.sources import CachedSource, DirectorySource
+
+EXAMPLE_DIR = Path(__file__).parent.parent / 'example'
+
+class CountingSource(DirectorySource):
+    """Counts the reads of each file."""
+    def __init__(self, *directories):
+        super().__init__(*directories)
+        self.reads = Counter()
+
+    def read_bytes(self, name):
+        self.reads[name] += 1
+        return super().read_bytes(name)
+
+def test_formats_from_one_load():
+    source = CountingSource(str(EXAMPLE_DIR))
+    result = generate_formats('cv.md', parse_formats('html,md,tex'), source=source)
+    assert result['errors'] == {}
+    assert list(result['outputs']) == ['html', 'md', 'tex']
+    assert source.reads and max(source.reads.values()) == 1, f"files read more than once: {source.reads}"
+
+    personal_info = load_personal_info(str(EXAMPLE_DIR))
+    for name, backend in (('html', 'html'), ('md', 'markdown'), ('tex', 'moderncv')):
+        expected = generate(str(EXAMPLE_DIR / 'cv.md'), personal_info, backend=backend, emojis=backend == 'html')
+        assert result['outputs'][name] == expected.encode('utf-8'), f"{name} differs from generate()"
+
+def test_cached_personal_info():
+    source = CachedSource(DirectorySource(str(EXAMPLE_DIR)))
+    personal_info = load_personal_info(source=source)
+    assert personal_info['photo_path'] == str(EXAMPLE_DIR / 'photo.jpg')
+    # The resolved photo is not written into the JSON the source hands out to the other readers
+    assert 'photo_path' not in source.load_json('personal.json')
+    assert load_personal_info(source=source) is not personal_info
+
+def test_parse_formats():
+    assert parse_formats('tex, pdf-latex,tex') == ['tex', 'pdf-latex']
+    try:
+        parse_formats('html,docx')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("an unknown format must be rejected")
+
+if __name__ == '__main__':
+    test_formats_from_one_load()
+    test_cached_personal_info()
+    test_parse_formats()
+    print("All formats tests passed.")
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Test script for the one-pass HTML conversion of templates in AICV.
+The Markdown between the pymd blocks is converted in one pass, so reference links must resolve
+across the blocks; a raw HTML block that swallows a block's placeholder must fall back to
+converting each run alone; and a pooled converter must not carry anything to the next document.
+"""
+import re
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aicv.core.extensions import PyMdPreprocessor, markdown_converter
+
+PLACEHOLDER = re.compile(r'aicv[0-9a-f]{16}block')
+
+def render_html(template):
+    preprocessor = PyMdPreprocessor(None, backend='html', emojis=False)
+    return ''.join(preprocessor.iter_chunks(template.splitlines()))
+
+def test_reference_links_across_blocks():
+    html = render_html("# CV\n\nSee [my site][home].\n\n```pymd\nprint('**first**')\n```\n\n"
+                       "```pymd\nprint('second')\n```\n\nOr [the site][home] again.\n\n[home]: https://example.org\n")
+    assert html.count('<a href="https://example.org">') == 2, html
+    # The blocks fill their places, in order, and their output is not converted again
+    assert html.index('my site') < html.index('**first**') < html.index('second') < html.index('the site')
+    assert 'https://example.org' not in html.replace('<a href="https://example.org">', '')
+    assert not PLACEHOLDER.search(html)
+
+def test_swallowed_placeholder():
+    # The raw HTML block runs over the pymd block, so its placeholder is not a paragraph of its own
+    html = render_html('# CV\n\n<div class="intro">\nIntro\n\n```pymd\nprint("hello")\n```\n\nTail [site][home]\n\n</div>\n\n'
+                       '[home]: https://example.org\n')
+    assert not PLACEHOLDER.search(html), html
+    assert html.count('hello') == 1
+    assert html.index('Intro') < html.index('hello') < html.index('Tail')
+    # Each run is converted alone; a reference defined in the same run still resolves
+    assert '<a href="https://example.org">site</a>' in html
+
+def test_converter_reset():
+    with markdown_converter() as md:
+        first = md
+        md.convert('[home]: https://example.org\n\n# Title')
+    with markdown_converter() as md:
+        # The converter goes back to the pool and is lent again, without the references of the last document
+        assert md is first
+        assert md.convert('[site][home]') == '<p>[site][home]</p>'
+
+    render_html("# CV\n\n```pymd\nprint('x')\n```\n\n[home]: https://example.org\n")
+    html = render_html("# Other CV\n\n```pymd\nprint('y')\n```\n\nSee [site][home].\n")
+    assert 'href' not in html, html
+
+if __name__ == '__main__':
+    test_reference_links_across_blocks()
+    test_swallowed_placeholder()
+    test_converter_reset()
+    print("All HTML conversion tests passed.")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Test script for the startup time of the AICV command line.
+Backends are imported only when they are selected: rendering Markdown must neither load WeasyPrint
+nor the LaTeX compiler, and importing aicv.main must fit in a budget measured with -X importtime.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+EXAMPLE_CV = ROOT / 'example' / 'cv.md'
+
+# Cumulative import time of aicv.main, in microseconds. It is about 25 ms on a laptop; the budget
+# leaves room for slow CI machines while still catching an eager import of WeasyPrint (hundreds of ms).
+IMPORT_BUDGET_US = 80000
+
+# Modules that the Markdown backend must not pull in
+HEAVY_MODULES = ('weasyprint', 'markdown', 'aicv.utils.pdf_converter', 'aicv.utils.latex_compiler',
+                 'aicv.backend.html', 'aicv.backend.moderncv', 'http.server', 'concurrent.futures')
+
+def run_python(code, *options):
+    env = dict(os.environ, PYTHONPATH=str(ROOT) + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    return subprocess.run([sys.executable, *options, '-c', code], capture_output=True, text=True, env=env, check=True)
+
+def import_time_us():
+    """Returns the cumulative import time of aicv.main in a fresh interpreter."""
+    result = run_python('import aicv.main', '-X', 'importtime')
+    for line in result.stderr.splitlines():
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == 'aicv.main':
+            return int(fields[1])
+    raise AssertionError("aicv.main is missing from the -X importtime report")
+
+def test_markdown_does_not_import_other_backends():
+    with tempfile.TemporaryDirectory() as tmp:
+        code = (
+            "import sys\n"
+            "from aicv.main import main\n"
+            f"main([{str(EXAMPLE_CV)!r}, '--markdown', {os.path.join(tmp, 'cv.md')!r}])\n"
+            f"print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))\n"
+        )
+        loaded = run_python(code).stdout.splitlines()[-1]
+    assert loaded == '', f"aicv --markdown imported {loaded}"
+
+def test_import_time_budget():
+    # The best of a few runs, as the first one may pay for a cold disk cache
+    best = min(import_time_us() for _ in range(3))
+    print(f"aicv.main imported in {best / 1000:.1f} ms (budget: {IMPORT_BUDGET_US / 1000:.0f} ms)")
+    assert best <= IMPORT_BUDGET_US, f"importing aicv.main took {best / 1000:.1f} ms, over the {IMPORT_BUDGET_US / 1000:.0f} ms budget"
+
+if __name__ == '__main__':
+    test_markdown_does_not_import_other_backends()
+    test_import_time_budget()
+    print("All import time tests passed.")
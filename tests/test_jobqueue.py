@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Test script for the durable job queue in AICV (`aicv queue` and `aicv worker`).
+A job must be handed to one worker at a time, most expensive first; a job whose lease expires
+must be handed out again, then fail after too many attempts; and a worker that lost its lease
+must neither record its result nor leave its outputs behind.
+"""
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import aicv.core.batch
+import aicv.utils.latex_compiler
+from aicv.core.bundle import create_bundle
+from aicv.core.jobqueue import JobQueue, queue_main, work, worker_main
+
+EXAMPLE_DIR = Path(__file__).parent.parent / 'example'
+
+def make_jobs(count):
+    return [{'input_dir': f"/cvs/{i}", 'name': f"{i}/cv", 'cv_path': f"/cvs/{i}/cv.md", 'output_base': f"/cvs/{i}/cv",
+             'estimated_cost': i} for i in range(count)]
+
+def quietly(fn, *args):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        status = fn(*args)
+    return status, output.getvalue()
+
+def test_claim_order_and_exclusivity():
+    with tempfile.TemporaryDirectory() as tmp:
+        job_queue = JobQueue(os.path.join(tmp, 'queue.db'))
+        assert job_queue.add(make_jobs(3), {'backend': 'html'}) == 3
+        # Queued and running jobs are not added twice
+        assert job_queue.add(make_jobs(3), {'backend': 'html'}) == 0
+
+        claimed = [job_queue.claim('w1'), job_queue.claim('w2'), job_queue.claim('w1')]
+        assert [job['input_dir'] for job in claimed] == ['/cvs/2', '/cvs/1', '/cvs/0']
+        assert job_queue.claim('w2') is None
+        assert claimed[0]['options'] == {'backend': 'html'}
+
+        assert job_queue.finish(claimed[0]['id'], 'w1', {'ok': True, 'outputs': ['/cvs/2/cv.html'], 'elapsed': 0.1})
+        # Only the holder of the lease can finish a job
+        assert not job_queue.finish(claimed[1]['id'], 'w1', {'ok': True})
+        assert job_queue.finish(claimed[1]['id'], 'w2', {'ok': False, 'error': 'boom'})
+        assert job_queue.counts() == {'queued': 0, 'running': 1, 'done': 1, 'failed': 1}
+        assert job_queue.failures()[0]['error'] == 'boom'
+
+        assert job_queue.requeue() == 1
+        assert job_queue.counts()['queued'] == 1
+        job_queue.close()
+
+def test_lease_expiry():
+    with tempfile.TemporaryDirectory() as tmp:
+        job_queue = JobQueue(os.path.join(tmp, 'queue.db'), max_attempts=2)
+        job_queue.add(make_jobs(1), {})
+        job = job_queue.claim('w1', lease=60)
+        assert job_queue.heartbeat(job['id'], 'w1', lease=0.05)
+        time.sleep(0.1)
+
+        # The lease of w1 expired: the job goes to w2, and w1 can no longer renew or finish it
+        retry = job_queue.claim('w2', lease=0.05)
+        assert retry['id'] == job['id']
+        assert not job_queue.heartbeat(job['id'], 'w1')
+        published = []
+        assert not job_queue.finish(job['id'], 'w1', {'ok': True}, publish=published.append)
+        assert published == []
+
+        # After max_attempts expired leases, the job fails instead of being handed out again
+        time.sleep(0.1)
+        assert job_queue.claim('w3') is None
+        assert job_queue.counts()['failed'] == 1
+        assert job_queue.failures()[0]['error'] == 'Lease expired too many times'
+        job_queue.close()
+
+def test_workers_drain_queue():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        for person in ('alice', 'bob', 'carol'):
+            shutil.copytree(EXAMPLE_DIR, root / 'cvs' / person)
+        (root / 'cvs' / 'bob' / 'personal.json').write_text('{broken')
+        db = str(root / 'queue.db')
+        quietly(queue_main, ['add', db, str(root / 'cvs'), '--markdown'])
+
+        # A failed job makes the exit status non-zero, also when it ran in a child process
+        status, output = quietly(worker_main, [db, '--jobs', '2', '--exit-when-empty', '--poll', '0.1'])
+        assert status == 1, output
+        job_queue = JobQueue(db)
+        assert job_queue.counts() == {'queued': 0, 'running': 0, 'done': 2, 'failed': 1}
+        outputs = [json.loads(row['outputs']) for row in job_queue.conn.execute("SELECT outputs FROM jobs WHERE state = 'done'")]
+        assert sorted(outputs) == [[str(root / 'cvs' / person / 'cv.processed.md')] for person in ('alice', 'carol')]
+        job_queue.close()
+        # The staging files were moved into place
+        for person in ('alice', 'bob', 'carol'):
+            assert [name for name in os.listdir(root / 'cvs' / person) if name.startswith('.')] == []
+        assert (root / 'cvs' / 'alice' / 'cv.processed.md').exists()
+
+def test_lost_lease_keeps_outputs():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        shutil.copytree(EXAMPLE_DIR, root / 'cvs' / 'alice')
+        output_path = root / 'cvs' / 'alice' / 'cv.processed.md'
+        output_path.write_text('written by the worker that took the job over')
+        db = str(root / 'queue.db')
+        quietly(queue_main, ['add', db, str(root / 'cvs'), '--markdown'])
+
+        render_job = aicv.core.batch.render_job
+        def render_and_lose_lease(job, options):
+            result = render_job(job, options)
+            # Meanwhile, another worker took the job over and finished it
+            other = JobQueue(db)
+            other.conn.execute("UPDATE jobs SET worker = 'other', state = 'done'")
+            other.close()
+            return result
+
+        aicv.core.batch.render_job = render_and_lose_lease
+        try:
+            failed, output = quietly(work, db, 'w1', 60.0, 15.0, 0.1, True)
+        finally:
+            aicv.core.batch.render_job = render_job
+        assert failed == 0
+        assert 'LOST' in output, output
+        assert output_path.read_text() == 'written by the worker that took the job over'
+        assert [name for name in os.listdir(root / 'cvs' / 'alice') if name.startswith('.')] == []
+
+def test_bundle_job():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        shutil.copytree(EXAMPLE_DIR, root / 'alice')
+        (root / 'cvs').mkdir()
+        create_bundle(str(root / 'alice'), str(root / 'cvs' / 'alice.cvpack'))
+        db = str(root / 'queue.db')
+        quietly(queue_main, ['add', db, str(root / 'cvs'), '--moderncv', '--pdf'])
+
+        # pdflatex is stood in for by a function that records the files it finds next to the .tex file
+        compiled = []
+        compile_latex_to_pdf = aicv.utils.latex_compiler.compile_latex_to_pdf
+        def fake_compile(tex_path, pdf_path, use_bibtex=False, working_directory=None, timeout=None):
+            compiled.append(sorted(os.listdir(working_directory)))
+            Path(pdf_path).write_bytes(b'%PDF-1.5')
+            return pdf_path
+
+        aicv.utils.latex_compiler.compile_latex_to_pdf = fake_compile
+        try:
+            failed, output = quietly(work, db, 'w1', 60.0, 15.0, 0.1, True)
+        finally:
+            aicv.utils.latex_compiler.compile_latex_to_pdf = compile_latex_to_pdf
+        assert failed == 0, output
+        # Status messages name the bundle, not the directory it is in
+        assert f"OK   {root / 'cvs' / 'alice.cvpack'}" in output, output
+        assert compiled == [['alice.tex', 'photo.jpg']]
+        assert (root / 'cvs' / 'alice.pdf').read_bytes() == b'%PDF-1.5'
+        assert (root / 'cvs' / 'alice.tex').exists()
+
+if __name__ == '__main__':
+    test_claim_order_and_exclusivity()
+    test_lease_expiry()
+    test_workers_drain_queue()
+    test_lost_lease_keeps_outputs()
+    test_bundle_job()
+    print("All job queue tests passed.")
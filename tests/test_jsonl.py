@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test script for JSON Lines input in AICV (`aicv batch people.jsonl --template cv.md`).
+The byte-offset index must be built once, reused while the JSONL file is unchanged and rebuilt
+when it changes or is damaged; every record must be read by its number; and each record must
+render as the CV folder it was exported from.
+"""
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aicv.core.batch import main as batch_main
+from aicv.core.jsonl import INDEX_SUFFIX, JsonlFile
+from aicv.core.processor import generate, load_personal_info
+
+EXAMPLE_DIR = Path(__file__).parent.parent / 'example'
+
+def example_record(first_name):
+    """The example CV as a JSONL record, under another first name and first employer."""
+    record = {}
+    for section in ('personal', 'employment', 'education', 'publications'):
+        with open(EXAMPLE_DIR / f"{section}.json", 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        record[section] = data if section == 'personal' else data[section]
+    record['personal']['first_name'] = first_name
+    record['employment'][0]['company'] = f"{first_name} Inc."
+    return record
+
+def write_jsonl(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            # Blank lines are not records
+            f.write('\n')
+
+def open_jsonl(path):
+    """Opens a JSONL file and tells whether it was indexed."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        records = JsonlFile(path)
+    return records, 'Indexing' in output.getvalue()
+
+def test_index():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'people.jsonl')
+        write_jsonl(path, [example_record(name) for name in ('Alice', 'Bob', 'Zoë')])
+
+        records, indexed = open_jsonl(path)
+        assert indexed and os.path.exists(path + INDEX_SUFFIX)
+        with records:
+            assert len(records) == 3
+            assert records[1]['personal']['first_name'] == 'Bob'
+            assert records[-1]['personal']['first_name'] == 'Zoë'
+            assert [record['personal']['first_name'] for record in records] == ['Alice', 'Bob', 'Zoë']
+            assert records.record_size(0) == len(records.read_line(0)) + 1  # the blank line that follows
+            try:
+                records[3]
+                assert False, "reading past the last record must raise IndexError"
+            except IndexError:
+                pass
+
+        records, indexed = open_jsonl(path)
+        records.close()
+        assert not indexed
+
+        # A changed JSONL file is indexed again
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(example_record('Dave')) + '\n')
+        records, indexed = open_jsonl(path)
+        with records:
+            assert indexed and len(records) == 4
+            assert records[3]['personal']['first_name'] == 'Dave'
+
+        # So is a damaged index
+        with open(path + INDEX_SUFFIX, 'r+b') as f:
+            f.truncate(20)
+        records, indexed = open_jsonl(path)
+        with records:
+            assert indexed and len(records) == 4
+
+def test_batch_renders_records():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'people.jsonl')
+        write_jsonl(path, [example_record('Alice'), example_record('Bob')])
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            status = batch_main([path, '--template', str(EXAMPLE_DIR / 'cv.md'), '--markdown', '--jobs', '1'])
+        assert status == 0, output.getvalue()
+
+        # Record 1 renders as the folder it was exported from
+        folder = Path(tmp) / 'bob'
+        shutil.copytree(EXAMPLE_DIR, folder)
+        record = example_record('Bob')
+        (folder / 'personal.json').write_text(json.dumps(record['personal']), encoding='utf-8')
+        (folder / 'employment.json').write_text(json.dumps({'employment': record['employment']}), encoding='utf-8')
+        expected = generate(str(folder / 'cv.md'), load_personal_info(str(folder)), backend='markdown', emojis=False)
+        assert (Path(tmp) / 'people' / '1' / 'cv.processed.md').read_text(encoding='utf-8') == expected
+        assert 'Alice Inc.' in (Path(tmp) / 'people' / '0' / 'cv.processed.md').read_text(encoding='utf-8')
+
+if __name__ == '__main__':
+    test_index()
+    test_batch_renders_records()
+    print("All JSONL tests passed.")
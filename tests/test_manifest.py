@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test script for incremental batch rendering in AICV (the build manifest of `aicv batch`).
+Unchanged CVs must be skipped, and a CV must be rendered again when one of its inputs changes,
+including a data file that was missing, or that appears in a directory searched before the one
+it was read from.
+"""
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aicv.core.batch import main as batch_main
+
+EXAMPLE_DIR = Path(__file__).parent.parent / 'example'
+
+EXTRA_BLOCK = "\n# Extra\n\n```pymd\nrender('extra.json')\n```\n"
+
+def run_batch(root):
+    """Runs `aicv batch --markdown` on root and returns what it printed."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        batch_main([str(root), '--markdown', '--jobs', '1'])
+    return output.getvalue()
+
+def extra_data(company):
+    return json.dumps({'employment': [{'position': 'Engineer', 'company': company, 'responsibilities': []}]})
+
+def make_tree(root):
+    folder = root / 'alice'
+    shutil.copytree(EXAMPLE_DIR, folder)
+    with open(folder / 'cv.md', 'a') as f:
+        f.write(EXTRA_BLOCK)
+    return folder
+
+def test_unchanged_and_changed_inputs():
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = make_tree(Path(tmp))
+        (folder / 'extra.json').write_text(extra_data('Initech'))
+        run_batch(tmp)
+        assert 'Skipping 1 up-to-date' in run_batch(tmp)
+
+        (folder / 'extra.json').write_text(extra_data('Globex'))
+        assert 'Skipping' not in run_batch(tmp)
+        assert 'Globex' in (folder / 'cv.processed.md').read_text()
+
+def test_missing_input_appears():
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = make_tree(Path(tmp))
+        run_batch(tmp)
+        assert 'File extra.json not found' in (folder / 'cv.processed.md').read_text()
+        assert 'Skipping 1 up-to-date' in run_batch(tmp)
+
+        (folder / 'extra.json').write_text(extra_data('Initech'))
+        assert 'Skipping' not in run_batch(tmp)
+        assert 'Initech' in (folder / 'cv.processed.md').read_text()
+
+def test_input_appears_before_fallback():
+    with tempfile.TemporaryDirectory() as tmp, tempfile.TemporaryDirectory() as cwd:
+        folder = make_tree(Path(tmp))
+        # Read from the current directory, as the folder of cv.md has no extra.json
+        (Path(cwd) / 'extra.json').write_text(extra_data('Initech'))
+        saved_cwd = os.getcwd()
+        os.chdir(cwd)
+        try:
+            run_batch(tmp)
+            assert 'Initech' in (folder / 'cv.processed.md').read_text()
+            assert 'Skipping 1 up-to-date' in run_batch(tmp)
+
+            (folder / 'extra.json').write_text(extra_data('Globex'))
+            assert 'Skipping' not in run_batch(tmp)
+            assert 'Globex' in (folder / 'cv.processed.md').read_text()
+        finally:
+            os.chdir(saved_cwd)
+
+if __name__ == '__main__':
+    test_unchanged_and_changed_inputs()
+    test_missing_input_appears()
+    test_input_appears_before_fallback()
+    print("All manifest tests passed.")
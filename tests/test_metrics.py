@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test script for the Prometheus metrics of AICV (`aicv batch --metrics-port/--metrics-file`).
+The metrics must be rendered in the text exposition format, histograms must have cumulative
+buckets with their sum and count, generate() must record its documents and stages, and the
+metrics must reach a textfile and an HTTP scrape.
+"""
+import math
+import os
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aicv.core.metrics import (CONTENT_TYPE, DOCUMENTS, REGISTRY, STAGE_SECONDS, Registry, TextfileWriter,
+                               start_http_server, track_stage, write_textfile)
+from aicv.core.processor import generate, load_personal_info
+
+EXAMPLE_DIR = Path(__file__).parent.parent / 'example'
+
+def parse_samples(text):
+    """Returns the samples of the exposition format as a dict: 'name{labels}' -> float."""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value.replace('+Inf', 'inf'))
+    return samples
+
+def test_exposition_format():
+    registry = Registry()
+    documents = registry.counter('test_documents_total', 'Documents', ('backend',))
+    depth = registry.gauge('test_queue_depth', 'Depth')
+    documents.inc(backend='html')
+    documents.inc(2, backend='html')
+    documents.inc(backend='a "quoted"\nvalue\\')
+    depth.set(3)
+    depth.dec()
+    # Registering a metric again returns the existing one
+    assert registry.counter('test_documents_total', 'Documents', ('backend',)) is documents
+
+    assert registry.render() == (
+        '# HELP test_documents_total Documents\n'
+        '# TYPE test_documents_total counter\n'
+        'test_documents_total{backend="a \\"quoted\\"\\nvalue\\\\"} 1\n'
+        'test_documents_total{backend="html"} 3\n'
+        '# HELP test_queue_depth Depth\n'
+        '# TYPE test_queue_depth gauge\n'
+        'test_queue_depth 2\n')
+
+    # A gauge computed on each scrape
+    depth.set_function(lambda: 7)
+    assert parse_samples(registry.render())['test_queue_depth'] == 7
+    depth.clear_function()
+    assert depth.get() == 2
+
+def test_histogram():
+    registry = Registry()
+    latency = registry.histogram('test_seconds', 'Latency', ('stage',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        latency.observe(value, stage='pdf')
+    samples = parse_samples(registry.render())
+    # Buckets are cumulative, with le="+Inf" equal to the count
+    assert samples['test_seconds_bucket{stage="pdf",le="0.1"}'] == 2
+    assert samples['test_seconds_bucket{stage="pdf",le="1"}'] == 3
+    assert samples['test_seconds_bucket{stage="pdf",le="+Inf"}'] == 4
+    assert math.isclose(samples['test_seconds_sum{stage="pdf"}'], 5.65)
+    assert samples['test_seconds_count{stage="pdf"}'] == 4 == latency.count(stage='pdf')
+
+    try:
+        with track_stage('failing', 'html'):
+            raise ValueError('boom')
+    except ValueError:
+        pass
+    assert STAGE_SECONDS.count(stage='failing', backend='html') == 1
+    assert parse_samples(REGISTRY.render())['aicv_stage_failures_total{stage="failing",backend="html"}'] == 1
+
+def test_generate_records_metrics():
+    documents = DOCUMENTS.get(backend='markdown', status='ok')
+    parses = STAGE_SECONDS.count(stage='parse', backend='markdown')
+    renders = STAGE_SECONDS.count(stage='render', backend='markdown')
+    samples = parse_samples(REGISTRY.render())
+    parse_sum = samples.get('aicv_stage_duration_seconds_sum{stage="parse",backend="markdown"}', 0.0)
+
+    generate(str(EXAMPLE_DIR / 'cv.md'), load_personal_info(str(EXAMPLE_DIR)), backend='markdown', emojis=False)
+    assert DOCUMENTS.get(backend='markdown', status='ok') == documents + 1
+    assert STAGE_SECONDS.count(stage='parse', backend='markdown') == parses + 1
+    assert STAGE_SECONDS.count(stage='render', backend='markdown') == renders + 1
+    samples = parse_samples(REGISTRY.render())
+    assert samples['aicv_stage_duration_seconds_sum{stage="parse",backend="markdown"}'] > parse_sum
+    assert samples['aicv_stage_duration_seconds_bucket{stage="parse",backend="markdown",le="+Inf"}'] == parses + 1
+
+    failed = DOCUMENTS.get(backend='markdown', status='failed')
+    try:
+        generate(str(EXAMPLE_DIR / 'missing.md'), {}, backend='markdown')
+        assert False, "a missing template must raise"
+    except OSError:
+        pass
+    assert DOCUMENTS.get(backend='markdown', status='failed') == failed + 1
+
+def test_textfile():
+    registry = Registry()
+    documents = registry.counter('test_documents_total', 'Documents')
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'aicv.prom')
+        write_textfile(path, registry)
+        assert parse_samples(Path(path).read_text()) == {}
+        documents.inc()
+        write_textfile(path, registry)
+        assert parse_samples(Path(path).read_text()) == {'test_documents_total': 1}
+
+        writer = TextfileWriter(path, interval=0.05, registry=registry)
+        documents.inc()
+        for _ in range(100):
+            if parse_samples(Path(path).read_text()) == {'test_documents_total': 2}:
+                break
+            time.sleep(0.05)
+        else:
+            raise AssertionError("the metrics file was not rewritten")
+        # stop() writes the final values once more
+        documents.inc()
+        writer.stop()
+        assert parse_samples(Path(path).read_text()) == {'test_documents_total': 3}
+        # Only the metrics file is left: it is replaced atomically
+        assert os.listdir(tmp) == ['aicv.prom']
+
+def test_http_server():
+    registry = Registry()
+    registry.counter('test_documents_total', 'Documents').inc(5)
+    server = start_http_server(0, registry=registry)
+    try:
+        url = f"http://127.0.0.1:{server.server_port}"
+        with urllib.request.urlopen(url + '/metrics') as response:
+            assert response.headers['Content-Type'] == CONTENT_TYPE
+            assert parse_samples(response.read().decode('utf-8')) == {'test_documents_total': 5}
+        try:
+            urllib.request.urlopen(url + '/other')
+            assert False, "only /metrics is served"
+        except urllib.error.HTTPError as e:
+            assert e.code == 404
+    finally:
+        server.shutdown()
+
+if __name__ == '__main__':
+    test_exposition_format()
+    test_histogram()
+    test_generate_records_metrics()
+    test_textfile()
+    test_http_server()
+    print("All metrics tests passed.")
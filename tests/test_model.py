@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Test script for the document model of AICV.
+The renderers must give the same result from the JSON data and from the entries of the model, and
+load_document() must collect the header and the sections of a template, in order, as JSON.
+"""
+import json
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aicv.core.model import Author, Publication, build_section
+from aicv.core.processor import load_document, load_personal_info
+from aicv.renderers import SECTION_RENDERERS
+
+EXAMPLE_DIR = Path(__file__).parent.parent / 'example'
+
+def test_renderers_accept_entries():
+    for kind in SECTION_RENDERERS:
+        data = json.loads((EXAMPLE_DIR / f"{kind}.json").read_text())
+        section = build_section(data)
+        assert section.kind == kind
+        for backend in ('markdown', 'html', 'moderncv'):
+            expected = SECTION_RENDERERS[kind](data[kind], backend)
+            assert SECTION_RENDERERS[kind](section.entries, backend) == expected, f"{kind} differs for {backend}"
+
+def test_publication_fields():
+    assert Author.parse('Jane Q. Public').short() == 'Public, J.'
+    assert Author.parse('Public, Jane').bibtex() == 'Public, Jane'
+    assert Author.parse('Jane Q. Public').bibtex() == 'Public, Jane Q.'
+    pub = Publication.from_dict({'author': ["O'Neil, Ann"], 'title': 'T', 'year': 2021, 'note': 'To appear'})
+    assert pub.key == 'oneil2021' and pub.to_appear and pub.type == 'article'
+
+def test_load_document():
+    personal_info = load_personal_info(str(EXAMPLE_DIR))
+    document = load_document(str(EXAMPLE_DIR / 'cv.md'), personal_info)
+    assert document.header.first_name == personal_info['first_name']
+    assert [section.kind for section in document.sections] == ['employment', 'education', 'publications']
+    dump = json.loads(document.to_json())
+    assert dump['sections'][0]['entries'][0]['dates'] == document.sections[0].entries[0].dates
+    assert dump['sections'][2]['entries'][0]['authors'][0]['last']
+
+if __name__ == '__main__':
+    test_renderers_accept_entries()
+    test_publication_fields()
+    test_load_document()
+    print("All document model tests passed.")
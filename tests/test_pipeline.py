@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test script for the staged batch pipeline in AICV (`aicv batch --parse-jobs/--render-jobs/--pdf-jobs`).
+Every item must pass through every stage once, an item that fails in a stage must skip the
+remaining stages without stopping the others, and a staged batch must produce the documents of
+a plain batch.
+"""
+import contextlib
+import io
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aicv.core.batch import main as batch_main
+from aicv.core.pipeline import Stage, run_pipeline
+
+EXAMPLE_DIR = Path(__file__).parent.parent / 'example'
+
+# Stage functions run in worker processes, so they live at module level
+
+def double(item):
+    return item * 2
+
+def increment(item):
+    if item == 6:
+        raise ValueError('six')
+    return item + 1
+
+def test_every_item_passes_every_stage():
+    stages = [Stage('double', double, workers=2), Stage('increment', increment, workers=3)]
+    results = list(run_pipeline(range(10), stages, queue_size=2,
+                                on_error=lambda item, stage, error: f"{stage}: {error}"))
+    assert sorted(result for result in results if isinstance(result, int)) == [1, 3, 5, 9, 11, 13, 15, 17, 19]
+    assert [result for result in results if isinstance(result, str)] == ['increment: six']
+
+def test_error_propagates_without_handler():
+    stages = [Stage('increment', increment)]
+    try:
+        list(run_pipeline(range(10), stages))
+        assert False, "a failing stage without on_error must raise"
+    except ValueError as e:
+        assert str(e) == 'six'
+
+def test_staged_batch_matches_plain_batch():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        for person in ('alice', 'bob', 'carol'):
+            shutil.copytree(EXAMPLE_DIR, root / 'plain' / person)
+            shutil.copytree(EXAMPLE_DIR, root / 'staged' / person)
+        (root / 'staged' / 'bob' / 'employment.json').write_text('{broken')
+        (root / 'plain' / 'bob' / 'employment.json').write_text('{broken')
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            batch_main([str(root / 'plain'), '--markdown', '--jobs', '1', '--no-manifest'])
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            status = batch_main([str(root / 'staged'), '--markdown', '--parse-jobs', '2', '--render-jobs', '1',
+                                 '--queue-size', '1', '--no-manifest'])
+        assert status == 1
+        assert 'Done: 2 succeeded, 1 failed' in output.getvalue(), output.getvalue()
+        assert not (root / 'staged' / 'bob' / 'cv.processed.md').exists()
+        for person in ('alice', 'carol'):
+            plain = (root / 'plain' / person / 'cv.processed.md').read_text(encoding='utf-8')
+            staged = (root / 'staged' / person / 'cv.processed.md').read_text(encoding='utf-8')
+            assert staged == plain
+
+if __name__ == '__main__':
+    test_every_item_passes_every_stage()
+    test_error_propagates_without_handler()
+    test_staged_batch_matches_plain_batch()
+    print("All pipeline tests passed.")
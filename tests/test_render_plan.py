@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Test script for the render plans of AICV templates.
+CVs that share a template must reuse its compiled plan, and only differ by the output of the pymd blocks.
+"""
+import json
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aicv.core.extensions import compile_template
+from aicv.core.processor import generate, load_personal_info
+
+EXAMPLE_DIR = Path(__file__).parent.parent / 'example'
+BACKENDS = ['markdown', 'html', 'moderncv']
+
+def test_plan_shared_by_candidates():
+    with tempfile.TemporaryDirectory() as root:
+        candidates = []
+        for name in ('alice', 'bob'):
+            folder = Path(root) / name
+            shutil.copytree(EXAMPLE_DIR, folder)
+            candidates.append(folder)
+        employment = json.loads((candidates[1] / 'employment.json').read_text())
+        employment['employment'][0]['company'] = 'Bob Industries'
+        (candidates[1] / 'employment.json').write_text(json.dumps(employment))
+
+        for backend in BACKENDS:
+            compile_template.cache_clear()
+            documents = []
+            for folder in candidates:
+                personal_info = load_personal_info(str(folder))
+                documents.append(generate(str(folder / 'cv.md'), personal_info, backend=backend, emojis=backend == 'html'))
+            info = compile_template.cache_info()
+            assert (info.misses, info.hits) == (1, 1), f"{backend} template compiled {info.misses} times"
+            assert 'Bob Industries' in documents[1] and 'Bob Industries' not in documents[0]
+
+            # A plan compiled for another candidate renders the same document as a fresh one
+            compile_template.cache_clear()
+            personal_info = load_personal_info(str(candidates[1]))
+            assert generate(str(candidates[1] / 'cv.md'), personal_info, backend=backend,
+                            emojis=backend == 'html') == documents[1]
+
+def test_plan_fragments():
+    plan = compile_template((EXAMPLE_DIR / 'cv.md').read_text(), 'html', True)
+    assert [kind for kind, _ in plan].count('pymd') == 3
+    assert all('```' not in text for kind, text in plan if kind == 'static')
+
+if __name__ == '__main__':
+    test_plan_shared_by_candidates()
+    test_plan_fragments()
+    print("All render plan tests passed.")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script for longest-job-first scheduling in AICV (`aicv batch --schedule lpt`).
+Jobs with more entries, a bigger photo or a PDF must be estimated as more expensive and start
+first, and timings recorded by a previous run must take precedence over the estimates.
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aicv.core.batch import discover_jobs
+from aicv.core.scheduling import estimate_cost, load_timings, order_jobs, save_timings, timing_key
+
+EXAMPLE_DIR = Path(__file__).parent.parent / 'example'
+
+def make_folder(root, name, publications):
+    """A copy of the example CV with the given number of publications."""
+    folder = root / name
+    shutil.copytree(EXAMPLE_DIR, folder)
+    entry = {'type': 'article', 'author': ['A. Author'], 'title': 'Title', 'journal': 'Journal', 'year': 2020}
+    (folder / 'publications.json').write_text(json.dumps({'publications': [entry] * publications}))
+    return folder
+
+def test_longest_job_first():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_folder(root, 'a_small', 1)
+        make_folder(root, 'b_large', 100)
+        make_folder(root, 'c_medium', 20)
+        jobs = order_jobs(discover_jobs(tmp), {'backend': 'markdown'})
+        assert [os.path.basename(job['input_dir']) for job in jobs] == ['b_large', 'c_medium', 'a_small']
+        assert jobs[0]['estimated_cost'] > jobs[1]['estimated_cost'] > jobs[2]['estimated_cost']
+
+def test_backend_and_pdf_costs():
+    with tempfile.TemporaryDirectory() as tmp:
+        job = discover_jobs(str(make_folder(Path(tmp), 'cv', 10)))[0]
+        markdown = estimate_cost(job, {'backend': 'markdown'})
+        html = estimate_cost(job, {'backend': 'html'})
+        pdf = estimate_cost(job, {'backend': 'html', 'pdf': True})
+        assert markdown < html < pdf
+
+        # The photo only counts when it is embedded
+        (Path(tmp) / 'cv' / 'photo.jpg').write_bytes(b'\0' * 4 * 1024 * 1024)
+        assert estimate_cost(job, {'backend': 'html'}) > html
+        assert estimate_cost(job, {'backend': 'markdown'}) == markdown
+
+def test_recorded_timings():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_folder(root, 'a_small', 1)
+        make_folder(root, 'b_large', 100)
+        make_folder(root, 'c_medium', 20)
+        options = {'backend': 'html'}
+        small, large, medium = discover_jobs(tmp)
+        estimates = [estimate_cost(job, options) for job in (small, large, medium)]
+
+        # The small CV turned out to be the slow one
+        timings_path = os.path.join(tmp, 'timings.json')
+        save_timings(timings_path, {timing_key(small, options): 6.0, timing_key(large, options): 2.0})
+        jobs = order_jobs([small, large, medium], options, load_timings(timings_path))
+        assert jobs[0] is small
+        assert small['estimated_cost'] == 6.0 and large['estimated_cost'] == 2.0
+        # The other estimate is scaled to seconds by the median ratio of recorded timings to estimates
+        scale = (6.0 / estimates[0] + 2.0 / estimates[1]) / 2
+        assert abs(medium['estimated_cost'] - estimates[2] * scale) < 1e-9
+
+        assert timing_key(small, {'backend': 'html', 'pdf': True}) != timing_key(small, options)
+        assert load_timings(os.path.join(tmp, 'missing.json')) == {}
+
+if __name__ == '__main__':
+    test_longest_job_first()
+    test_backend_and_pdf_costs()
+    test_recorded_timings()
+    print("All scheduling tests passed.")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test script for the HTTP render service of AICV (`aicv serve`).
+Checks that documents carry ETags derived from their inputs, that a matching If-None-Match
+gets a 304 without rendering, and that concurrent identical requests share one render.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aicv.core.server import Coalescer, RenderService, make_server
+
+EXAMPLE_DIR = Path(__file__).parent.parent / 'example'
+
+def request(url, etag=None):
+    req = urllib.request.Request(url)
+    if etag:
+        req.add_header('If-None-Match', etag)
+    try:
+        with urllib.request.urlopen(req) as response:
+            return response.status, response.headers.get('ETag'), response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers.get('ETag'), e.read()
+
+def test_etag_and_not_modified():
+    with tempfile.TemporaryDirectory() as root:
+        shutil.copytree(EXAMPLE_DIR, os.path.join(root, 'alice'))
+        service = RenderService(root)
+        renders = []
+        render_folder = service.render_folder
+        service.render_folder = lambda folder, fmt: renders.append(folder) or render_folder(folder, fmt)
+        server = make_server(service, 0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/cv/alice?format=markdown"
+        try:
+            status, etag, body = request(url)
+            assert status == 200 and etag and b'**Position**' in body
+            assert request(url, etag)[0] == 304
+            assert request(url)[2] == body
+            assert len(renders) == 1, "a cached or unchanged document must not be rendered again"
+
+            # Changing an input changes the ETag
+            with open(os.path.join(root, 'alice', 'employment.json'), 'a') as f:
+                f.write('\n')
+            status, new_etag, _ = request(url, etag)
+            assert status == 200 and new_etag != etag
+
+            assert request(f"http://127.0.0.1:{server.server_port}/cv/../alice?format=markdown")[0] == 404
+            assert request(f"http://127.0.0.1:{server.server_port}/cv/alice?format=docx")[0] == 400
+        finally:
+            server.shutdown()
+            server.server_close()
+
+def test_coalescing():
+    coalescer = Coalescer()
+    calls = []
+
+    def slow_render():
+        calls.append(1)
+        time.sleep(0.3)
+        return b'document'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(coalescer.run('key', slow_render))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert all(document == b'document' for document, _ in results)
+    assert sum(1 for _, coalesced in results if coalesced) == 7
+
+if __name__ == '__main__':
+    test_etag_and_not_modified()
+    test_coalescing()
+    print("All server tests passed.")
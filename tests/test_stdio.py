@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test script for the stdin/stdout mode of AICV (`aicv - --format ...` and `--output -`).
+A template or a .cvpack bundle piped to stdin must render as the files it came from, and stdout
+must carry the document bytes only: every status message goes to stderr.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aicv.core.bundle import create_bundle
+from aicv.core.processor import generate, load_personal_info
+
+EXAMPLE_DIR = Path(__file__).parent.parent / 'example'
+PACKAGE_DIR = str(Path(__file__).parent.parent)
+
+def run_aicv(args, stdin=b'', cwd=EXAMPLE_DIR):
+    """Runs `aicv` in a process of its own, which has real binary stdin and stdout."""
+    env = dict(os.environ, PYTHONPATH=PACKAGE_DIR, AICV_NO_DAEMON='1')
+    command = [sys.executable, '-c', 'import sys; from aicv.main import main; sys.exit(main())'] + args
+    result = subprocess.run(command, input=stdin, cwd=cwd, env=env, capture_output=True)
+    assert result.returncode == 0, result.stderr.decode('utf-8', 'replace')
+    return result.stdout, result.stderr.decode('utf-8')
+
+def test_template_from_stdin():
+    template = (EXAMPLE_DIR / 'cv.md').read_bytes()
+    personal_info = load_personal_info(str(EXAMPLE_DIR))
+
+    # The JSON files of a piped template are found in the current directory
+    document, messages = run_aicv(['-', '--format', 'markdown'], stdin=template)
+    assert document.decode('utf-8') == generate(str(EXAMPLE_DIR / 'cv.md'), personal_info, backend='markdown', emojis=False)
+    assert messages == ''
+
+    document, messages = run_aicv(['-'], stdin=template)
+    assert document == run_aicv(['cv.md', '-o', '-'])[0]
+    assert document.decode('utf-8') == generate(str(EXAMPLE_DIR / 'cv.md'), personal_info, backend='html', emojis=True)
+    # The status message of the html backend goes to stderr, not into the document
+    assert 'Photo found and embedded' in messages and b'Photo found' not in document
+
+def test_bundle_from_stdin():
+    with tempfile.TemporaryDirectory() as tmp:
+        bundle_path = os.path.join(tmp, 'alice.cvpack')
+        create_bundle(str(EXAMPLE_DIR), bundle_path)
+        bundle = Path(bundle_path).read_bytes()
+
+        # Run from a directory without any CV files: everything comes from the bundle
+        expected = run_aicv([str(EXAMPLE_DIR / 'cv.md'), '--markdown', '-'])[0]
+        assert run_aicv(['-', '--format', 'markdown'], stdin=bundle, cwd=tmp)[0] == expected
+        assert run_aicv([bundle_path, '--markdown', '-'], cwd=tmp)[0] == expected
+
+        document, _ = run_aicv(['-', '--format', 'moderncv'], stdin=bundle, cwd=tmp)
+        assert document.lstrip().startswith(b'\\documentclass')
+        model = json.loads(run_aicv(['-', '--format', 'json'], stdin=bundle, cwd=tmp)[0])
+        expected = json.loads(run_aicv(['cv.md', '--json', '-'])[0])
+        # The photo of a bundle is a member, not a file on disk
+        assert model['header'].pop('photo') == 'photo.jpg'
+        assert expected['header'].pop('photo') == str(EXAMPLE_DIR / 'photo.jpg')
+        assert model == expected
+        # Nothing was written to disk
+        assert os.listdir(tmp) == ['alice.cvpack']
+
+if __name__ == '__main__':
+    test_template_from_stdin()
+    test_bundle_from_stdin()
+    print("All stdin/stdout tests passed.")
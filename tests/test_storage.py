@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test script for the storage backends in AICV.
+The same checks run against local, in-memory and S3-compatible storage. The S3 checks use
+moto's standalone server as a local stand-in for MinIO, and are skipped if boto3 or moto is
+not installed.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aicv.core.batch import prefetch_inputs, storage_jobs
+from aicv.core.processor import generate, load_personal_info
+from aicv.utils.storage import LocalStorage, MemoryStorage, S3Storage, StorageSource
+
+EXAMPLE_DIR = Path(__file__).parent.parent / 'example'
+
+def upload_example(storage, prefix='team/alice'):
+    """Copies the example CV into the storage under prefix."""
+    for name in os.listdir(EXAMPLE_DIR):
+        with open(EXAMPLE_DIR / name, 'rb') as f:
+            storage.write(f"{prefix}/{name}", f.read())
+
+def check_storage(storage):
+    """Runs the checks shared by all backends."""
+    storage.write('a/b.txt', 'hello')
+    assert storage.read('a/b.txt') == b'hello'
+    assert storage.exists('a/b.txt')
+    assert not storage.exists('a/missing.txt')
+    try:
+        storage.read('a/missing.txt')
+        assert False, "reading a missing key must raise FileNotFoundError"
+    except FileNotFoundError:
+        pass
+
+    writes = [storage.write_async(f"many/{i}.txt", str(i)) for i in range(20)]
+    for write in writes:
+        write.result()
+    assert storage.read_many([f"many/{i}.txt" for i in range(20)])['many/7.txt'] == b'7'
+    assert sorted(storage.list('many/')) == sorted(f"many/{i}.txt" for i in range(20))
+
+    # A CV rendered from the storage matches the one rendered from the example folder
+    upload_example(storage)
+    source = StorageSource(storage, 'team/alice')
+    personal_info = load_personal_info(source=source)
+    from_storage = generate('cv.md', personal_info, backend='markdown', emojis=False, source=source)
+    expected = generate(str(EXAMPLE_DIR / 'cv.md'), load_personal_info(str(EXAMPLE_DIR)), backend='markdown', emojis=False)
+    assert from_storage == expected
+
+    # Batch jobs are discovered in the storage and their inputs prefetched
+    jobs = storage_jobs(storage)
+    assert [job['name'] for job in jobs] == ['team/alice/cv']
+    fetched = list(prefetch_inputs(jobs, storage, lookahead=2))
+    assert 'fetch_error' not in fetched[0]
+    assert set(fetched[0]['files']) >= {'cv.md', 'personal.json', 'employment.json', 'photo.jpg'}
+    storage.close()
+
+def test_local_storage():
+    with tempfile.TemporaryDirectory() as root:
+        check_storage(LocalStorage(root))
+
+def test_memory_storage():
+    check_storage(MemoryStorage())
+
+def test_s3_storage():
+    try:
+        import boto3
+        from moto.server import ThreadedMotoServer
+    except ImportError:
+        print("Skipping S3 storage test: boto3 and moto are required")
+        return
+
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'test')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'test')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=0, verbose=False)
+    server.start()
+    try:
+        host, port = server.get_host_and_port()
+        endpoint_url = f"http://{host}:{port}"
+        boto3.client('s3', endpoint_url=endpoint_url).create_bucket(Bucket='cvs')
+        check_storage(S3Storage('cvs', 'candidates', endpoint_url=endpoint_url))
+    finally:
+        server.stop()
+
+if __name__ == '__main__':
+    test_local_storage()
+    test_memory_storage()
+    test_s3_storage()
+    print("All storage tests passed.")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test script for streaming generation in AICV (generate_iter()).
+Joined, the chunks must be the document generate() returns, for every backend and with the
+pymd blocks run concurrently; and the first chunk must come before all pymd blocks have run,
+except for moderncv, whose preamble needs the whole bibliography.
+"""
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aicv.core.processor import generate, generate_iter, load_personal_info
+
+EXAMPLE_DIR = Path(__file__).parent.parent / 'example'
+BACKENDS = ['markdown', 'html', 'moderncv']
+
+# Each block leaves a marker file behind when it runs
+MARKED_BLOCK = """
+## Part {number}
+
+```pymd
+open({marker!r}, 'w').close()
+render('employment.json')
+```
+"""
+
+def test_chunks_join_to_document():
+    personal_info = load_personal_info(str(EXAMPLE_DIR))
+    for backend in BACKENDS:
+        emojis = backend == 'html'
+        expected = generate(str(EXAMPLE_DIR / 'cv.md'), personal_info, backend=backend, emojis=emojis)
+        chunks = list(generate_iter(str(EXAMPLE_DIR / 'cv.md'), personal_info, backend=backend, emojis=emojis))
+        assert ''.join(chunks) == expected, backend
+        if backend != 'moderncv':
+            assert len(chunks) > 2, backend
+        chunks = generate_iter(str(EXAMPLE_DIR / 'cv.md'), personal_info, backend=backend, emojis=emojis, block_workers=3)
+        assert ''.join(chunks) == expected, backend
+
+def test_first_chunk_before_blocks():
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp) / 'alice'
+        shutil.copytree(EXAMPLE_DIR, folder)
+        markers = [str(Path(tmp) / f"block-{number}") for number in range(3)]
+        template = '# CV\n' + ''.join(MARKED_BLOCK.format(number=number, marker=marker) for number, marker in enumerate(markers))
+        (folder / 'cv.md').write_text(template, encoding='utf-8')
+        personal_info = load_personal_info(str(folder))
+
+        for backend in BACKENDS:
+            chunks = generate_iter(str(folder / 'cv.md'), personal_info, backend=backend, emojis=False)
+            first = next(chunks)
+            ran = [os.path.exists(marker) for marker in markers]
+            if backend == 'moderncv':
+                assert all(ran)
+            else:
+                # The header is out before the first block has run, and each block's output follows it
+                assert not any(ran), backend
+                for chunk in chunks:
+                    if 'Part 1' in chunk:
+                        break
+                assert [os.path.exists(marker) for marker in markers] == [True, False, False], backend
+            rest = ''.join(chunks)
+            assert all(os.path.exists(marker) for marker in markers)
+            assert first and rest
+            for marker in markers:
+                os.remove(marker)
+
+if __name__ == '__main__':
+    test_chunks_join_to_document()
+    test_first_chunk_before_blocks()
+    print("All streaming tests passed.")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test script for concurrent generation in AICV.
+Documents generated by many threads at once must be identical to those generated one by one,
+and the output of the pymd blocks, also when written to sys.stdout directly, must not leak
+into sys.stdout. The same holds for the pymd blocks of one document run concurrently with
+block_workers.
+"""
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add parent directory to path to import aicv modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aicv.core.processor import generate, load_personal_info, preprocess
+from aicv.core.sources import DirectorySource
+
+EXAMPLE_CV = str(Path(__file__).parent.parent / 'example' / 'cv.md')
+BACKENDS = ['markdown', 'html', 'moderncv']
+
+def generate_example(backend):
+    personal_info = load_personal_info(str(Path(EXAMPLE_CV).parent))
+    return generate(EXAMPLE_CV, personal_info, backend=backend, emojis=backend != 'moderncv')
+
+DIRECT_TEMPLATE = """# {name}
+
+```pymd
+import sys
+sys.stdout.write('written by {name}\\n')
+print('printed to sys.stdout by {name}', file=sys.stdout)
+sys.stdout.flush()
+```
+"""
+
+def test_direct_stdout_writes():
+    stdout = sys.stdout
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for name in ('alice', 'bob', 'carol', 'dave'):
+            path = Path(tmp) / f"{name}.md"
+            path.write_text(DIRECT_TEMPLATE.format(name=name), encoding='utf-8')
+            paths.append(path)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), ThreadPoolExecutor(max_workers=4) as pool:
+            documents = list(pool.map(lambda path: generate(str(path), {}, backend='markdown', emojis=False), paths * 4))
+            # Outside of the blocks, sys.stdout writes where it did before
+            print('not in a block')
+        for path, document in zip(paths * 4, documents):
+            name = path.stem
+            assert f"written by {name}\nprinted to sys.stdout by {name}" in document, document
+            assert document.count('by ') == 2, document
+        assert output.getvalue() == 'not in a block\n'
+    assert sys.stdout is stdout
+
+def test_concurrent_generation():
+    expected = {backend: generate_example(backend) for backend in BACKENDS}
+    backends = BACKENDS * 8
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout), ThreadPoolExecutor(max_workers=len(backends)) as pool:
+        documents = list(pool.map(generate_example, backends))
+    for backend, document in zip(backends, documents):
+        assert document == expected[backend], f"{backend} document differs when generated concurrently"
+    assert '**Responsibilities:**' not in stdout.getvalue(), "pymd output leaked into sys.stdout"
+
+class SlowSource(DirectorySource):
+    """Reads the section files with the latency of a remote storage."""
+    def read_bytes(self, name):
+        if name != 'personal.json' and name.endswith('.json'):
+            time.sleep(0.2)
+        return super().read_bytes(name)
+
+def test_block_workers():
+    source = SlowSource(str(Path(EXAMPLE_CV).parent))
+    personal_info = load_personal_info(source=source)
+    for backend in BACKENDS:
+        serial_dependencies, concurrent_dependencies = [], []
+        serial = preprocess('cv.md', personal_info, backend=backend, dependencies=serial_dependencies, source=source)
+        start = time.perf_counter()
+        concurrent = preprocess('cv.md', personal_info, backend=backend, dependencies=concurrent_dependencies, source=source,
+                                block_workers=3)
+        elapsed = time.perf_counter() - start
+        assert concurrent == serial, f"{backend} document or bibliography differs with block_workers"
+        assert concurrent_dependencies == serial_dependencies
+        assert elapsed < 0.5, f"the three blocks did not overlap ({elapsed:.2f}s)"
+
+if __name__ == '__main__':
+    test_concurrent_generation()
+    test_block_workers()
+    test_direct_stdout_writes()
+    print("All concurrency tests passed.")